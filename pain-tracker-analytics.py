@@ -0,0 +1,48 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from pain_analytics import RESPONDER_THRESHOLD, load_cohort
+from pain_session import find_session_files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Responder statistics over many saved pain tracking sessions.")
+    parser.add_argument("inputs", nargs="+", help="Saved session .json files, or directories containing them")
+    parser.add_argument("--threshold", type=int, default=RESPONDER_THRESHOLD, help="Reduction percentage that counts as a response")
+    args = parser.parse_args(argv)
+
+    paths = find_session_files(args.inputs)
+    if not paths:
+        print("No saved sessions found.", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    try:
+        cohort = load_cohort(paths)
+    except (OSError, ValueError, KeyError) as error:
+        print(f"Could not load sessions: {error}", file=sys.stderr)
+        return 1
+    loaded = time.perf_counter()
+    by_procedure = cohort.responder_rates_by_procedure(args.threshold)
+    by_area = cohort.responder_rates_by_area(args.threshold)
+    times = cohort.time_to_reduction(args.threshold)
+    computed = time.perf_counter()
+
+    print(f"{len(paths)} sessions, {cohort.curve_count} curves, {len(cohort.times)} readings "
+          f"(load {loaded - started:.2f}s, compute {computed - loaded:.3f}s)")
+    for title, rates in (("Procedure", by_procedure), ("Area", by_area)):
+        print(f"\n{title:<30} {'Responders':>10} {'Curves':>8}")
+        for label, (rate, count) in rates.items():
+            print(f"{label or '(none)':<30} {rate:>9.0%} {count:>8}")
+    reached = times[~np.isnan(times)]
+    if len(reached):
+        print(f"\nTime to {args.threshold}% reduction: median {np.median(reached):g}, "
+              f"IQR {np.percentile(reached, 25):g}-{np.percentile(reached, 75):g} ({len(reached)} curves)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pain_cache import RENDER_VERSION, DiskCache, session_key
+from pain_session import find_session_files, read_session_file
+
+
+def render_session_file(session_path, output_dir, cache_dir=None, force=False, page_headers=False):
+    # Runs in a worker process. Returns (report path, rows, seconds, skipped).
+    started = time.perf_counter()
+    session, patient, options = read_session_file(session_path)
+    area_labels = session.slot_names()
+    patient = {key: patient.get(key, "") for key in ("name", "nhi", "procedure_date", "procedure_name")}
+    stem = os.path.splitext(os.path.basename(session_path))[0]
+    report_path = os.path.join(output_dir, f"{stem}.pdf")
+
+    # A report is only rewritten if its inputs changed since it was last
+    # written; checked before matplotlib and reportlab are even imported
+    key_path = os.path.join(cache_dir, "reports", f"{stem}.key") if cache_dir else None
+    report_key = session_key(session, options, "report", patient, area_labels, page_headers, RENDER_VERSION)
+    if key_path and not force and os.path.exists(report_path) and os.path.exists(key_path):
+        with open(key_path, encoding="utf-8") as file:
+            if file.read() == report_key:
+                return report_path, len(session), time.perf_counter() - started, True
+
+    # Agg is selected before anything imports pyplot
+    import matplotlib
+    matplotlib.use("Agg")
+    import pain_report
+
+    if cache_dir and pain_report.disk_cache is None:
+        pain_report.disk_cache = DiskCache(os.path.join(cache_dir, "graphs"))
+    pain_report.build_report(report_path, session, patient, area_labels, options, page_headers=page_headers)
+    if key_path:
+        os.makedirs(os.path.dirname(key_path), exist_ok=True)
+        with open(key_path, "w", encoding="utf-8") as file:
+            file.write(report_key)
+    return report_path, len(session), time.perf_counter() - started, False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render PDF reports for saved pain tracking sessions without the GUI.")
+    parser.add_argument("inputs", nargs="+", help="Saved session .json files, or directories containing them")
+    parser.add_argument("-o", "--output-dir", default=".", help="Directory to write the PDF reports to")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of worker processes (default: all cores)")
+    parser.add_argument("--cache-dir", help="Where to keep rendered graphs and report keys (default: OUTPUT_DIR/.pain-cache)")
+    parser.add_argument("--no-cache", action="store_true", help="Render everything from scratch and keep no cache")
+    parser.add_argument("--force", action="store_true", help="Rewrite reports even if their inputs have not changed")
+    parser.add_argument("--page-headers", action="store_true", help="Head every page after the first with the patient, headline numbers and a small graph")
+    args = parser.parse_args(argv)
+    cache_dir = None if args.no_cache else args.cache_dir or os.path.join(args.output_dir, ".pain-cache")
+
+    session_files = find_session_files(args.inputs)
+    if not session_files:
+        print("No saved sessions found.", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    failures = 0
+    skipped = 0
+    rows = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {pool.submit(render_session_file, path, args.output_dir, cache_dir, args.force, args.page_headers): path for path in session_files}
+        for future in as_completed(futures):
+            try:
+                report_path, row_count, seconds, unchanged = future.result()
+            except Exception as error:
+                failures += 1
+                print(f"FAILED {futures[future]}: {error}", file=sys.stderr)
+                continue
+            rows += row_count
+            skipped += unchanged
+            print(f"{seconds:8.3f}s  {row_count:6d} rows  {report_path}{'  (unchanged)' if unchanged else ''}")
+
+    elapsed = time.perf_counter() - started
+    done = len(session_files) - failures
+    print(f"{done} reports ({rows} rows) in {elapsed:.2f}s with {args.jobs} workers: {done / elapsed:.1f} reports/s, {skipped} unchanged, {failures} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
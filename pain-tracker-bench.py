@@ -0,0 +1,187 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+from pain_session import PainSession
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SIZES = [10, 100, 1000, 10000]
+# Every run starts from the app's defaults and flips one display option
+VARIANTS = {
+    "defaults": {},
+    "no_actual_pain": {"show_actual_pain": False},
+    "no_comments": {"show_comments": False},
+    "80_percent_line": {"show_80_percent_line": True},
+    "time_points": {"use_minutes": False},
+}
+
+
+def load_app_module():
+    # The GUI lives in a script with dashes in its name, so load it by path
+    spec = importlib.util.spec_from_file_location("pain_tracker_gui_graph", os.path.join(HERE, "pain-tracker-gui-graph.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class QuietDialogs:
+    # Stands in for messagebox/filedialog so no handler blocks on a dialog
+    def __init__(self, save_path=""):
+        self.save_path = save_path
+
+    def showinfo(self, *args, **kwargs):
+        pass
+
+    def showerror(self, title, message, **kwargs):
+        raise RuntimeError(message)
+
+    def asksaveasfilename(self, *args, **kwargs):
+        return self.save_path
+
+
+def make_session(rows, areas):
+    initial = [80 - 10 * (area % 6) for area in range(areas)]
+    session = PainSession(initial, [f"Area {area + 1}" for area in range(areas)])
+    for i in range(1, rows):
+        session.add_reading(i * 15, [max(0, p0 - i * p0 // rows) for p0 in initial], "check" if i % 25 == 0 else "")
+    return session
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def run_case(gui, root, rows, areas, variant, repeat, export_dir):
+    dialogs = QuietDialogs(os.path.join(export_dir, f"bench-{rows}-{areas}-{variant}.pdf"))
+    gui.messagebox = gui.filedialog = dialogs
+    app = gui.PainTrackerApp(root)
+    app.ensure_graph()
+    for name, value in VARIANTS[variant].items():
+        getattr(app, name).set(value)
+    app.area_count.set(areas)
+    app.show_areas(areas)
+    for name, value in [("patient_name", "Bench"), ("patient_nhi", "BEN0001"), ("procedure_date", "01-01-2026"), ("procedure_name", "Benchmark")]:
+        getattr(app, name).set(value)
+    app.show_session(make_session(rows, areas))
+
+    def render():
+        app.redraw_scheduler.flush()
+        root.update_idletasks()
+
+    def full_render():
+        app.graph._layout_key = None
+        app.render_graph()
+        root.update_idletasks()
+
+    def add():
+        for current in app.current_pain:
+            current.set(10)
+        app.add_pain_score()
+        render()
+
+    def delete():
+        app.table.selection = {len(app.session) // 2}
+        app.delete_selected()
+        render()
+
+    def export():
+        app.export_to_pdf()
+        app.export_worker.join()
+
+    render()
+    results = {
+        "add_pain_score": timed(add, repeat),
+        "update_graph": timed(full_render, repeat),
+        "get_graph_data": timed(app.get_graph_data, repeat),
+        "delete_selected": timed(delete, repeat),
+        "copy_to_clipboard": timed(app.copy_to_clipboard, repeat),
+        # How long the UI is blocked, then the whole export including the worker
+        "export_to_pdf_ui": timed(app.export_to_pdf, 1),
+    }
+    app.export_worker.join()
+    results["export_to_pdf"] = timed(export, max(1, repeat // 5))
+    app.redraw_scheduler.cancel()
+    for child in root.winfo_children():
+        child.destroy()
+    return results
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "samples": len(samples),
+        "median_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "min_ms": ordered[0] * 1000,
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    # Flags operations whose median got slower than tolerance x the baseline
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {(r["op"], r["rows"], r["areas"], r["variant"]): r for r in json.load(file)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get((result["op"], result["rows"], result["areas"], result["variant"]))
+        if before and result["median_ms"] > before["median_ms"] * tolerance and result["median_ms"] - before["median_ms"] > 1:
+            regressions.append((result, before))
+    for result, before in regressions:
+        print(f"REGRESSION {result['op']} rows={result['rows']} areas={result['areas']} {result['variant']}: "
+              f"{before['median_ms']:.1f}ms -> {result['median_ms']:.1f}ms", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the graph app's hot paths headlessly (needs a display or Xvfb).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Session sizes in rows")
+    parser.add_argument("--areas", type=int, nargs="+", default=[1, 2], help="Numbers of tracked areas")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS), help="Display option variants")
+    parser.add_argument("--repeat", type=int, default=10, help="Samples per operation")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Allowed slowdown factor against the baseline")
+    args = parser.parse_args(argv)
+
+    gui = load_app_module()
+    root = tk.Tk()
+    root.withdraw()
+    results = []
+    with tempfile.TemporaryDirectory() as export_dir:
+        for rows in args.sizes:
+            for areas in args.areas:
+                for variant in args.variants:
+                    case = run_case(gui, root, rows, areas, variant, args.repeat, export_dir)
+                    for op, samples in case.items():
+                        result = dict(op=op, rows=rows, areas=areas, variant=variant, **summarize(samples))
+                        results.append(result)
+                        print(f"{op:<18} {rows:>6} rows {areas} area(s) {variant:<16} median {result['median_ms']:9.2f}ms  p95 {result['p95_ms']:9.2f}ms")
+    root.destroy()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=1)
+    if args.compare and compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
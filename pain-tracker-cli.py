@@ -0,0 +1,201 @@
+import time
+STARTED = time.perf_counter()
+
+import argparse
+import os
+import shutil
+import sys
+# Only the standard library and pain_session: no tkinter, matplotlib, numpy or
+# reportlab, so this comes up as quickly as pain.bat did
+from pain_session import PainSession, table_header, write_session_file
+
+SPARK_LEVELS = "▁▂▃▄▅▆▇█"
+CLEAR_SCREEN = "\x1b[H\x1b[J"  # cursor home, clear to the end of the screen
+
+
+def parse_scores(text, count):
+    # "40", "40 30" or "40 30 felt better": count scores, then an optional comment
+    parts = text.split(None, count)
+    if len(parts) < count:
+        raise ValueError(f"expected {count} pain score{'s' if count > 1 else ''}, got {text.strip()!r}")
+    scores = []
+    for part in parts[:count]:
+        if not part.isdigit() or int(part) > 100:
+            raise ValueError(f"{part!r} is not a pain score between 0 and 100")
+        scores.append(int(part))
+    return scores, parts[count].strip() if len(parts) > count else ""
+
+
+def display_row(session, index, use_minutes):
+    # pain.bat's row layout, with a score and reduction per area
+    values = session.row_values(index, use_minutes, session.area_count)
+    cells = [f"{values[0]:>7}"]
+    for area in range(session.area_count):
+        label = "Pain Score" if session.area_count == 1 else session.area_names[area]
+        reduction = values[2 + 2 * area]
+        cells.append(f" {label}: {values[1 + 2 * area]} | {reduction if index == 0 else 'Reduction: ' + reduction}")
+    if values[-1]:
+        cells.append(f" {values[-1]}")
+    return "|".join(cells)
+
+
+def sparkline(column, width):
+    # One character per reading, or per run of readings (their mean) when
+    # there are more readings than columns
+    count = len(column)
+    if count > width:
+        column = [sum(column[i * count // width:(i + 1) * count // width]) / ((i + 1) * count // width - i * count // width)
+                  for i in range(width)]
+    return "".join(SPARK_LEVELS[min(len(SPARK_LEVELS) - 1, int(score * len(SPARK_LEVELS) / 101))] for score in column)
+
+
+class TerminalTracker:
+    # The pain.bat loop: starting scores, then one reading per line, "r" to
+    # restart and "q" to quit. On a terminal the screen is redrawn in place
+    # after every line; with piped input each row is printed as it is added
+    # and bad lines are reported on stderr and skipped. Every row is appended
+    # to the log as it happens, in Copy to Clipboard's tab-separated layout,
+    # which pain-tracker-import.py and the graph version's Open Session read.
+    def __init__(self, areas=1, area_names=None, step=None, log_path=None, save_path=None, show_sparkline=False, interactive=True, output=sys.stdout):
+        self.areas = areas
+        self.area_names = area_names
+        self.step = step
+        self.save_path = save_path
+        self.show_sparkline = show_sparkline
+        self.interactive = interactive
+        self.output = output
+        self.session = None
+        self.message = ""
+        self.errors = 0
+        self.log = open(log_path, "a", encoding="utf-8", newline="") if log_path else None
+
+    @property
+    def use_minutes(self):
+        return self.step is not None
+
+    def prompt(self):
+        if self.session is None:
+            return f"Enter the starting pain score{'s' if self.areas > 1 else ''} (0-100) at time point 0: "
+        return f"Enter the pain score{'s' if self.areas > 1 else ''} (0-100) at the next time point, 'r' to restart, or 'q' to quit: "
+
+    def feed(self, line, number=None):
+        # Handles one line of input; returns False once the user quits
+        command = line.strip()
+        if command.lower() == "q":
+            return False
+        if command.lower() == "r":
+            self.finish()
+            self.session = None
+            self.message = "Restarted."
+            return True
+        if not command:
+            return True
+        try:
+            scores, comment = parse_scores(command, self.areas)
+        except ValueError as error:
+            self.report_error(error, number)
+            return True
+        self.message = ""
+        if self.session is None:
+            self.session = PainSession(scores, self.area_names)
+            self.session.comments[0] = comment
+            self.write_log(table_header(self.session.area_names))
+        else:
+            self.session.add_reading(self.session.time_point + (self.step or 1), scores, comment)
+        index = len(self.session) - 1
+        self.write_log(self.session.row_values(index, self.use_minutes, self.session.area_count))
+        if not self.interactive:
+            print(display_row(self.session, index, self.use_minutes), file=self.output)
+        return True
+
+    def report_error(self, error, number):
+        self.errors += 1
+        if self.interactive:
+            self.message = f"{error}. Try again."
+        else:
+            print(f"line {number}: {error}", file=sys.stderr)
+
+    def write_log(self, values):
+        # One line per reading, flushed straight away; nothing is rewritten
+        if self.log is not None:
+            self.log.write("\t".join(str(value) for value in values) + "\n")
+            self.log.flush()
+
+    def draw(self):
+        # Only what fits on screen is drawn, so the cost of a redraw does not
+        # grow with the length of the session
+        columns, lines = shutil.get_terminal_size()
+        footer = [self.message] if self.message else []
+        if self.session is not None and self.show_sparkline:
+            footer = [f"{name[:10]:>10} {sparkline(column, columns - 12)}" for name, column in zip(self.session.area_names, self.session.scores)] + footer
+        screen = [CLEAR_SCREEN]
+        if self.session is not None:
+            rows = len(self.session)
+            room = max(1, lines - len(footer) - 2)
+            first = 0 if rows <= room else rows - room + 1
+            if first:
+                screen.append(f"... {first} earlier readings\n")
+            screen.extend(display_row(self.session, index, self.use_minutes) + "\n" for index in range(first, rows))
+        screen.extend(line + "\n" for line in footer)
+        self.output.write("".join(screen))
+        self.output.flush()
+
+    def run(self, lines=None):
+        # lines is an iterable of input lines (piped input); None reads the
+        # keyboard with prompts
+        try:
+            if lines is None:
+                while True:
+                    self.draw()
+                    try:
+                        line = input(self.prompt())
+                    except EOFError:
+                        break
+                    if not self.feed(line):
+                        break
+            else:
+                for number, line in enumerate(lines, 1):
+                    if not self.feed(line, number):
+                        break
+        finally:
+            self.finish()
+            if self.log is not None:
+                self.log.close()
+
+    def finish(self):
+        if self.save_path and self.session is not None:
+            write_session_file(self.save_path, self.session, options={"use_minutes": self.use_minutes})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Track pain reduction in a terminal, as pain.bat did. Reads scores from the keyboard or, piped, one line per reading.")
+    parser.add_argument("--areas", type=int, default=1, help="Pain areas tracked; each line then holds one score per area")
+    parser.add_argument("--area-names", help="Comma-separated area names, e.g. Back,Leg")
+    parser.add_argument("--minutes", type=int, metavar="STEP", help="Label readings in minutes, STEP minutes apart, instead of Time 1, 2, ...")
+    parser.add_argument("--log", default="pain_table.tsv", help="File the table is appended to as readings come in (default: pain_table.tsv; '' for none)")
+    parser.add_argument("--save", help="Also write the session as a saved session .json when done")
+    parser.add_argument("--sparkline", action="store_true", help="Show a text sparkline of each area's scores")
+    parser.add_argument("--startup-time", action="store_true", help="Print how long startup took and exit")
+    args = parser.parse_args(argv)
+
+    if args.startup_time:
+        print(f"Startup: {time.perf_counter() - STARTED:.3f}s", file=sys.stderr)
+        return 0
+    area_names = [name.strip() for name in args.area_names.split(",")] if args.area_names else None
+    if args.areas < 1 or (area_names and len(area_names) != args.areas):
+        parser.error("--areas must be at least 1, with one name per area in --area-names")
+    if args.minutes is not None and args.minutes <= 0:
+        parser.error("--minutes must be a positive number of minutes")
+
+    interactive = sys.stdin.isatty()
+    if interactive and os.name == "nt":
+        os.system("")  # Turns on ANSI escape handling in the Windows console
+    tracker = TerminalTracker(args.areas, area_names, args.minutes, args.log or None, args.save, args.sparkline, interactive)
+    tracker.run(None if interactive else sys.stdin)
+    if interactive:
+        print("Script finished. Exiting.")
+    return 1 if tracker.errors and not interactive else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
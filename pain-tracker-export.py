@@ -0,0 +1,37 @@
+import argparse
+import os
+import sys
+
+from pain_export import FORMATS, export_sessions, iter_sessions
+from pain_session import find_session_files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export saved pain tracking sessions as CSV, Parquet, Arrow or a FHIR Observation bundle.")
+    parser.add_argument("inputs", nargs="+", help="Saved session .json files, or directories containing them")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="csv", help="Output format (parquet and arrow need pyarrow)")
+    parser.add_argument("-o", "--output", required=True, help="File to write")
+    args = parser.parse_args(argv)
+
+    paths = find_session_files(args.inputs)
+    if not paths:
+        print("No saved sessions found.", file=sys.stderr)
+        return 1
+
+    def progress(sessions, records):
+        if sessions % 1000 == 0:
+            print(f"{sessions} sessions, {records} records...", file=sys.stderr)
+
+    try:
+        stats = export_sessions(iter_sessions(paths), args.output, args.format, progress)
+    except (OSError, ValueError, KeyError, RuntimeError) as error:
+        print(f"Export failed: {error}", file=sys.stderr)
+        return 1
+    seconds = max(stats["seconds"], 1e-9)
+    print(f"{stats['sessions']} sessions, {stats['records']} records, {stats['bytes'] / 1e6:.1f} MB to {os.path.abspath(args.output)} "
+          f"in {seconds:.2f}s: {stats['records'] / seconds:,.0f} records/s, {stats['sessions'] / seconds:.1f} sessions/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
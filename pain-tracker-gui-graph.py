@@ -1,29 +1,135 @@
+import time
+STARTED = time.perf_counter()
+
+import argparse
+import glob
+import os
+import queue
+import re
+import sys
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.backends.backend_pdf import PdfPages
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Image, Paragraph
-import numpy as np
+# matplotlib and reportlab are heavy, so they are imported where first used:
+# the graph loads in the background once the window is up, reportlab on export
+from pain_instrument import Instrumentation
+from pain_journal import EditHistory, SessionJournal, default_journal_path, journal_in_use, open_journal, replay_journal, set_aside
+from pain_scheduler import RedrawScheduler
+from pain_import import import_file
+from pain_stats import STATS_HEADER, SessionStats
+from pain_session import MIN_AREA_SLOTS, PainSession, check_reading, read_session_file, table_header, write_session_file
+from pain_table import VirtualTable
+
+MAX_AREAS = 12  # Upper end of the "Pain areas" spinbox; the session has no limit
+PATIENT_JOURNAL = re.compile(r"patient-(\d+)\.journal")  # dashboard tab journals
+
+
+class GraphPanel:
+    # The graph side of the window: a placeholder until matplotlib has loaded
+    # in the background, then one Figure, canvas and PainGraph. A dashboard
+    # shares a single panel between all its patients; only the active app
+    # draws on it, and show() hands it over to another one.
+    def __init__(self, master, parent, instrumentation):
+        self.master = master
+        self.instrumentation = instrumentation
+        self.frame = ttk.Frame(parent)
+        self.graph = None
+        self.active = None
+        self.on_ready = []
+        # Holds the graph's place (800x600, as the figure) until matplotlib is loaded
+        self.placeholder = ttk.Frame(self.frame, width=800, height=600)
+        self.placeholder.pack_propagate(False)
+        self.placeholder.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(self.placeholder, text="Loading graph...").pack(expand=True)
+
+    def load(self):
+        # Import matplotlib off the main thread so the window can appear first;
+        # only the Tk canvas itself has to be created on the main thread
+        def import_graph_modules():
+            import matplotlib.figure  # noqa: F401
+            import pain_graph  # noqa: F401
+
+        loader = threading.Thread(target=import_graph_modules, daemon=True)
+        loader.start()
+        self.poll_loader(loader)
+
+    def poll_loader(self, loader):
+        if loader.is_alive():
+            self.master.after(20, self.poll_loader, loader)
+            return
+        self.ensure()
+
+    def ensure(self):
+        if self.graph is None:
+            self.create()
+            for callback in self.on_ready:
+                callback()
+        return self.graph
+
+    def create(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from pain_graph import PainGraph
+
+        self.placeholder.destroy()
+        self.figure = Figure(figsize=(8, 6), dpi=100)
+        self.canvas = FigureCanvasTkAgg(self.figure, self.frame)
+        self.canvas.draw = self.instrumentation.wrap("canvas.draw", self.canvas.draw)
+        self.canvas.blit = self.instrumentation.wrap("canvas.blit", self.canvas.blit)
+        self.graph = PainGraph(self.figure, self.canvas, blit=True)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+    def show(self, app):
+        # The new session shares nothing with the last one drawn, so its
+        # first render is a full one
+        self.active = app
+        if self.graph is not None:
+            self.graph.reset()
+        app.update_graph()
+
 
 class PainTrackerApp:
-    def __init__(self, master):
+    # With parent and graph_panel the app is one patient's tab in a
+    # PainDashboard: its controls go in parent, the shared panel draws its graph
+    # while it is the active tab, and the window-level menu and key bindings
+    # are left to the dashboard
+    def __init__(self, master, journal_path=None, parent=None, graph_panel=None):
         self.master = master
-        master.title("Pain Tracker")
-        master.geometry("1650x750")
-
-        self.track_two_areas = tk.BooleanVar(value=False)
-        self.master.bind("<Delete>", self.on_delete_key)
-        self.pain0_1 = tk.IntVar()
-        self.current_pain_1 = tk.IntVar()
-        self.pain0_2 = tk.IntVar()
-        self.current_pain_2 = tk.IntVar()
-        self.time_point = 0
-        self.target_pain_score_1 = 0
-        self.target_pain_score_2 = 0
+        self.startup_marks = {"imports": time.perf_counter() - STARTED}
+        self.embedded = parent is not None
+        if not self.embedded:
+            master.title("Pain Tracker")
+            master.geometry("1650x850")
+
+        # Hot-path timings are off unless PAIN_TRACKER_INSTRUMENT is set or the
+        # Diagnostics menu turns them on; the wrappers cost one check when off
+        self.instrumentation = Instrumentation.from_environment()
+        self.instrumentation.on_record = self.on_timing
+        self.render_graph = self.instrumentation.wrap("update_graph", self.render_graph)
+        for name in ("add_pain_score", "renumber_time_points", "export_to_pdf"):
+            setattr(self, name, self.instrumentation.wrap(name, getattr(self, name)))
+        self.show_latency = tk.BooleanVar(value=self.instrumentation.enabled)
+        self.record_timings = tk.BooleanVar(value=self.instrumentation.enabled)
+        self.profile_operations = tk.BooleanVar(value=self.instrumentation.profile)
+        self.latency_text = tk.StringVar()
+        self.latency_overlay = None
+
+        self.area_count = tk.IntVar(value=1)
+        if not self.embedded:
+            self.master.bind("<Delete>", self.on_delete_key)
+            self.master.bind("<Control-z>", self.undo)
+            self.master.bind("<Control-y>", self.redo)
+            self.master.bind("<Control-Z>", self.redo)  # Ctrl+Shift+Z
+        self.history = EditHistory()
+        # One entry row per area, created as the area count first reaches it
+        self.area_names = []
+        self.starting_pain = []
+        self.current_pain = []
+        self.area_rows = []
+        self.shown_areas = 0
+        self.table_slots = None
+        self.session = None
+        self.stats = None
         self.use_minutes = tk.BooleanVar(value=True)
         self.show_actual_pain = tk.BooleanVar(value=True)
         self.show_comments = tk.BooleanVar(value=True)
@@ -35,17 +141,192 @@ class PainTrackerApp:
         self.patient_nhi = tk.StringVar()
         self.procedure_date = tk.StringVar()
         self.procedure_name = tk.StringVar()
-        self.pain_area_1 = tk.StringVar(value="Area 1")
-        self.pain_area_2 = tk.StringVar(value="Area 2")
-
-        self.create_widgets()
 
-
-    def create_widgets(self):
-        main_frame = ttk.Frame(self.master, padding="10")
+        # Every change marks the graph dirty; it is rendered once per event loop turn
+        self.redraw_scheduler = RedrawScheduler(master, self.render_graph)
+
+        self.graph_panel = graph_panel
+        self.export_worker = None
+        self.export_status = tk.StringVar()
+        self.on_startup_complete = None
+        self.ingest = None
+        self.journal_sync = None
+        self.create_widgets(parent or master)
+        self.mark_startup("widgets")
+
+        # Every change is journaled so a crash or restart does not lose the
+        # session. A window whose journal another window holds gets one of its
+        # own beside it; a dashboard tab is given a free one by the dashboard.
+        self.journal = None
+        self.journaled_details = None
+        if journal_path:
+            try:
+                self.journal = SessionJournal(journal_path) if self.embedded else open_journal(journal_path)
+            except OSError as error:
+                # e.g. a read-only profile: track without a journal rather than not at all
+                messagebox.showerror("Error", f"Could not open the session journal, so this session will not be kept if the program closes: {error}")
+            else:
+                self.restore_from_journal(self.journal.path)
+        if self.journal is not None:
+            self.sync_journal()
+        for variable in (self.patient_name, self.patient_nhi, self.procedure_date, self.procedure_name,
+                         self.show_actual_pain, self.show_comments, self.show_80_percent_line):
+            variable.trace_add("write", self.journal_details)
+        if not self.embedded:
+            self.master.bind("<Map>", self.on_first_map)
+            self.graph_panel.on_ready.append(self.on_graph_ready)
+            self.graph_panel.show(self)
+            self.graph_panel.load()
+
+    @property
+    def graph(self):
+        # Only the app the graph panel is showing gets to draw on it
+        panel = self.graph_panel
+        return panel.graph if panel is not None and panel.active is self else None
+
+    def restore_from_journal(self, journal_path):
+        try:
+            session, patient, options = replay_journal(journal_path)
+        except (OSError, ValueError, KeyError, IndexError, TypeError, OverflowError) as error:
+            # A journal that cannot be replayed would stop every later start
+            # too, so it is moved aside for someone to look at and this
+            # window goes on without one
+            self.journal.close()
+            self.journal = None
+            try:
+                kept = set_aside(journal_path, ".bad")
+            except OSError:
+                kept = journal_path
+            messagebox.showerror("Error", f"Could not restore the session from its journal ({error}). The journal has been kept as {kept}; "
+                                          "this session will not be journaled until the program is started again.")
+            return
+        if session is None:
+            return
+        self.set_details(patient, options)
+        self.load_session(session, options["use_minutes"])
+        # Start the journal again from the restored session, so what the
+        # crash left behind (a torn last line, a long tail) is not built on
+        self.journal_start()
+
+    def set_details(self, patient, options):
+        for name, variable in [("name", self.patient_name), ("nhi", self.patient_nhi), ("procedure_date", self.procedure_date), ("procedure_name", self.procedure_name)]:
+            variable.set(patient.get(name, ""))
+        for name in ("show_actual_pain", "show_comments", "show_80_percent_line"):
+            getattr(self, name).set(options[name])
+
+    def load_session(self, session, use_minutes):
+        # Shows a session that was not typed in: restored, opened or imported
+        self.use_minutes.set(use_minutes)
+        self.area_count.set(session.area_count)
+        self.show_areas(session.area_count)
+        for area in range(session.area_count):
+            self.area_names[area].set(session.area_names[area])
+            self.starting_pain[area].set(session.initial_scores[area])
+        self.disable_entries()
+        self.show_session(session)
+
+    def sync_journal(self):
+        # Picks up records the batching in SessionJournal.append left unsynced
+        self.journal.sync()
+        self.journal_sync = self.master.after(int(self.journal.sync_interval * 1000), self.sync_journal)
+
+    def close(self):
+        # Stops this app's timers and closes its journal, for a dashboard tab
+        # that is being closed; the window itself carries on
+        if self.journal_sync is not None:
+            self.master.after_cancel(self.journal_sync)
+        self.redraw_scheduler.cancel()
+        if self.journal is not None:
+            self.journal.close()
+
+    def journal_record(self, op, **fields):
+        if self.journal is None:
+            return
+        self.journal.append(op, **fields)
+        if self.journal.needs_compaction():
+            self.journal_start()
+
+    def journal_start(self):
+        # A snapshot of the session with the details needed to bring the
+        # window back as it was
+        self.journaled_details = (self.patient_details(), self.graph_options())
+        self.journal.start(self.session, *self.journaled_details)
+
+    def journal_details(self, *args):
+        # Patient details and display options are journaled as they change,
+        # once there is a session for them to belong to
+        if self.journal is None or self.session is None:
+            return
+        details = (self.patient_details(), self.graph_options())
+        if details != self.journaled_details:
+            self.journaled_details = details
+            self.journal_record("details", patient=details[0], options=details[1])
+
+    def mark_startup(self, name):
+        self.startup_marks[name] = time.perf_counter() - STARTED
+
+    def on_first_map(self, event):
+        if event.widget is self.master and "window" not in self.startup_marks:
+            self.mark_startup("window")
+
+
+    def create_menu(self):
+        menubar = tk.Menu(self.master)
+        edit = tk.Menu(menubar, tearoff=0)
+        edit.add_command(label="Undo", accelerator="Ctrl+Z", command=self.undo)
+        edit.add_command(label="Redo", accelerator="Ctrl+Y", command=self.redo)
+        menubar.add_cascade(label="Edit", menu=edit)
+        diagnostics = tk.Menu(menubar, tearoff=0)
+        diagnostics.add_checkbutton(label="Record Timings", variable=self.record_timings, command=self.toggle_instrumentation)
+        diagnostics.add_checkbutton(label="Profile Operations", variable=self.profile_operations, command=self.toggle_instrumentation)
+        diagnostics.add_checkbutton(label="Show Latency Overlay", variable=self.show_latency, command=self.update_latency_overlay)
+        diagnostics.add_separator()
+        diagnostics.add_command(label="Save Timing Snapshot...", command=self.save_timing_snapshot)
+        menubar.add_cascade(label="Diagnostics", menu=diagnostics)
+        self.master.config(menu=menubar)
+
+    def toggle_instrumentation(self):
+        self.instrumentation.enabled = self.record_timings.get() or self.profile_operations.get()
+        self.instrumentation.profile = self.profile_operations.get()
+        self.update_latency_overlay()
+
+    def on_timing(self, name, seconds):
+        # Called for every timed operation, including from the export worker,
+        # so Tk is only touched for the main-thread render
+        if name == "update_graph" and self.latency_overlay is not None:
+            self.update_latency_overlay()
+
+    def update_latency_overlay(self):
+        visible = self.show_latency.get() and self.instrumentation.enabled
+        if not visible:
+            if self.latency_overlay is not None:
+                self.latency_overlay.place_forget()
+                self.latency_overlay = None
+            return
+        if self.latency_overlay is None:
+            self.latency_overlay = ttk.Label(self.graph_panel.frame, textvariable=self.latency_text, background="#ffffe0")
+            self.latency_overlay.place(relx=1.0, rely=0.0, anchor="ne")
+        last = self.instrumentation.last("update_graph")
+        frame = f"{last * 1000:.1f} ms" if last is not None else "-"
+        scheduler = self.redraw_scheduler
+        self.latency_text.set(f"Frame {frame} | renders {scheduler.renders} | coalesced {scheduler.skipped}")
+        self.latency_overlay.lift()
+
+    def save_timing_snapshot(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Timing snapshots", "*.json")])
+        if not file_path:
+            return
+        base = self.instrumentation.dump(file_path)
+        saved = base + ".json" + (f" and {base}.prof" if self.instrumentation.profiles else "")
+        messagebox.showinfo("Saved", f"Timings have been saved to {saved}.")
+
+    def create_widgets(self, container):
+        if not self.embedded:
+            self.create_menu()
+        main_frame = ttk.Frame(container, padding="10")
         main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        self.master.columnconfigure(0, weight=1)
-        self.master.rowconfigure(0, weight=1)
+        container.columnconfigure(0, weight=1)
+        container.rowconfigure(0, weight=1)
 
         # Left side frame for controls and table
         left_frame = ttk.Frame(main_frame)
@@ -56,45 +337,22 @@ class PainTrackerApp:
         # Pain Score Entry
         pain_frame = ttk.LabelFrame(left_frame, text="Pain Score Entry", padding="10")
         pain_frame.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        self.pain_frame = pain_frame
+
+        ttk.Label(pain_frame, text="Pain areas:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+        self.area_count_entry = ttk.Spinbox(pain_frame, from_=1, to=MAX_AREAS, textvariable=self.area_count, width=5, command=self.change_area_count)
+        self.area_count_entry.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        self.area_count_entry.bind("<Return>", lambda event: self.change_area_count())
+        self.area_count_entry.bind("<FocusOut>", lambda event: self.change_area_count())
 
-        ttk.Checkbutton(pain_frame, text="Track Two Pain Areas", variable=self.track_two_areas, command=self.toggle_second_area).grid(row=0, column=0, columnspan=6, padx=5, pady=5, sticky="w")
-
-        ttk.Label(pain_frame, text="Area 1:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
-        self.pain_area_1_entry = ttk.Entry(pain_frame, textvariable=self.pain_area_1, width=10)
-        self.pain_area_1_entry.grid(row=1, column=1, padx=5, pady=5)
-        ttk.Label(pain_frame, text="Starting pain (0-100):").grid(row=1, column=2, padx=5, pady=5, sticky="e")
-        self.pain0_1_entry = ttk.Entry(pain_frame, textvariable=self.pain0_1, width=10)
-        self.pain0_1_entry.grid(row=1, column=3, padx=5, pady=5)
-        ttk.Label(pain_frame, text="Current pain (0-100):").grid(row=1, column=4, padx=5, pady=5, sticky="e")
-        self.current_pain_1_entry = ttk.Entry(pain_frame, textvariable=self.current_pain_1, width=10)
-        self.current_pain_1_entry.grid(row=1, column=5, padx=5, pady=5)
-
-        self.area2_widgets = []
-        ttk.Label(pain_frame, text="Area 2:").grid(row=2, column=0, padx=5, pady=5, sticky="e")
-        self.pain_area_2_entry = ttk.Entry(pain_frame, textvariable=self.pain_area_2, width=10)
-        self.pain_area_2_entry.grid(row=2, column=1, padx=5, pady=5)
-        self.area2_widgets.append(self.pain_area_2_entry)
-        ttk.Label(pain_frame, text="Starting pain (0-100):").grid(row=2, column=2, padx=5, pady=5, sticky="e")
-        self.pain0_2_entry = ttk.Entry(pain_frame, textvariable=self.pain0_2, width=10)
-        self.pain0_2_entry.grid(row=2, column=3, padx=5, pady=5)
-        self.area2_widgets.append(self.pain0_2_entry)
-        ttk.Label(pain_frame, text="Current pain (0-100):").grid(row=2, column=4, padx=5, pady=5, sticky="e")
-        self.current_pain_2_entry = ttk.Entry(pain_frame, textvariable=self.current_pain_2, width=10)
-        self.current_pain_2_entry.grid(row=2, column=5, padx=5, pady=5)
-        self.area2_widgets.append(self.current_pain_2_entry)
-
-
-        ttk.Label(pain_frame, text="Time post last entry:").grid(row=3, column=0, padx=5, pady=5, sticky="e")
+        # Area rows go in rows 1..MAX_AREAS, see add_area_row
+        ttk.Label(pain_frame, text="Time post last entry:").grid(row=MAX_AREAS + 1, column=0, padx=5, pady=5, sticky="e")
         self.custom_time_entry = ttk.Entry(pain_frame, textvariable=self.custom_time, width=10)
-        self.custom_time_entry.grid(row=3, column=1, padx=5, pady=5)
+        self.custom_time_entry.grid(row=MAX_AREAS + 1, column=1, padx=5, pady=5)
         self.start_button = ttk.Button(pain_frame, text="Start", command=self.start_tracking)
-        self.start_button.grid(row=3, column=2, padx=5, pady=5)
-        ttk.Button(pain_frame, text="Add", command=self.add_pain_score).grid(row=3, column=3, padx=5, pady=5)
-
-        self.toggle_second_area()  # Initially hide Area 2 widgets
+        self.start_button.grid(row=MAX_AREAS + 1, column=2, padx=5, pady=5)
+        ttk.Button(pain_frame, text="Add", command=self.add_pain_score).grid(row=MAX_AREAS + 1, column=3, padx=5, pady=5)
 
-        self.current_pain_1_entry.config(state="disabled")
-        self.current_pain_2_entry.config(state="disabled")
         self.custom_time_entry.config(state="disabled")
 
         # Options Frame
@@ -133,25 +391,12 @@ class PainTrackerApp:
         table_frame.columnconfigure(0, weight=1)
         table_frame.rowconfigure(0, weight=1)
 
-        self.tree = ttk.Treeview(table_frame, columns=("Time", "Pain Score 1", "Reduction 1", "Pain Score 2", "Reduction 2", "Comment"), show="headings", height=15)
-        
-        # Setting specific widths for each column
-        column_widths = {
-            "Time": 80,
-            "Pain Score 1": 80,
-            "Reduction 1": 200,
-            "Pain Score 2": 80,
-            "Reduction 2": 200,
-            "Comment": 180,
-        }
-        for col, width in column_widths.items():
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=width, stretch=tk.YES)  # Fixed width and prevent stretching
-
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        scrollbar.grid(row=0, column=1, sticky="ns")
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # Only the rows on screen exist as Tk items; the rest stay in the session
+        self.table_slots = MIN_AREA_SLOTS
+        self.table = VirtualTable(table_frame, self.table_columns(self.table_slots), self.table_row_count, self.table_row_values, height=15)
+        self.table.grid(row=0, column=0)
+        self.show_areas(self.area_count.get())
+        self.tree = self.table.tree
         self.tree.bind("<Double-1>", self.add_edit_comment)
 
         # Buttons
@@ -162,270 +407,394 @@ class PainTrackerApp:
             ("Add/Edit Comment", self.add_edit_comment),
             ("Copy to Clipboard", self.copy_to_clipboard),
             ("Export to PDF", self.export_to_pdf),
+            ("Open Session", self.open_session),
+            ("Save Session", self.save_session),
             ("Restart", self.restart),
             ("Quit", self.master.quit)
         ]
         for i, (text, cmd) in enumerate(buttons):
             ttk.Button(button_frame, text=text, command=cmd).grid(row=0, column=i, padx=5, pady=5, sticky="ew")
+        ttk.Label(button_frame, textvariable=self.export_status).grid(row=1, column=0, columnspan=len(buttons), padx=5, sticky="w")
+
+        # Right side frame for graph, unless a dashboard shares its own
+        if self.graph_panel is None:
+            self.graph_panel = GraphPanel(self.master, main_frame, self.instrumentation)
+            self.graph_panel.frame.grid(row=0, column=1, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        # Statistics below the graph (beside the shared graph in a dashboard tab)
+        stats_frame = ttk.LabelFrame(main_frame, text="Statistics", padding="5")
+        stats_frame.grid(row=0 if self.embedded else 1, column=1, padx=5, pady=5, sticky="new")
+        self.stats_tree = ttk.Treeview(stats_frame, columns=STATS_HEADER, show="headings", height=3)
+        for heading in STATS_HEADER:
+            self.stats_tree.heading(heading, text=heading)
+            self.stats_tree.column(heading, width=180 if heading == STATS_HEADER[-1] else 120, anchor="center")
+        self.stats_tree.pack(fill=tk.BOTH, expand=True)
+
+    def add_area_row(self):
+        area = len(self.area_rows)
+        row = area + 1
+        name = tk.StringVar(value=f"Area {area + 1}")
+        starting = tk.IntVar()
+        current = tk.IntVar()
+        widgets = [
+            ttk.Label(self.pain_frame, text=f"Area {area + 1}:"),
+            ttk.Entry(self.pain_frame, textvariable=name, width=10),
+            ttk.Label(self.pain_frame, text="Starting pain (0-100):"),
+            ttk.Entry(self.pain_frame, textvariable=starting, width=10),
+            ttk.Label(self.pain_frame, text="Current pain (0-100):"),
+            ttk.Entry(self.pain_frame, textvariable=current, width=10),
+        ]
+        for column, widget in enumerate(widgets):
+            widget.grid(row=row, column=column, padx=5, pady=5, sticky="e" if column % 2 == 0 else "")
+        widgets[5].config(state="normal" if self.session is not None else "disabled")
+        self.area_names.append(name)
+        self.starting_pain.append(starting)
+        self.current_pain.append(current)
+        self.area_rows.append(widgets)
+
+    def change_area_count(self):
+        try:
+            count = max(1, min(MAX_AREAS, self.area_count.get()))
+        except tk.TclError:
+            count = self.shown_areas
+        self.area_count.set(count)
+        if count == self.shown_areas:
+            return
+        self.show_areas(count)
+        self.restart()
 
-        # Right side frame for graph
-        right_frame = ttk.Frame(main_frame)
-        right_frame.grid(row=0, column=1, sticky=(tk.W, tk.E, tk.N, tk.S))
-        self.create_graph(right_frame)
-
-    def toggle_second_area(self):
-        if self.track_two_areas.get():
-            for widget in self.area2_widgets:
-                widget.grid()
-        else:
-            for widget in self.area2_widgets:
-                widget.grid_remove()
-        
-        # Only restart if the Treeview widget (self.tree) is fully initialized
-        if hasattr(self, 'tree'):
-            self.restart()
-
-
-
-    def create_graph(self, parent):
-        self.figure = Figure(figsize=(8, 6), dpi=100)
-        self.ax = self.figure.add_subplot(111)
-        self.ax.set_title("Pain Graph")
-        self.ax.set_xlabel("Time")
-        self.ax.set_ylabel("Pain Score")
-        self.ax.set_ylim(0, 100)
-        self.ax.set_xlim(0, 1)
-        self.ax.set_yticks(np.arange(0, 101, 10))
-        self.ax.text(0.5, 50, "No data yet", ha='center', va='center')
-
-        self.canvas = FigureCanvasTkAgg(self.figure, parent)
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    def show_areas(self, count):
+        while len(self.area_rows) < count:
+            self.add_area_row()
+        for area, widgets in enumerate(self.area_rows):
+            for widget in widgets:
+                if area < count:
+                    widget.grid()
+                else:
+                    widget.grid_remove()
+        self.shown_areas = count
+        self.configure_table(count)
+
+    def table_columns(self, area_slots):
+        column_widths = {"Time": 80}
+        for area in range(area_slots):
+            column_widths[f"Pain Score {area + 1}"] = 80
+            column_widths[f"Reduction {area + 1}"] = 200
+        column_widths["Comment"] = 180
+        return column_widths
+
+    def configure_table(self, area_count):
+        slots = max(MIN_AREA_SLOTS, area_count)
+        if slots != self.table_slots:
+            self.table_slots = slots
+            self.table.set_columns(self.table_columns(slots))
+            self.table.refresh()
+
+    def slot_names(self):
+        if self.session is not None:
+            return self.session.slot_names()
+        names = [name.get() for name in self.area_names[:self.shown_areas]]
+        return names + [f"Area {i + 1}" for i in range(len(names), self.table_slots)]
+
+    def ensure_graph(self):
+        return self.graph_panel.ensure()
+
+    def on_graph_ready(self):
+        self.mark_startup("graph")
+        self.update_graph()
+        self.update_latency_overlay()
+        if self.on_startup_complete is not None:
+            self.on_startup_complete()
+
+    def graph_options(self):
+        return {
+            "use_minutes": self.use_minutes.get(),
+            "show_actual_pain": self.show_actual_pain.get(),
+            "show_comments": self.show_comments.get(),
+            "show_80_percent_line": self.show_80_percent_line.get(),
+        }
 
     def update_graph(self):
-        time_points, pain_scores_1, pain_scores_2, comments = self.get_graph_data()
-        self.ax.clear()
-        self.ax.set_ylim(0, 100)
-        self.ax.set_yticks(np.arange(0, 101, 10))
-
-        if pain_scores_1:
-            self.ax.plot(time_points, pain_scores_1, marker='o', linestyle='-', color='blue', label=self.pain_area_1.get())
-            if self.track_two_areas.get() and pain_scores_2:
-                self.ax.plot(time_points, pain_scores_2, marker='s', linestyle='-', color='red', label=self.pain_area_2.get())
-
-            if len(time_points) == 1:
-                self.ax.set_xlim(time_points[0] - 0.5, time_points[0] + 0.5)
-            else:
-                self.ax.set_xlim(min(time_points), max(time_points))
+        # Background tabs of a dashboard skip rendering altogether; showing
+        # the tab renders it
+        if self.graph_panel.active is self:
+            self.redraw_scheduler.request()
 
-            if self.show_actual_pain.get():
-                for x, y1 in zip(time_points, pain_scores_1):
-                    self.ax.text(x, y1 + 2, f"{y1}", ha='center', va='bottom', fontsize=9, color='blue')
-                if self.track_two_areas.get():
-                    for x, y2 in zip(time_points, pain_scores_2):
-                        self.ax.text(x, y2 + 2, f"{y2}", ha='center', va='bottom', fontsize=9, color='red')
-
-            if self.show_comments.get():
-                for i, comment in enumerate(comments):
-                    if comment:
-                        y = pain_scores_1[i] if not self.track_two_areas.get() else max(pain_scores_1[i], pain_scores_2[i] if pain_scores_2 else 0)
-                        self.ax.annotate(comment, (time_points[i], y), xytext=(0, 30), textcoords="offset points", ha='center', va='bottom', bbox=dict(boxstyle="round,pad=0.3", fc="yellow", ec="b", lw=1, alpha=0.8))
-
-            if self.show_80_percent_line.get():
-                self.ax.axhline(y=self.target_pain_score_1, color='blue', linestyle='--', label=f'80% Reduction ({self.pain_area_1.get()})')
-                if self.track_two_areas.get():
-                    self.ax.axhline(y=self.target_pain_score_2, color='red', linestyle='--', label=f'80% Reduction ({self.pain_area_2.get()})')
-
-            self.ax.legend()
-
-        else:
-            self.ax.set_xlim(0, 1)
-            self.ax.text(0.5, 50, "No data yet", ha='center', va='center')
-
-        self.ax.set_title("Pain Graph")
-        self.ax.set_xlabel("Time" if not self.use_minutes.get() else "Minutes")
-        self.ax.set_ylabel("Pain Score")
-        self.canvas.draw()
+    def render_graph(self):
+        if self.graph is None:
+            return  # Still loading; ensure_graph renders once it is ready
+        # The graph keeps its artists and only redraws what changed
+        self.graph.update(self.session, **self.graph_options())
 
 
 
     def get_graph_data(self):
-        time_points, pain_scores_1, pain_scores_2, comments = [], [], [], []
-        for child in self.tree.get_children():
-            item = self.tree.item(child)["values"]
-            
-            # Extract the time point (first column)
-            time_points.append(int(item[0].split()[0] if self.use_minutes.get() else item[0].split()[1]))
-            
-            # Extract Pain Score 1 from the second column
-            pain_scores_1.append(int(item[1]) if item[1] != 'N/A' else None)
-            
-            if self.track_two_areas.get():
-                # Extract Pain Score 2 from the fourth column (if tracking two areas)
-                pain_scores_2.append(int(item[3]) if item[3] != 'N/A' else None)
-                # Extract the comment from the sixth column
-                comments.append(item[5] if len(item) > 5 else "")
-            else:
-                # Extract the comment from the correct column when only one area is tracked
-                comments.append(item[5] if len(item) > 5 else "")
-                pain_scores_2 = []  # Ensure this remains empty when not tracking the second area
-                
-        return time_points, pain_scores_1, pain_scores_2, comments
-
-
-
-
+        # Numbers come straight from the session columns, no table parsing:
+        # times, one score column per area, comments
+        if self.session is None:
+            return [], [], []
+        return self.session.times, self.session.scores, self.session.comments
 
     def toggle_time_display(self):
         self.restart()
         self.update_time_display()
 
     def update_time_display(self):
-        for item in self.tree.get_children():
-            values = self.tree.item(item)['values']
-            new_time = self.get_time_display(int(values[0].split()[0] if self.use_minutes.get() else values[0].split()[1]))
-            self.tree.item(item, values=(new_time, values[1], values[2], values[3]))
+        if self.session is None:
+            return
+        self.table.refresh()
 
-    def get_time_display(self, time_point):
-        return f"{time_point} min" if self.use_minutes.get() else f"Time {time_point}"
+    def table_row_count(self):
+        return len(self.session) if self.session is not None else 0
+
+    def table_row_values(self, index):
+        return self.session.row_values(index, self.use_minutes.get(), self.table_slots)
 
     def start_tracking(self):
         try:
-            initial_pain_1 = self.pain0_1.get()
-            if 0 <= initial_pain_1 <= 100:
-                self.target_pain_score_1 = initial_pain_1 * 20 // 100
-                self.tree.delete(*self.tree.get_children())
-                values = [self.get_time_display(0), f"{initial_pain_1:3d}", f"N/A - Target for 80% Reduction: {self.target_pain_score_1}"]
-                
-                # Disable entries for Area 1 and Area 2
-                self.disable_entries()
-
-                if self.track_two_areas.get():
-                    initial_pain_2 = self.pain0_2.get()
-                    if 0 <= initial_pain_2 <= 100:
-                        self.target_pain_score_2 = initial_pain_2 * 20 // 100
-                        values.extend([f"{initial_pain_2:3d}", f"N/A - Target for 80% Reduction: {self.target_pain_score_2}"])
-                    else:
-                        messagebox.showerror("Error", "Initial pain scores must be between 0 and 100.")
-                        self.enable_entries()  # Re-enable if there's an error
-                        return
-                
-                values.append("")  # For comment
-                self.tree.insert("", "end", values=tuple(values))
-                self.time_point = 0
-                self.update_graph()
-                self.current_pain_1_entry.config(state="normal")
-                self.current_pain_2_entry.config(state="normal")
-                self.custom_time_entry.config(state="normal")
-            else:
-                messagebox.showerror("Error", "Initial pain scores must be between 0 and 100.")
+            initial_scores = [starting.get() for starting in self.starting_pain[:self.shown_areas]]
+            area_names = [name.get() for name in self.area_names[:self.shown_areas]]
         except tk.TclError:
             messagebox.showerror("Error", "Please enter valid numbers for the starting pain scores.")
             self.enable_entries()  # Re-enable if there's an error
+            return
+
+        if not all(0 <= score <= 100 for score in initial_scores):
+            messagebox.showerror("Error", "Initial pain scores must be between 0 and 100.")
+            self.enable_entries()  # Re-enable if there's an error
+            return
+
+        self.disable_entries()
 
+        self.show_session(PainSession(initial_scores, area_names))
+        if self.journal is not None:
+            self.journal_start()
 
+    def show_session(self, session):
+        self.session = session
+        self.stats = SessionStats(session)
+        self.update_stats()
+        self.history.clear()
+        self.configure_table(session.area_count)
+        self.table.clear_selection()
+        self.table.refresh()
+        self.update_graph()
+        for widgets in self.area_rows:
+            widgets[5].config(state="normal")
+        self.custom_time_entry.config(state="normal")
 
     def add_pain_score(self):
+        if self.session is None:
+            return
         try:
-            current_pain_1 = self.current_pain_1.get()
-            if 0 <= current_pain_1 <= 100:
-                self.time_point += self.custom_time.get() if self.use_minutes.get() else 1
-                reduction_percentage_1 = ((self.pain0_1.get() - current_pain_1) * 100) // self.pain0_1.get() if self.pain0_1.get() != 0 else 'N/A'
-                values = [self.get_time_display(self.time_point), f"{current_pain_1:3d}", f"{reduction_percentage_1}%"]
-                
-                if self.track_two_areas.get():
-                    current_pain_2 = self.current_pain_2.get()
-                    if 0 <= current_pain_2 <= 100:
-                        reduction_percentage_2 = ((self.pain0_2.get() - current_pain_2) * 100) // self.pain0_2.get() if self.pain0_2.get() != 0 else 'N/A'
-                        values.extend([f"{current_pain_2:3d}", f"{reduction_percentage_2}%"])
-                    else:
-                        messagebox.showerror("Error", "Pain scores must be between 0 and 100.")
-                        return
-                else:
-                    # Fill with "N/A" for the untracked area
-                    values.extend(["N/A", "N/A"])
-                
-                values.append("")  # For comment
-                self.tree.insert("", "end", values=tuple(values))
-                self.update_graph()
-            else:
-                messagebox.showerror("Error", "Pain scores must be between 0 and 100.")
+            scores = [current.get() for current in self.current_pain[:self.session.area_count]]
+            step = self.custom_time.get() if self.use_minutes.get() else 1
         except tk.TclError:
             messagebox.showerror("Error", "Please enter valid numbers for the current pain scores.")
+            return
 
+        error = self.add_reading(scores, self.session.time_point + step)
+        if error:
+            messagebox.showerror("Error", error)
+
+    def add_reading(self, scores, time_point, comment=""):
+        # Shared by the Add button and live ingest; returns an error message,
+        # or None once the reading is added
+        error = check_reading(self.session, scores, time_point, comment)
+        if error:
+            return error
+        record = {"op": "add", "time": time_point, "scores": scores}
+        if comment:
+            record["comment"] = comment
+        self.edit(record, {"op": "delete", "indices": [len(self.session)], "renumber": False})
+        return None
+
+    def start_ingest(self, server):
+        # Readings sent by IngestServer are applied from the Tk event loop
+        self.ingest = server.start()
+        self.export_status.set(f"Receiving readings on {server.address}")
+        self.poll_ingest()
+
+    def poll_ingest(self):
+        # Everything that arrived since the last poll is applied in this one
+        # turn of the event loop, so a burst still costs a single redraw
+        from pain_ingest import answer_batches
+        try:
+            answer_batches(self.ingest, self.apply_ingest)
+        finally:
+            self.master.after(50, self.poll_ingest)
 
+    def apply_ingest(self, batch):
+        from pain_ingest import apply_batch
+        try:
+            step = self.custom_time.get() if self.use_minutes.get() else 1
+        except tk.TclError:
+            step = 30
+        return apply_batch(batch, self.session, self.patient_nhi.get(), step,
+                           lambda time_point, scores, comment: self.add_reading(scores, time_point, comment))
 
     def delete_selected(self):
-        for item in self.tree.selection():
-            self.tree.delete(item)
-        self.renumber_time_points()
-        self.update_graph()
+        if self.session is None:
+            return
+        # All selected rows go in one edit; undo puts back just those rows
+        renumber = not self.use_minutes.get()
+        removed = self.session.rows_at(self.table.selected_indices())
+        if not removed:
+            return
+        self.edit({"op": "delete", "indices": [row["index"] for row in removed], "renumber": renumber},
+                  {"op": "insert", "rows": removed, "renumber": renumber})
 
     def on_delete_key(self, event):
         self.delete_selected()
 
-    def renumber_time_points(self):
-        if not self.tree.get_children():
-            return  # Exit if there are no items
-
-        # Initialize values to ensure it's defined
-        values = None
+    def edit(self, record, inverse):
+        self.history.push(record, inverse)
+        self.apply_edit(record)
+
+    def undo(self, event=None):
+        record = self.history.undo() if self.session is not None else None
+        if record is not None:
+            self.apply_edit(record)
+
+    def redo(self, event=None):
+        record = self.history.redo() if self.session is not None else None
+        if record is not None:
+            self.apply_edit(record)
+
+    def apply_edit(self, record):
+        # Every change to the readings goes through here: the session, the
+        # journal, then only the table rows it touched and one scheduled redraw
+        self.stats.apply(record)
+        self.journal_record(**record)
+        op = record["op"]
+        if op == "add":
+            self.table.append()
+        elif op == "comment":
+            self.table.refresh(record["index"])
+        elif op == "delete":
+            self.table.clear_selection()
+            self.renumber_time_points(record["indices"][0])
+        else:
+            # Undone delete: show the rows that came back, selected
+            indices = [row["index"] for row in record["rows"]]
+            self.table.selection = set(indices)
+            self.renumber_time_points(indices[0])
+            self.table.see(indices[0])
+        self.update_stats()
+        self.update_graph()
 
-        for index, item in enumerate(self.tree.get_children()):
-            if index == 0:
-                continue
-            values = self.tree.item(item)['values']
-            new_time = self.get_time_display(int(values[0].split()[0] if self.use_minutes.get() else values[0].split()[1]))
-            self.tree.item(item, values=(new_time, values[1], values[2], values[3]))
+    def update_stats(self):
+        # One row per area; the numbers themselves were updated by the edit
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        if self.stats is not None:
+            for row in self.stats.rows(self.use_minutes.get()):
+                self.stats_tree.insert("", "end", values=row)
 
-        # Ensure self.time_point is assigned only if there are items
-        if values:
-            self.time_point = int(values[0].split()[0])
-        else:
-            self.time_point = 0
+    def renumber_time_points(self, start=1):
+        # The session has already renumbered; only on-screen rows at or after
+        # the first changed row need redrawing
+        self.table.refresh(start)
 
 
     def restart(self):
-        self.pain0_1.set(0)
-        self.pain0_2.set(0)
-        self.current_pain_1.set(0)
-        self.current_pain_2.set(0)
-        self.time_point = 0
-        self.target_pain_score_1 = 0
-        self.target_pain_score_2 = 0
-        self.tree.delete(*self.tree.get_children())
+        for variable in self.starting_pain + self.current_pain:
+            variable.set(0)
+        self.session = None
+        self.stats = None
+        self.update_stats()
+        self.history.clear()
+        self.table.clear_selection()
+        self.table.refresh()
         self.update_graph()
+        if self.journal is not None:
+            self.journal.clear()
         
-        # Re-enable the entries for Area 1 and Area 2
         self.enable_entries()
 
     def copy_to_clipboard(self):
-        headers = "Time\tPain\tReduction\tComment\n"
-        table_data = headers + "\n".join("\t".join(str(val) for val in self.tree.item(child)["values"]) for child in self.tree.get_children())
+        # Same columns as the table: time, a pain/reduction pair per area, comment
+        headers = "\t".join(table_header(self.slot_names())) + "\n"
+        rows = self.session.rows(self.use_minutes.get(), self.table_slots) if self.session is not None else []
+        table_data = headers + "\n".join("\t".join(str(val) for val in row) for row in rows)
+        if self.stats is not None:
+            # Statistics follow the readings after a blank line
+            statistics = [STATS_HEADER] + self.stats.rows(self.use_minutes.get())
+            table_data += "\n\n" + "\n".join("\t".join(row) for row in statistics)
         self.master.clipboard_clear()
         self.master.clipboard_append(table_data)
         messagebox.showinfo("Copied", "Table data has been copied to clipboard.")
 
     def add_edit_comment(self, event=None):
-        item = self.tree.selection()[0] if not event else self.tree.identify_row(event.y) if self.tree.identify_column(event.x) == "#6" else None
-        if not item:
+        if event is None:
+            selected = self.table.selected_indices()
+            index = selected[0] if selected else None
+        else:
+            comment_column = f"#{2 * self.table_slots + 2}"
+            index = self.table.index_at(event.y) if self.tree.identify_column(event.x) == comment_column else None
+        if index is None or self.session is None:
             messagebox.showinfo("Info", "Please select a row to add/edit a comment.")
             return
 
-        values = self.tree.item(item, "values")
-        new_comment = simpledialog.askstring("Add/Edit Comment", "Enter your comment:", initialvalue=values[5])
+        new_comment = simpledialog.askstring("Add/Edit Comment", "Enter your comment:", initialvalue=self.session.comments[index])
         if new_comment is not None:
-            self.tree.item(item, values=(values[0], values[1], values[2], values[3], values[4], new_comment))
-            self.update_graph()
+            self.edit({"op": "comment", "index": index, "text": new_comment},
+                      {"op": "comment", "index": index, "text": self.session.comments[index]})
+
+    def patient_details(self):
+        return {
+            "name": self.patient_name.get(),
+            "nhi": self.patient_nhi.get(),
+            "procedure_date": self.procedure_date.get(),
+            "procedure_name": self.procedure_name.get(),
+        }
+
+    def open_session(self):
+        # Saved sessions, or pain.bat's pain_table.txt and copied table text
+        file_path = filedialog.askopenfilename(filetypes=[("Pain sessions", "*.json"), ("Pain tables and copied text", "*.txt *.tsv"), ("All files", "*.*")])
+        if not file_path:
+            return
+        skipped = []
+        try:
+            if file_path.lower().endswith(".json"):
+                session, patient, options = read_session_file(file_path)
+                sessions = 1
+            else:
+                imported = list(import_file(file_path, skipped=skipped))
+                if not imported:
+                    raise ValueError("no readings found")
+                (session, use_minutes), sessions = imported[0], len(imported)
+                patient, options = {}, dict(self.graph_options(), use_minutes=use_minutes)
+        except (OSError, ValueError, KeyError) as error:
+            messagebox.showerror("Error", f"Could not open {file_path}: {error}")
+            return
+
+        self.restart()
+        self.set_details(patient, options)
+        self.load_session(session, options["use_minutes"])
+        if self.journal is not None:
+            self.journal_start()
+        if sessions > 1:
+            messagebox.showinfo("Info", f"{file_path} holds {sessions} sessions; the first one has been opened. Use pain-tracker-import.py to convert them all.")
+        if skipped:
+            shown = "\n".join(skipped[:10]) + (f"\n... and {len(skipped) - 10} more" if len(skipped) > 10 else "")
+            messagebox.showinfo("Info", f"{len(skipped)} row(s) of {file_path} could not be read and were left out:\n{shown}")
+
+    def save_session(self):
+        if self.session is None:
+            messagebox.showinfo("Info", "Please start tracking before saving a session.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Pain sessions", "*.json")])
+        if not file_path:
+            return
+        write_session_file(file_path, self.session, self.patient_details(), self.graph_options())
+        messagebox.showinfo("Saved", f"Session has been saved to {file_path}.")
 
     def export_to_pdf(self):
         # Use the entered patient details
-        patient_name = self.patient_name.get()
-        patient_nhi = self.patient_nhi.get()
-        procedure_date = self.procedure_date.get()
-        procedure_name = self.procedure_name.get()
+        patient = self.patient_details()
 
         # Validate patient details
-        if not all([patient_name, patient_nhi, procedure_date, procedure_name]):
+        if not all(patient.values()):
             messagebox.showerror("Error", "All patient details must be filled in.")
             return
 
@@ -434,71 +803,280 @@ class PainTrackerApp:
         if not file_path:
             return
 
-        # Save the current figure (graph) as an image
-        graph_image_path = "graph.png"
-        self.figure.savefig(graph_image_path, format='png')
-
-        # Create a PDF document
-        pdf = SimpleDocTemplate(file_path, pagesize=letter)
-
-        # Prepare patient details to be printed at the top of the PDF
-        styles = getSampleStyleSheet()
-        patient_details = Paragraph(f"<strong>Patient Name</strong>: {patient_name}<br/><strong>Patient NHI</strong>: {patient_nhi}<br/><strong>Procedure Date</strong>: {procedure_date}<br/><strong>Procedure Name</strong>: {procedure_name}<br/><br/>", styles["Normal"])
-
-        # Prepare data for the table
-        data = [["Time", f"{self.pain_area_1.get()} Pain", f"{self.pain_area_1.get()} Reduction", f"{self.pain_area_2.get()} Pain", f"{self.pain_area_2.get()} Reduction", "Comment"]]
-        for child in self.tree.get_children():
-            item = self.tree.item(child)["values"]
-            data.append(item)
-
-        # Create the table with the data
-        table = Table(data)
-
-        # Add some style to the table
-        style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ])
-        table.setStyle(style)
-
-        # Create an image object from the saved graph
-        graph_image = Image(graph_image_path)
-
-        # Set the image width and height, adjusting to fit the page
-        graph_image.drawHeight = 5 * 72  # 4 inches
-        graph_image.drawWidth = 7 * 72  # 7 inches
-
-        # Build the PDF with the patient details, graph, and the table
-        elements = [patient_details, graph_image, table]
-        pdf.build(elements)
+        if self.export_worker is not None and self.export_worker.is_alive():
+            messagebox.showinfo("Info", "An export is already running.")
+            return
 
-        messagebox.showinfo("Exported", f"Pain Tracker data has been exported to {file_path}.")
+        # The worker gets its own copy of everything it needs, so the table can
+        # keep changing while the report is written
+        session = self.session.copy() if self.session is not None else None
+        area_labels = self.slot_names()
+        options = self.graph_options()
+        statistics = self.stats.rows(options["use_minutes"]) if self.stats is not None else None
+        updates = queue.Queue()
+
+        def run_export():
+            try:
+                from pain_report import build_report
+                build_report = self.instrumentation.wrap("export_to_pdf (worker)", build_report)
+                build_report(file_path, session, patient, area_labels, options, progress=lambda stage: updates.put(("progress", stage)), statistics=statistics)
+            except Exception as error:
+                updates.put(("error", error))
+            else:
+                updates.put(("done", file_path))
+
+        self.export_status.set("Exporting...")
+        self.export_worker = threading.Thread(target=run_export, daemon=True)
+        self.export_worker.start()
+        self.poll_export(updates)
+
+    def poll_export(self, updates):
+        # Worker updates are handed to Tk from the main thread only
+        while True:
+            try:
+                kind, payload = updates.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                self.export_status.set(f"Exporting: {payload}...")
+            elif kind == "error":
+                self.export_status.set("")
+                messagebox.showerror("Error", f"Export failed: {payload}")
+                return
+            else:
+                self.export_status.set("")
+                messagebox.showinfo("Exported", f"Pain Tracker data has been exported to {payload}.")
+                return
+        self.master.after(50, self.poll_export, updates)
 
     def disable_entries(self):
-        # Disable entries for Area 1 and Area 2
-        self.pain_area_1_entry.config(state="disabled")
-        self.pain_area_2_entry.config(state="disabled")
-        self.pain0_1_entry.config(state="disabled")
-        self.pain0_2_entry.config(state="disabled")
+        # Area names and starting scores are fixed once tracking starts
+        for widgets in self.area_rows:
+            widgets[1].config(state="disabled")
+            widgets[3].config(state="disabled")
+        self.area_count_entry.config(state="disabled")
         self.start_button.config(state="disabled")
 
 
     def enable_entries(self):
-        # Re-enable entries for Area 1 and Area 2
-        self.pain_area_1_entry.config(state="normal")
-        self.pain_area_2_entry.config(state="normal")
-        self.pain0_1_entry.config(state="normal")
-        self.pain0_2_entry.config(state="normal")
+        for widgets in self.area_rows:
+            widgets[1].config(state="normal")
+            widgets[3].config(state="normal")
+        self.area_count_entry.config(state="normal")
         self.start_button.config(state="normal")
-        #self.current_pain_1_entry.config(state="normal")
-        #self.current_pain_2_entry.config(state="normal")
+
+class PainDashboard:
+    # Tracks several patients in one window, one notebook tab each. The tabs
+    # are plain PainTrackerApps without a figure of their own: they share one
+    # GraphPanel, so an extra patient costs its widgets and session, not
+    # another matplotlib canvas, and only the tab on screen ever renders.
+    # Each tab journals to its own patient-<n>.journal in journal_directory
+    # and the open tabs are restored from there on the next start.
+    def __init__(self, master, journal_directory=None):
+        self.master = master
+        self.journal_directory = journal_directory
+        self.startup_marks = {"imports": time.perf_counter() - STARTED}
+        self.on_startup_complete = None
+        self.ingest = None
+        self.tabs = []  # (frame, app, journal path) in notebook order
+        master.title("Pain Tracker - Dashboard")
+        master.geometry("1650x800")
+        self.status = tk.StringVar()
+
+        main_frame = ttk.Frame(master, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        master.columnconfigure(0, weight=1)
+        master.rowconfigure(0, weight=1)
+        left_frame = ttk.Frame(main_frame)
+        left_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        left_frame.columnconfigure(0, weight=1)
+        left_frame.rowconfigure(1, weight=1)
+        toolbar = ttk.Frame(left_frame)
+        toolbar.grid(row=0, column=0, sticky="ew")
+        ttk.Button(toolbar, text="New Patient", command=self.new_patient).grid(row=0, column=0, padx=5, pady=5)
+        ttk.Button(toolbar, text="Close Patient", command=self.close_patient).grid(row=0, column=1, padx=5, pady=5)
+        ttk.Label(toolbar, textvariable=self.status).grid(row=0, column=2, padx=5, sticky="w")
+        self.notebook = ttk.Notebook(left_frame)
+        self.notebook.grid(row=1, column=0, sticky="nsew")
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
+        self.graph_panel = GraphPanel(master, main_frame, Instrumentation.from_environment())
+        self.graph_panel.frame.grid(row=0, column=1, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.graph_panel.on_ready.append(self.on_graph_ready)
+
+        menubar = tk.Menu(master)
+        edit = tk.Menu(menubar, tearoff=0)
+        edit.add_command(label="Undo", accelerator="Ctrl+Z", command=lambda: self.forward("undo"))
+        edit.add_command(label="Redo", accelerator="Ctrl+Y", command=lambda: self.forward("redo"))
+        menubar.add_cascade(label="Edit", menu=edit)
+        master.config(menu=menubar)
+        for sequence, action in [("<Delete>", "delete_selected"), ("<Control-z>", "undo"), ("<Control-y>", "redo"), ("<Control-Z>", "redo")]:
+            master.bind(sequence, lambda event, action=action: self.forward(action))
+
+        for journal_path in self.saved_journals():
+            self.new_patient(journal_path)
+        if not self.tabs:
+            self.new_patient()
+        self.startup_marks["widgets"] = time.perf_counter() - STARTED
+        self.graph_panel.load()
+
+    def saved_journals(self):
+        if self.journal_directory is None:
+            return []
+        # Journals another dashboard has open are left to it, and files that
+        # only look like ours (patient-old.journal) are not ours at all
+        numbered = []
+        for path in glob.glob(os.path.join(self.journal_directory, "patient-*.journal")):
+            match = PATIENT_JOURNAL.fullmatch(os.path.basename(path))
+            try:
+                if match and not journal_in_use(path):
+                    numbered.append((int(match.group(1)), path))
+            except OSError:
+                continue  # Its lock cannot even be opened; new_patient would fail the same way
+        return [path for _, path in sorted(numbered)]
+
+    def next_journal_path(self):
+        if self.journal_directory is None:
+            return None
+        try:
+            os.makedirs(self.journal_directory, exist_ok=True)
+        except OSError as error:
+            messagebox.showerror("Error", f"Could not create {self.journal_directory}, so this patient will not be journaled: {error}")
+            return None
+        used = {os.path.basename(path) for path in glob.glob(os.path.join(self.journal_directory, "patient-*.journal"))}
+        number = 1
+        while f"patient-{number}.journal" in used:
+            number += 1
+        return os.path.join(self.journal_directory, f"patient-{number}.journal")
+
+    def new_patient(self, journal_path=None):
+        journal_path = journal_path or self.next_journal_path()
+        frame = ttk.Frame(self.notebook)
+        app = PainTrackerApp(self.master, journal_path, parent=frame, graph_panel=self.graph_panel)
+        self.tabs.append((frame, app, journal_path))
+        self.notebook.add(frame, text=f"Patient {len(self.tabs)}")
+        for variable in (app.patient_name, app.patient_nhi):
+            variable.trace_add("write", lambda *args, frame=frame, app=app: self.update_tab_title(frame, app))
+        self.notebook.select(frame)
+        self.show(app)
+        return app
+
+    def update_tab_title(self, frame, app):
+        title = app.patient_name.get() or app.patient_nhi.get()
+        if title:
+            self.notebook.tab(frame, text=title)
+
+    def current_app(self):
+        return self.graph_panel.active
+
+    def forward(self, action):
+        # Window-wide keys and menu commands go to the patient on screen
+        app = self.current_app()
+        if app is not None:
+            getattr(app, action)()
+
+    def on_tab_changed(self, event):
+        index = self.notebook.index("current")
+        if 0 <= index < len(self.tabs):
+            self.show(self.tabs[index][1])
+
+    def show(self, app):
+        if self.graph_panel.active is not app:
+            self.graph_panel.show(app)
+
+    def close_patient(self):
+        app = self.current_app()
+        if app is None:
+            return
+        if app.session is not None and not messagebox.askyesno("Close Patient", "Close this patient? Their readings are kept beside the journal in a .previous file."):
+            return
+        index = next(i for i, (_, tab_app, _) in enumerate(self.tabs) if tab_app is app)
+        frame, _, journal_path = self.tabs.pop(index)
+        journaled = app.journal is not None
+        if journaled:
+            app.journal.clear()
+        app.close()
+        if journaled:
+            os.remove(journal_path)
+        self.graph_panel.active = None
+        self.notebook.forget(frame)
+        frame.destroy()
+        if not self.tabs:
+            self.new_patient()
+        else:
+            self.notebook.select(self.tabs[min(index, len(self.tabs) - 1)][0])
+            self.show(self.tabs[min(index, len(self.tabs) - 1)][1])
+
+    def on_graph_ready(self):
+        self.startup_marks["graph"] = time.perf_counter() - STARTED
+        if self.current_app() is not None:
+            self.current_app().update_graph()
+        if self.on_startup_complete is not None:
+            self.on_startup_complete()
+
+    def start_ingest(self, server):
+        # As PainTrackerApp.start_ingest, but batches go to the tab whose
+        # patient NHI they name (the tab on screen if they name none)
+        self.ingest = server.start()
+        self.status.set(f"Receiving readings on {server.address}")
+        self.poll_ingest()
+
+    def poll_ingest(self):
+        from pain_ingest import answer_batches
+        try:
+            answer_batches(self.ingest, self.route_batch)
+        finally:
+            self.master.after(50, self.poll_ingest)
+
+    def route_batch(self, batch):
+        patient_nhi = batch.get("patient_nhi")
+        if patient_nhi is None:
+            app = self.current_app()
+        else:
+            app = next((tab_app for _, tab_app, _ in self.tabs if tab_app.patient_nhi.get() == patient_nhi), None)
+        if app is None:
+            return {"accepted": 0, "errors": [f"No open patient has NHI {patient_nhi}"]}
+        return app.apply_ingest(batch)
+
+
+def report_startup(app, quit_after):
+    marks = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in app.startup_marks.items())
+    print(f"Startup: {marks}", file=sys.stderr)
+    if quit_after:
+        app.master.after(0, app.master.destroy)
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track pain reduction after a diagnostic injection.")
+    # --startup-time prints how long the window and graph took to come up and
+    # exits; PAIN_TRACKER_STARTUP_TIME=1 prints the same and keeps running
+    parser.add_argument("--startup-time", action="store_true", help="Print startup timings and exit")
+    parser.add_argument("--journal", default=default_journal_path(), help="Session journal to restore from and write to")
+    parser.add_argument("--no-journal", action="store_true", help="Do not keep a session journal")
+    parser.add_argument("--dashboard", action="store_true", help="Track several patients in one window, one tab each")
+    parser.add_argument("--ingest-port", type=int, help="Accept readings as JSON lines on this localhost port")
+    parser.add_argument("--ingest-socket", help="Accept readings as JSON lines on this Unix socket")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = PainTrackerApp(root)
+    if args.dashboard:
+        # The tabs' journals go in a "dashboard" directory beside --journal
+        app = PainDashboard(root, journal_directory=None if args.no_journal else os.path.join(os.path.dirname(os.path.abspath(args.journal)), "dashboard"))
+    else:
+        app = PainTrackerApp(root, journal_path=None if args.no_journal else args.journal)
+    if args.ingest_port is not None or args.ingest_socket:
+        from pain_ingest import IngestServer
+        try:
+            app.start_ingest(IngestServer(port=args.ingest_port or 0, path=args.ingest_socket))
+        except OSError as error:
+            messagebox.showerror("Error", f"Could not start receiving readings: {error}")
+    if args.startup_time or os.environ.get("PAIN_TRACKER_STARTUP_TIME"):
+        app.on_startup_complete = lambda: report_startup(app, args.startup_time)
     root.mainloop()
+    if app.ingest is not None:
+        app.ingest.stop()
+    # A normal quit closes the window's journal cleanly, so the next start is
+    # a fresh one; the dashboard reopens its tabs, so their journals stay live
+    for tracker in [tab_app for _, tab_app, _ in app.tabs] if args.dashboard else [app]:
+        if tracker.journal is not None:
+            tracker.journal.close(clean=not args.dashboard)
@@ -10,7 +10,9 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Optional toolkits matplotlib can hook into; leaving them out keeps the
+    # onefile archive small, which is most of the cold start cost
+    excludes=['PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'wx', 'gi', 'IPython', 'pandas', 'scipy'],
     noarchive=False,
     optimize=0,
 )
@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
+from pain_session import reduction_percentage, target_pain_score
 
 class PainTrackerApp:
     def __init__(self, master):
@@ -48,7 +49,7 @@ class PainTrackerApp:
     def start_tracking(self):
         try:
             self.pain0.get()
-            self.target_pain_score = self.pain0.get() * 20 // 100
+            self.target_pain_score = target_pain_score(self.pain0.get())
             self.tree.delete(*self.tree.get_children())
             self.tree.insert("", "end", values=(f"Time 0", f"{self.pain0.get():3d}", f"N/A - Target for 80% Reduction: {self.target_pain_score}"))
             self.time_point = 0
@@ -60,8 +61,8 @@ class PainTrackerApp:
             current_pain = self.current_pain.get()
             if 0 <= current_pain <= 100:
                 self.time_point += 1
-                reduction_percentage = ((self.pain0.get() - current_pain) * 100) // self.pain0.get()
-                self.tree.insert("", "end", values=(f"Time {self.time_point}", f"{current_pain:3d}", f"{reduction_percentage}%"))
+                reduction = reduction_percentage(self.pain0.get(), current_pain)
+                self.tree.insert("", "end", values=(f"Time {self.time_point}", f"{current_pain:3d}", f"{reduction if reduction is not None else 'N/A'}%"))
             else:
                 messagebox.showerror("Error", "Pain score must be between 0 and 100.")
         except tk.TclError:
@@ -0,0 +1,88 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pain_import import find_legacy_files, import_file
+from pain_session import write_session_file
+
+
+def convert_file(path, member, output_base):
+    # Runs in a worker process. Each session found becomes <output_base>.json,
+    # or <output_base>-2.json and so on when a log holds several sessions.
+    # output_base keeps the log's extension (a.txt -> a.txt.json), so a.txt
+    # and a.tsv, or x.txt's second session and x-2.txt, never share a name.
+    # Also returns the rows that had to be left out.
+    started = time.perf_counter()
+    outputs = []
+    rows = 0
+    skipped = []
+    directory = os.path.dirname(output_base)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    for number, (session, use_minutes) in enumerate(import_file(path, member, skipped), 1):
+        output_path = f"{output_base}.json" if number == 1 else f"{output_base}-{number}.json"
+        write_session_file(output_path, session, options={"use_minutes": use_minutes})
+        outputs.append(output_path)
+        rows += len(session)
+    return outputs, rows, skipped, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert pain.bat pain_table.txt logs and copied table text into saved sessions.")
+    parser.add_argument("inputs", nargs="+", help="Log files (.txt/.tsv), zip archives of them, or directories to search")
+    parser.add_argument("-o", "--output-dir", default=".", help="Directory to write the session .json files to")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    sources = list(find_legacy_files(args.inputs))
+    if not sources:
+        print("No pain table logs found.", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    failures = 0
+    sessions = 0
+    rows = 0
+    skipped_rows = 0
+    claimed = {}  # output name -> the log converted to it
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = {}
+        for path, member, name in sources:
+            output_base = os.path.join(args.output_dir, name)
+            label = f"{path}:{member}" if member else path
+            # Workers run in parallel, so two logs with one output name would
+            # silently overwrite each other (e.g. a directory and a zip of it)
+            key = os.path.normcase(os.path.abspath(output_base))
+            if key in claimed:
+                failures += 1
+                print(f"FAILED {label}: would overwrite the sessions of {claimed[key]} in {output_base}.json", file=sys.stderr)
+                continue
+            claimed[key] = label
+            futures[pool.submit(convert_file, path, member, output_base)] = label
+        for future in as_completed(futures):
+            try:
+                outputs, row_count, skipped, seconds = future.result()
+            except Exception as error:
+                failures += 1
+                print(f"FAILED {futures[future]}: {error}", file=sys.stderr)
+                continue
+            sessions += len(outputs)
+            rows += row_count
+            skipped_rows += len(skipped)
+            print(f"{seconds:8.3f}s  {row_count:6d} rows  {len(outputs)} session(s)  {futures[future]}")
+            for note in skipped:
+                print(f"skipped {futures[future]} {note}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    done = len(sources) - failures
+    print(f"{done} files ({sessions} sessions, {rows} rows, {skipped_rows} unreadable row(s) skipped) in {elapsed:.2f}s with {args.jobs} workers: "
+          f"{done / elapsed:.1f} files/s, {failures} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from pain_service import DEFAULT_PORT, PainService, RendererPool, ServiceServer
+
+
+def report_throughput(service, interval):
+    # One line per interval: requests and their rate since the last line,
+    # plus the slowest route's latency percentiles
+    last_requests, last_time = 0, time.monotonic()
+    while True:
+        time.sleep(interval)
+        now, requests = time.monotonic(), service.requests
+        if requests == last_requests:
+            continue
+        routes = service.instrumentation.summary()
+        slowest = max(routes.items(), key=lambda item: item[1]["p95_ms"])
+        print(f"{requests - last_requests} requests ({(requests - last_requests) / (now - last_time):.1f}/s), {service.errors} errors in total, "
+              f"{len(service.sessions)} sessions; slowest: {slowest[0]} p50 {slowest[1]['p50_ms']:.1f} ms p95 {slowest[1]['p95_ms']:.1f} ms", file=sys.stderr)
+        last_requests, last_time = requests, now
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve pain tracking sessions as a JSON API, with graphs and PDF reports rendered on demand.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: this machine only; there is no authentication)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--renderers", type=int, default=min(4, os.cpu_count() or 1), help="Renderer processes for graphs and reports")
+    parser.add_argument("--backlog", type=int, help="Renders allowed to wait for a renderer before new ones are refused (default: twice --renderers)")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="Sessions held at once")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="Seconds between throughput lines on stderr (0 turns them off)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    renderers = RendererPool(max(1, args.renderers), args.backlog)
+    renderers.warm()
+    service = PainService(renderers, args.max_sessions)
+    try:
+        server = ServiceServer(service, args.host, args.port, args.verbose)
+    except OSError as error:
+        print(f"Could not listen on {args.host}:{args.port}: {error}", file=sys.stderr)
+        renderers.shutdown()
+        return 1
+    if args.stats_interval > 0:
+        threading.Thread(target=report_throughput, args=(service, args.stats_interval), daemon=True).start()
+    print(f"Serving on http://{args.host}:{server.server_port}/ with {renderers.workers} renderers; statistics at /stats", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        renderers.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
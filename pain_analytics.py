@@ -0,0 +1,116 @@
+import numpy as np
+
+from pain_session import read_session_file
+
+RESPONDER_THRESHOLD = 80
+
+
+def target_pain_scores(initial):
+    # Vector form of pain_session.target_pain_score
+    return np.asarray(initial, dtype=np.int32) * 20 // 100
+
+
+def reduction_percentages(initial, scores):
+    # Vector form of pain_session.reduction_percentage: floor division as in
+    # the GUI, NaN where the starting score is zero ("N/A")
+    initial = np.asarray(initial, dtype=np.int32)
+    scores = np.asarray(scores, dtype=np.int32)
+    safe = np.where(initial == 0, 1, initial)
+    reductions = ((initial - scores) * 100 // safe).astype(np.float64)
+    reductions[initial == 0] = np.nan
+    return reductions
+
+
+class Cohort:
+    # Every (session, area) pair is one curve. Curves are stored end to end in
+    # flat arrays, with offsets marking where each curve starts (CSR layout),
+    # so all the per-curve maths is a handful of whole-array operations.
+    def __init__(self, offsets, times, scores, initial, curve_session, curve_area, session_procedure):
+        self.offsets = offsets
+        self.times = times
+        self.scores = scores
+        self.initial = initial
+        self.curve_session = curve_session
+        self.curve_area = curve_area
+        self.session_procedure = session_procedure
+        lengths = np.diff(offsets)
+        self.curve_of_reading = np.repeat(np.arange(len(lengths)), lengths)
+        self.is_baseline = np.zeros(len(times), dtype=bool)
+        self.is_baseline[offsets[:-1]] = True
+
+    @property
+    def curve_count(self):
+        return len(self.initial)
+
+    @classmethod
+    def from_sessions(cls, sessions):
+        # sessions yields (PainSession, procedure name) pairs
+        times, scores, lengths, initial, curve_session, curve_area, procedures = [], [], [], [], [], [], []
+        for session_index, (session, procedure) in enumerate(sessions):
+            procedures.append(procedure)
+            session_times = np.frombuffer(session.times, dtype=np.int32)
+            for area, column in enumerate(session.scores):
+                times.append(session_times)
+                scores.append(np.frombuffer(column, dtype=np.uint8))
+                lengths.append(len(column))
+                initial.append(session.initial_scores[area])
+                curve_session.append(session_index)
+                curve_area.append(session.area_names[area])
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(
+            offsets,
+            np.concatenate(times) if times else np.empty(0, dtype=np.int32),
+            np.concatenate(scores).astype(np.int32) if scores else np.empty(0, dtype=np.int32),
+            np.asarray(initial, dtype=np.int32),
+            np.asarray(curve_session, dtype=np.int64),
+            np.asarray(curve_area, dtype=object),
+            np.asarray(procedures, dtype=object),
+        )
+
+    def reductions(self):
+        # Reduction curve for every reading; NaN on baselines and "N/A" curves
+        reductions = reduction_percentages(self.initial[self.curve_of_reading], self.scores)
+        reductions[self.is_baseline] = np.nan
+        return reductions
+
+    def peak_reduction(self):
+        reductions = self.reductions()
+        peaks = np.fmax.reduceat(reductions, self.offsets[:-1]) if len(reductions) else reductions
+        return peaks
+
+    def time_to_reduction(self, threshold=RESPONDER_THRESHOLD):
+        # Time of the first reading at or past the threshold, NaN if never
+        reached = self.reductions() >= threshold
+        candidates = np.where(reached, self.times, np.inf)
+        if not len(candidates):
+            return candidates
+        first = np.minimum.reduceat(candidates, self.offsets[:-1])
+        first[np.isinf(first)] = np.nan
+        return first
+
+    def responders(self, threshold=RESPONDER_THRESHOLD):
+        return self.peak_reduction() >= threshold
+
+    def responder_rates(self, groups, threshold=RESPONDER_THRESHOLD):
+        # groups labels each curve; returns {label: (rate, curves)} for curves
+        # that have a starting score to reduce from
+        valid = self.initial > 0
+        labels, inverse = np.unique(np.asarray(groups)[valid].astype(str), return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(labels))
+        hits = np.bincount(inverse, weights=self.responders(threshold)[valid], minlength=len(labels))
+        return {str(label): (float(hits[i] / counts[i]), int(counts[i])) for i, label in enumerate(labels)}
+
+    def responder_rates_by_procedure(self, threshold=RESPONDER_THRESHOLD):
+        return self.responder_rates(self.session_procedure[self.curve_session], threshold)
+
+    def responder_rates_by_area(self, threshold=RESPONDER_THRESHOLD):
+        return self.responder_rates(self.curve_area, threshold)
+
+
+def load_cohort(paths):
+    def sessions():
+        for path in paths:
+            session, patient, _ = read_session_file(path)
+            yield session, patient.get("procedure_name", "")
+    return Cohort.from_sessions(sessions())
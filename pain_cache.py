@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Part of every cache key: bump when the look of the graph or report changes,
+# so stale renderings are not reused
+RENDER_VERSION = 5
+
+# The display options that change what a graph or report looks like
+DISPLAY_OPTIONS = ("use_minutes", "show_actual_pain", "show_comments", "show_80_percent_line")
+
+
+def session_key(session, options, *extra):
+    # Content hash of everything that goes into a rendering: the readings,
+    # the display options and any extra JSON-able inputs (format, labels...)
+    digest = hashlib.sha256()
+    settings = {name: options[name] for name in DISPLAY_OPTIONS if name in options}
+    if session is None:
+        digest.update(json.dumps([None, settings, extra], sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+    digest.update(json.dumps([session.area_names, session.initial_scores, settings, extra], sort_keys=True).encode("utf-8"))
+    digest.update(session.times.tobytes())
+    for column in session.scores:
+        digest.update(column.tobytes())
+    for comment in session.comments:
+        digest.update(comment.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class RenderCache:
+    # In-memory LRU bounded by the total size of its values, where size is
+    # whatever the caller says (bytes for rendered graphs). Shared between the
+    # GUI and its export worker thread, hence the lock.
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.total -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.total += size
+            while self.total > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.total -= evicted
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total = 0
+
+
+class DiskCache:
+    # Content-addressed files under a directory, so separate processes (the
+    # batch workers, later runs) share renderings. Reads touch the file's
+    # modification time, and the oldest files go first once the directory
+    # grows past max_bytes.
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key, suffix):
+        path = self.path(key, suffix)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return data
+
+    def put(self, key, suffix, data):
+        # Written beside the target and swapped in, so a reader in another
+        # process never sees half a file
+        path = self.path(key, suffix)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+        self.trim()
+
+    def trim(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
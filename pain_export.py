@@ -0,0 +1,180 @@
+import csv
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for Parquet and Arrow output
+    pa = None
+
+from pain_session import read_session_file
+
+# One row per reading per area ("long" format), the shape warehouses load best
+COLUMNS = ["session", "patient_nhi", "procedure_name", "procedure_date", "area", "reading", "time", "time_unit",
+           "initial_score", "target_score", "score", "reduction", "comment"]
+FORMATS = ("csv", "parquet", "arrow", "fhir")
+NHI_SYSTEM = "https://standards.digital.health.nz/ns/nhi-id"
+UCUM = "http://unitsofmeasure.org"
+# Fixed namespace so the same reading always gets the same Observation id
+OBSERVATION_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "pain-tracker/observation")
+
+
+def iter_sessions(paths):
+    # (session id, session, patient, options) for each saved session file,
+    # read one at a time so only one session is ever held in memory
+    for path in paths:
+        session, patient, options = read_session_file(path)
+        yield os.path.splitext(os.path.basename(path))[0], session, patient, options
+
+
+def reading_records(session_id, session, patient, use_minutes):
+    # Reduction is None for the starting reading and when the starting score is 0
+    time_unit = "min" if use_minutes else "point"
+    for index in range(len(session)):
+        for area in range(session.area_count):
+            yield {
+                "session": session_id,
+                "patient_nhi": patient.get("nhi", ""),
+                "procedure_name": patient.get("procedure_name", ""),
+                "procedure_date": patient.get("procedure_date", ""),
+                "area": session.area_names[area],
+                "reading": index,
+                "time": session.times[index],
+                "time_unit": time_unit,
+                "initial_score": session.initial_scores[area],
+                "target_score": session.targets[area],
+                "score": session.scores[area][index],
+                "reduction": session.reduction(area, index),
+                "comment": session.comments[index],
+            }
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.file, COLUMNS)
+        self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerow(record)
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowWriter:
+    # Buffers up to batch_rows records column-wise, then hands them to the
+    # Parquet or Arrow IPC writer as one record batch (a Parquet row group)
+    SCHEMA_TYPES = {"reading": "int32", "time": "int32", "initial_score": "int16", "target_score": "int16", "score": "int16", "reduction": "int32"}
+
+    def __init__(self, path, parquet=True, batch_rows=65536):
+        if pa is None:
+            raise RuntimeError("Parquet and Arrow output need pyarrow (pip install pyarrow)")
+        self.schema = pa.schema([(name, getattr(pa, self.SCHEMA_TYPES.get(name, "string"))()) for name in COLUMNS])
+        self.batch_rows = batch_rows
+        self.columns = {name: [] for name in COLUMNS}
+        self.rows = 0
+        if parquet:
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.sink = pa.OSFile(path, "wb")
+            self.writer = pa.ipc.new_file(self.sink, self.schema)
+
+    def write(self, record):
+        for name, values in self.columns.items():
+            values.append(record[name])
+        self.rows += 1
+        if self.rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_batch(pa.record_batch([self.columns[name] for name in COLUMNS], schema=self.schema))
+            self.columns = {name: [] for name in COLUMNS}
+            self.rows = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        if hasattr(self, "sink"):
+            self.sink.close()
+
+
+class FhirBundleWriter:
+    # A FHIR R4 collection Bundle of pain score Observations, written entry by
+    # entry so the bundle never has to be built in memory
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+        self.file.write('{"resourceType":"Bundle","type":"collection","entry":[\n')
+        self.first = True
+
+    def write(self, record):
+        observation_id = uuid.uuid5(OBSERVATION_NAMESPACE, f"{record['session']}/{record['area']}/{record['reading']}")
+        entry = {"fullUrl": f"urn:uuid:{observation_id}", "resource": observation(record)}
+        self.file.write(("" if self.first else ",\n") + json.dumps(entry, separators=(",", ":")))
+        self.first = False
+
+    def close(self):
+        self.file.write("\n]}\n")
+        self.file.close()
+
+
+def observation(record):
+    if record["time_unit"] == "min":
+        elapsed = {"code": {"text": "Time after starting reading"}, "valueQuantity": {"value": record["time"], "unit": "min", "system": UCUM, "code": "min"}}
+    else:
+        elapsed = {"code": {"text": "Time point"}, "valueInteger": record["time"]}
+    resource = {
+        "resourceType": "Observation",
+        "status": "final",
+        "code": {"coding": [{"system": "http://loinc.org", "code": "38208-5", "display": "Pain severity - Reported"}], "text": "Pain score (0-100)"},
+        "bodySite": {"text": record["area"]},
+        "valueQuantity": {"value": record["score"], "unit": "score", "system": UCUM, "code": "{score}"},
+        "component": [elapsed],
+    }
+    if record["patient_nhi"]:
+        resource["subject"] = {"identifier": {"system": NHI_SYSTEM, "value": record["patient_nhi"]}}
+    try:
+        resource["effectiveDateTime"] = datetime.strptime(record["procedure_date"], "%d-%m-%Y").date().isoformat()
+    except ValueError:
+        pass
+    if record["reduction"] is not None:
+        resource["component"].append({"code": {"text": "Reduction from starting pain"},
+                                      "valueQuantity": {"value": record["reduction"], "unit": "%", "system": UCUM, "code": "%"}})
+    if record["comment"]:
+        resource["note"] = [{"text": record["comment"]}]
+    return resource
+
+
+def open_writer(path, format):
+    if format == "csv":
+        return CsvWriter(path)
+    if format in ("parquet", "arrow"):
+        return ArrowWriter(path, parquet=format == "parquet")
+    if format == "fhir":
+        return FhirBundleWriter(path)
+    raise ValueError(f"Unknown export format {format!r}")
+
+
+def export_sessions(sessions, path, format, progress=None):
+    # sessions yields (session id, session, patient, options), e.g. from
+    # iter_sessions; everything streams, so memory stays flat however many
+    # sessions there are. Returns counts and timings for a throughput report.
+    started = time.perf_counter()
+    writer = open_writer(path, format)
+    session_count = records = 0
+    try:
+        for session_id, session, patient, options in sessions:
+            for record in reading_records(session_id, session, patient, options["use_minutes"]):
+                writer.write(record)
+                records += 1
+            session_count += 1
+            if progress is not None:
+                progress(session_count, records)
+    finally:
+        writer.close()
+    return {"sessions": session_count, "records": records, "bytes": os.path.getsize(path), "seconds": time.perf_counter() - started}
@@ -0,0 +1,399 @@
+import numpy as np
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.lines import Line2D
+from matplotlib.markers import MarkerStyle
+from matplotlib.textpath import text_to_path
+from matplotlib.transforms import Bbox, IdentityTransform
+
+# Colour and marker per area; areas past the end of the list reuse it in order
+AREA_STYLES = [("blue", "o"), ("red", "s"), ("green", "^"), ("darkorange", "D"),
+               ("purple", "v"), ("brown", "P"), ("magenta", "X"), ("grey", "*")]
+MARKER_SIZE = 6  # points, as Line2D's default
+COMMENT_PAD = 0.3  # box padding, in units of the font size
+COMMENT_BOX = dict(boxstyle=f"round,pad={COMMENT_PAD}", fc="yellow", ec="b", lw=1, alpha=0.8)
+COMMENT_OFFSET = 30  # points above the reading
+COMMENT_SAMPLE = "Pain eased 0123456789 lp"  # measured to size comment boxes
+LABEL_FONT_SIZE = 9
+
+
+def area_style(area):
+    return AREA_STYLES[area % len(AREA_STYLES)]
+
+
+def marker_path(marker):
+    style = MarkerStyle(marker)
+    return style.get_path().transformed(style.get_transform())
+
+
+def text_width(text, prop, cache={}):
+    # Width in points as the sum of the characters' advances, each measured
+    # once per font size; close enough to the laid-out width to place boxes
+    # without laying out every comment
+    size = prop.get_size_in_points()
+    width = 0.0
+    for char in text:
+        key = (char, size)
+        if key not in cache:
+            cache[key] = text_to_path.get_text_width_height_descent(char, prop, ismath=False)[0]
+        width += cache[key]
+    return width
+
+
+def lttb_indices(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: picks threshold points that keep the
+    # visual shape of the curve, always including the first and last reading
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        average_x = x[end:next_end].mean()
+        average_y = y[end:next_end].mean()
+        areas = np.abs((x[a] - average_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (average_y - y[a]))
+        a = start + int(areas.argmax())
+        indices[bucket + 1] = a
+    return indices
+
+
+class Occupancy:
+    # Screen-space boxes already taken by labels, bucketed on a coarse grid so
+    # each placement only checks its neighbours
+    def __init__(self, bounds, cell=32):
+        self.bounds = bounds
+        self.cell = cell
+        self.grid = {}
+
+    def place(self, x0, y0, x1, y1, clip=True, contain=False):
+        # Claims the box and returns True if it is free and, with clip, if it
+        # is anchored inside the axes (labels may overhang the edges a little)
+        # or, with contain, if all of it is inside
+        if clip and not (self.bounds.x0 <= (x0 + x1) / 2 <= self.bounds.x1 and self.bounds.y0 <= y0 <= self.bounds.y1):
+            return False
+        if contain and not (self.bounds.x0 <= x0 and x1 <= self.bounds.x1 and self.bounds.y0 <= y0 and y1 <= self.bounds.y1):
+            return False
+        cells = [(cx, cy) for cx in range(int(x0 // self.cell), int(x1 // self.cell) + 1)
+                 for cy in range(int(y0 // self.cell), int(y1 // self.cell) + 1)]
+        for key in cells:
+            for bx0, by0, bx1, by1 in self.grid.get(key, ()):
+                if x0 < bx1 and bx0 < x1 and y0 < by1 and by0 < y1:
+                    return False
+        for key in cells:
+            self.grid.setdefault(key, []).append((x0, y0, x1, y1))
+        return True
+
+
+class PainGraph:
+    # Keeps one set of artists alive for the lifetime of the figure and only
+    # updates their data. Every area's curve is one segment of a single
+    # LineCollection and every marker one point of a single PathCollection, so
+    # the cost of drawing does not grow with the number of areas. With a canvas
+    # and blit=True the data artists are animated: axes, legend and target
+    # lines form a cached background and a normal update just restores it,
+    # redraws the animated artists and blits only where they changed.
+    def __init__(self, figure, canvas=None, blit=False):
+        self.figure = figure
+        self.canvas = canvas
+        self.blit = blit and canvas is not None and canvas.supports_blit
+        self.ax = figure.add_subplot(111)
+        self.ax.set_title("Pain Graph")
+        self.ax.set_xlabel("Time")
+        self.ax.set_ylabel("Pain Score")
+        self.ax.set_ylim(0, 100)
+        self.ax.set_xlim(0, 1)
+        self.ax.set_yticks(range(0, 101, 10))
+
+        self.curves = LineCollection([], linestyles='-', animated=self.blit)
+        self.ax.add_collection(self.curves, autolim=False)
+        self.markers = PathCollection([], sizes=[MARKER_SIZE ** 2], offsets=np.empty((0, 2)),
+                                      offset_transform=self.ax.transData, animated=self.blit)
+        self.ax.add_collection(self.markers, autolim=False)
+        self.markers.set_transform(IdentityTransform())  # marker sizes are in points, as scatter does
+        self.legend_handles = []
+        self.target_lines = []
+        self.value_labels = []
+        self.comment_boxes = []
+        self.comment_font = FontProperties()
+        self.empty_text = self.ax.text(0.5, 50, "No data yet", ha='center', va='center')
+
+        self._label_state = []
+        self._comment_state = []
+        self._layout_key = None
+        self._background = None
+        self._points = []  # per area, the curve points last drawn
+        self._dirty = []  # display boxes that changed since the last draw
+        self._extents = {}  # label or comment box -> its extent when last drawn
+        self._changed = set()  # labels and comment boxes to measure again
+        self._last_update = None
+        self._line_metrics = None  # (dpi, width scale, first line height, line step) of comments
+        self.full_draws = 0
+        self.blits = 0
+        if self.blit:
+            canvas.mpl_connect("draw_event", self._on_draw)
+        if canvas is not None:
+            canvas.mpl_connect("resize_event", self._on_resize)
+
+    def animated_artists(self):
+        artists = [self.curves, self.markers]
+        for labels in self.value_labels:
+            artists.extend(label for label in labels if label.get_visible())
+        artists.extend(box for box in self.comment_boxes if box.get_visible())
+        return artists
+
+    def update(self, session, use_minutes=True, show_actual_pain=True, show_comments=True, show_80_percent_line=False):
+        self._last_update = (session, use_minutes, show_actual_pain, show_comments, show_80_percent_line)
+        area_count = session.area_count if session is not None else 0
+        has_data = area_count > 0 and len(session) > 0
+
+        # Target lines first: they are part of the layout
+        while len(self.target_lines) < area_count:
+            self.target_lines.append(self.ax.axhline(y=0, color=area_style(len(self.target_lines))[0], linestyle='--', visible=False))
+            self.value_labels.append([])
+            self._label_state.append([])
+        for area, target_line in enumerate(self.target_lines):
+            visible = has_data and show_80_percent_line and area < area_count
+            if visible:
+                target_line.set_ydata([session.targets[area]] * 2)
+                target_line.set_label(f'80% Reduction ({session.area_names[area]})')
+            target_line.set_visible(visible)
+
+        xlim = self._x_limits(session.times) if has_data else (0, 1)
+        layout_key = (
+            xlim,
+            has_data,
+            show_80_percent_line,
+            "Minutes" if use_minutes else "Time",
+            tuple(session.area_names) if has_data else (),
+            tuple(session.targets) if has_data else (),
+        )
+        relayout = layout_key != self._layout_key
+        if relayout:
+            self._layout_key = layout_key
+            self._relayout(xlim, has_data, use_minutes, session.area_names if has_data else [])
+
+        # Level of detail: lines are thinned to about one point per pixel
+        # column, and labels and comment boxes only go where they fit
+        times = np.asarray(session.times, dtype=float) if has_data else np.empty(0)
+        pixel_width = max(3, int(self.ax.bbox.width))
+        occupied = Occupancy(self.ax.bbox)
+        to_pixels = self.ax.transData.transform
+
+        wanted = []
+        if has_data and show_comments:
+            columns = session.scores[:area_count]
+            scale = self.figure.dpi / 72
+            lift = COMMENT_OFFSET * scale
+            pad = COMMENT_PAD * self.comment_font.get_size_in_points() * scale
+            for i, comment in enumerate(session.comments):
+                if comment:
+                    y = max(column[i] for column in columns)
+                    px, py = to_pixels((times[i], y))
+                    width, height = self._comment_size(comment)
+                    # The text's bottom edge sits lift above the reading and
+                    # the box adds pad all round
+                    if occupied.place(px - width / 2 - pad, py + lift - pad, px + width / 2 + pad, py + lift + height + pad, clip=False, contain=True):
+                        wanted.append((session.times[i], y, comment))
+        self._sync_comment_boxes(wanted)
+
+        label_height = LABEL_FONT_SIZE * self.figure.dpi / 72
+        segments, colors, paths, facecolors = [], [], [], []
+        for area in range(len(self.value_labels)):
+            wanted = []
+            if has_data and area < area_count:
+                color, marker = area_style(area)
+                scores = np.asarray(session.scores[area], dtype=float)
+                kept = lttb_indices(times, scores, pixel_width) if len(times) > 2 * pixel_width else np.arange(len(times))
+                points = np.column_stack((times[kept], scores[kept]))
+                segments.append(points)
+                colors.append(color)
+                paths.extend([marker_path(marker)] * len(points))
+                facecolors.extend([color] * len(points))
+                if show_actual_pain:
+                    pixels = to_pixels(points + (0, 2))
+                    for index, (px, py) in zip(kept.tolist(), pixels.tolist()):
+                        y = session.scores[area][index]
+                        width = len(str(y)) * 0.6 * label_height
+                        if occupied.place(px - width / 2, py, px + width / 2, py + label_height):
+                            wanted.append((session.times[index], y + 2, f"{y}"))
+            self._sync_value_labels(area, wanted)
+        if not relayout:
+            self._mark_curves(segments)
+        self._points = segments
+        self.curves.set_segments(segments)
+        self.curves.set_colors(colors)
+        self.markers.set_paths(paths)
+        self.markers.set_offsets(np.concatenate(segments) if segments else np.empty((0, 2)))
+        self.markers.set_facecolors(facecolors)
+        self.markers.set_edgecolors(facecolors)
+
+        self.redraw(full=relayout)
+
+    def _comment_size(self, comment):
+        # Size of a comment's text in pixels. Line heights, and how much wider
+        # than text_width the renderer sets text, come from laying out a
+        # sample once per dpi.
+        if self._line_metrics is None or self._line_metrics[0] != self.figure.dpi:
+            probe = self.ax.text(0, 0, COMMENT_SAMPLE, fontproperties=self.comment_font)
+            extent = probe.get_window_extent()
+            probe.set_text(COMMENT_SAMPLE + "\n" + COMMENT_SAMPLE)
+            step = probe.get_window_extent().height - extent.height
+            probe.remove()
+            scale = extent.width / text_width(COMMENT_SAMPLE, self.comment_font)
+            self._line_metrics = (self.figure.dpi, scale, extent.height, step)
+        _, scale, first, step = self._line_metrics
+        lines = comment.split("\n")
+        return max(text_width(line, self.comment_font) for line in lines) * scale, first + step * (len(lines) - 1)
+
+    def _mark_curves(self, segments):
+        # The part of each curve after the first point that moved, before and
+        # after, with room for the markers
+        pad = (MARKER_SIZE / 2 + 2) * self.figure.dpi / 72
+        to_pixels = self.ax.transData.transform
+        for area in range(max(len(segments), len(self._points))):
+            old = self._points[area] if area < len(self._points) else np.empty((0, 2))
+            new = segments[area] if area < len(segments) else np.empty((0, 2))
+            common = min(len(old), len(new))
+            differs = np.flatnonzero((old[:common] != new[:common]).any(axis=1))
+            first = int(differs[0]) if len(differs) else common
+            if first == len(old) == len(new):
+                continue
+            changed = np.concatenate((old[max(0, first - 1):], new[max(0, first - 1):]))
+            pixels = to_pixels(changed)
+            self._dirty.append(Bbox([pixels.min(axis=0) - pad, pixels.max(axis=0) + pad]))
+
+    def reset(self):
+        # Forgets the layout so the next update redraws everything, e.g. when
+        # the graph is handed over to another patient's session
+        self._layout_key = None
+
+    def _x_limits(self, times):
+        lo, hi = min(times), max(times)
+        if lo == hi:
+            return (lo - 0.5, hi + 0.5)
+        if not self.blit:
+            return (lo, hi)
+        # Live view keeps some headroom on the right so most new readings fit
+        # inside the current limits and only need a blit
+        current = self._layout_key[0] if self._layout_key else None
+        span = hi - lo
+        if current and current[0] == lo and current[1] >= hi and current[1] - lo <= span * 2:
+            return current
+        return (lo, lo + span * 1.25)
+
+    def _relayout(self, xlim, has_data, use_minutes, area_names):
+        self.ax.set_xlim(*xlim)
+        self.ax.set_xlabel("Time" if not use_minutes else "Minutes")
+        self.empty_text.set_visible(not has_data)
+        legend = self.ax.get_legend()
+        if legend is not None:
+            legend.remove()
+        if has_data:
+            # The collections have no per-area artist, so the legend gets
+            # stand-in lines that are never drawn on the axes
+            self.legend_handles = [Line2D([], [], color=area_style(area)[0], marker=area_style(area)[1], label=name)
+                                   for area, name in enumerate(area_names)]
+            handles = list(self.legend_handles)
+            handles.extend(line for line in self.target_lines if line.get_visible())
+            self.ax.legend(handles=handles)
+
+    def _sync_value_labels(self, area, wanted):
+        labels = self.value_labels[area]
+        state = self._label_state[area]
+        color = area_style(area)[0]
+        while len(labels) < len(wanted):
+            labels.append(self.ax.text(0, 0, "", ha='center', va='bottom', fontsize=LABEL_FONT_SIZE, color=color, animated=self.blit))
+            state.append(None)
+        for i, label in enumerate(labels):
+            if i < len(wanted):
+                if state[i] != wanted[i] or not label.get_visible():
+                    x, y, text = wanted[i]
+                    label.set_position((x, y))
+                    label.set_text(text)
+                    state[i] = wanted[i]
+                    label.set_visible(True)
+                    self._changed.add(label)
+            elif label.get_visible():
+                label.set_visible(False)
+                self._changed.add(label)
+
+    def _sync_comment_boxes(self, wanted):
+        boxes = self.comment_boxes
+        state = self._comment_state
+        while len(boxes) < len(wanted):
+            boxes.append(self.ax.annotate("", (0, 0), xytext=(0, COMMENT_OFFSET), textcoords="offset points", ha='center', va='bottom',
+                                          bbox=COMMENT_BOX, fontproperties=self.comment_font, clip_on=True, animated=self.blit))
+            state.append(None)
+        for i, box in enumerate(boxes):
+            if i < len(wanted):
+                if state[i] != wanted[i] or not box.get_visible():
+                    x, y, comment = wanted[i]
+                    box.xy = (x, y)
+                    box.set_text(comment)
+                    state[i] = wanted[i]
+                    box.set_visible(True)
+                    self._changed.add(box)
+            elif box.get_visible():
+                box.set_visible(False)
+                self._changed.add(box)
+
+    def redraw(self, full=True):
+        if self.canvas is None or not self.blit:
+            self._dirty = []
+            self._changed = set()
+        if self.canvas is None:
+            return
+        if full or not self.blit or self._background is None:
+            self.full_draws += 1
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._background)
+        for artist in self.animated_artists():
+            self.ax.draw_artist(artist)
+        # Only the screen area that changed is copied out: the curves from
+        # their first moved point on, and where each changed label or comment
+        # box was and now is
+        renderer = self.canvas.get_renderer()
+        dirty = self._dirty
+        for artist in self._changed:
+            if artist in self._extents:
+                dirty.append(self._extents.pop(artist))
+            if artist.get_visible():
+                self._extents[artist] = self._extent(artist, renderer)
+                dirty.append(self._extents[artist])
+        self._dirty = []
+        self._changed = set()
+        region = Bbox.intersection(Bbox.union(dirty).padded(2), self.figure.bbox) if dirty else None
+        if region is not None:
+            self.blits += 1
+            self.canvas.blit(region)
+
+    def _extent(self, artist, renderer):
+        # A comment's extent includes its yellow box, which text extents leave out
+        extent = artist.get_window_extent(renderer)
+        patch = artist.get_bbox_patch()
+        return Bbox.union([extent, patch.get_window_extent(renderer)]) if patch is not None else extent
+
+    def _on_resize(self, event):
+        # Label culling and thinning depend on the pixel size of the axes
+        if self._last_update is not None:
+            self._layout_key = None
+            self.update(*self._last_update)
+
+    def _on_draw(self, event):
+        # A full draw leaves out the animated artists; cache that as the
+        # background, then paint them on top
+        if self.canvas.is_saving():
+            return
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for artist in self.animated_artists():
+            self.ax.draw_artist(artist)
+        # Everything is on screen as drawn; later blits measure from here
+        renderer = self.canvas.get_renderer()
+        self._dirty = []
+        self._changed = set()
+        self._extents = {artist: self._extent(artist, renderer) for artist in self.animated_artists()[2:]}
@@ -0,0 +1,174 @@
+import contextlib
+import io
+import itertools
+import os
+import re
+import zipfile
+
+from pain_session import PainSession, valid_time
+from pain_stats import STATS_HEADER
+
+LEGACY_EXTENSIONS = (".txt", ".tsv")
+# pain.bat rows: "Time 3| Pain Score:  10 | Reduction: 90% "
+PAIN_TABLE_ROW = re.compile(r"\s*Time\s+(\d+)\s*\|\s*Pain Score:\s*(\d+)\s*\|")
+# First cell of a copy_to_clipboard row: "30 min" or "Time 3"
+CLIPBOARD_TIME = re.compile(r"\s*(?:(\d+) min|Time (\d+))\s*$")
+
+
+def check_score(score, number):
+    if not 0 <= score <= 100:
+        raise ValueError(f"line {number}: pain score {score} is not between 0 and 100")
+    return score
+
+
+def check_time(time_point, number):
+    if not valid_time(time_point):
+        raise ValueError(f"line {number}: time {time_point} is too large")
+    return time_point
+
+
+def parse_pain_table(lines, skipped=None):
+    # pain.bat's pain_table.txt: a header, a "Time 0" row with the starting
+    # score, then one row per time point. Reductions are recomputed from the
+    # scores rather than trusted. Yields (session, use_minutes) pairs; a new
+    # "Time 0" row starts a new session, so concatenated logs work too.
+    # pain.bat writes whatever was typed, e.g. "Pain Score: abc", so rows that
+    # cannot be read are left out and described in skipped, if given, rather
+    # than losing the rest of the log.
+    session = None
+    for number, line in enumerate(lines, 1):
+        if not line.strip() or line.lstrip().upper().startswith("TIME N|"):
+            continue
+        try:
+            match = PAIN_TABLE_ROW.match(line)
+            if match is None:
+                raise ValueError(f"line {number}: not a pain table row: {line.strip()!r}")
+            time_point, score = check_time(int(match.group(1)), number), check_score(int(match.group(2)), number)
+            if time_point and session is None:
+                raise ValueError(f"line {number}: reading before the Time 0 row")
+        except ValueError as error:
+            if skipped is not None:
+                skipped.append(str(error))
+            continue
+        if time_point == 0:
+            if session is not None:
+                yield session, False
+            session = PainSession([score])
+        else:
+            session.add_reading(time_point, [score])
+    if session is not None:
+        yield session, False
+
+
+def parse_clipboard_tsv(lines):
+    # copy_to_clipboard output, as pasted into spreadsheets: time, a
+    # score/reduction pair per area slot ("N/A" for untracked slots), comment.
+    # A reduction cell of "N/A - Target..." marks the starting reading, which
+    # starts a new session. Area names are taken from a "<name> Pain" header.
+    # The statistics table copied after the readings is skipped.
+    session = None
+    names = None
+    tracked = []
+    in_statistics = False
+    for number, line in enumerate(lines, 1):
+        fields = line.rstrip("\r\n").split("\t")
+        if not line.strip():
+            continue
+        match = CLIPBOARD_TIME.match(fields[0])
+        if fields[:2] == STATS_HEADER[:2]:
+            in_statistics = True  # The summary copied after the readings
+            continue
+        if match is None and in_statistics and fields[0].strip() != "Time":
+            continue
+        in_statistics = False
+        if match is None:
+            if fields[0].strip() != "Time":
+                raise ValueError(f"line {number}: not a pain table row: {line.strip()!r}")
+            pain_columns = fields[1:-1:2]
+            names = [field[:-len(" Pain")] for field in pain_columns] if all(field.endswith(" Pain") for field in pain_columns) else None
+            continue
+        if len(fields) < 4 or len(fields) % 2:
+            raise ValueError(f"line {number}: expected time, score/reduction pairs and a comment, got {len(fields)} columns")
+        use_minutes = match.group(1) is not None
+        time_point = check_time(int(match.group(1) or match.group(2)), number)
+        pain_fields = [field.strip() for field in fields[1:-1:2]]
+        comment = fields[-1]
+        if fields[2].startswith("N/A - Target"):
+            if session is not None:
+                yield session, session_minutes
+            tracked = [slot for slot, field in enumerate(pain_fields) if field != "N/A"]
+            area_names = [names[slot] for slot in tracked] if names and len(names) == len(pain_fields) else None
+            session = PainSession([check_score(int(pain_fields[slot]), number) for slot in tracked], area_names)
+            session.comments[0] = comment
+            session_minutes = use_minutes
+        elif session is None:
+            raise ValueError(f"line {number}: reading before the starting row")
+        else:
+            try:
+                scores = [check_score(int(pain_fields[slot]), number) for slot in tracked]
+            except (IndexError, ValueError) as error:
+                raise ValueError(f"line {number}: bad pain score ({error})") from None
+            session.add_reading(time_point, scores, comment)
+    if session is not None:
+        yield session, session_minutes
+
+
+def parse_lines(lines, skipped=None):
+    # Picks the parser from the first non-blank line: clipboard rows have
+    # tabs. skipped collects the pain table rows that were left out.
+    lines = iter(lines)
+    for first in lines:
+        if first.strip():
+            break
+    else:
+        return
+    if "\t" in first:
+        yield from parse_clipboard_tsv(itertools.chain([first], lines))
+    else:
+        yield from parse_pain_table(itertools.chain([first], lines), skipped)
+
+
+@contextlib.contextmanager
+def open_text(path, member=None):
+    # member names a file inside the zip archive at path
+    if member is None:
+        with open(path, encoding="utf-8", errors="replace", newline="") as file:
+            yield file
+    else:
+        with zipfile.ZipFile(path) as archive, archive.open(member) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="")
+
+
+def import_file(path, member=None, skipped=None):
+    # Streams the file line by line; yields (session, use_minutes) pairs
+    with open_text(path, member) as file:
+        yield from parse_lines(file, skipped)
+
+
+def find_legacy_files(inputs):
+    # Yields (path, member, name) for every .txt/.tsv file in the inputs,
+    # walking directories and zip archives; name is the path relative to the
+    # input it was found under, used to name the converted session
+    for path in inputs:
+        if os.path.isdir(path):
+            for directory, subdirectories, files in os.walk(path):
+                subdirectories.sort()
+                for file_name in sorted(files):
+                    full_path = os.path.join(directory, file_name)
+                    if file_name.lower().endswith(".zip"):
+                        yield from zip_members(full_path, os.path.relpath(full_path, path))
+                    elif file_name.lower().endswith(LEGACY_EXTENSIONS):
+                        yield full_path, None, os.path.relpath(full_path, path)
+        elif path.lower().endswith(".zip"):
+            yield from zip_members(path, os.path.basename(path))
+        else:
+            yield path, None, os.path.basename(path)
+
+
+def zip_members(path, name):
+    with zipfile.ZipFile(path) as archive:
+        members = sorted(info.filename for info in archive.infolist() if not info.is_dir())
+    stem = os.path.splitext(name)[0]
+    for member in members:
+        if member.lower().endswith(LEGACY_EXTENSIONS):
+            yield path, member, os.path.join(stem, *member.split("/"))
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import queue
+import socket
+import threading
+from concurrent.futures import Future
+
+from pain_session import check_reading
+
+MAX_MESSAGE = 1024 * 1024  # bytes per request line
+DEFAULT_PORT = 8765
+
+
+class IngestServer:
+    # Accepts batches of readings as newline-delimited JSON on a local TCP
+    # port (or a Unix socket), one request per line and one reply per line:
+    #
+    #   {"patient_nhi": "ABC1234", "readings": [{"scores": [40, 20], "time": 45, "comment": "..."}]}
+    #   {"accepted": 1, "errors": []}
+    #
+    # The asyncio loop runs on its own thread and never touches Tk: each batch
+    # goes onto `batches` with a Future, the Tk side applies it from its own
+    # event loop (see PainTrackerApp.poll_ingest) and sets the reply.
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, path=None, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.timeout = timeout
+        self.batches = queue.Queue()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.error = None
+        self._ready = threading.Event()
+
+    @property
+    def address(self):
+        return self.path or f"{self.host}:{self.port}"
+
+    def start(self):
+        # Returns once the socket is listening; with port=0 the OS picks one
+        self.thread = threading.Thread(target=self._run, name="pain-ingest", daemon=True)
+        self.thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def stop(self):
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            if self.path:
+                start = asyncio.start_unix_server(self._serve, path=self.path, limit=MAX_MESSAGE)
+            else:
+                start = asyncio.start_server(self._serve, self.host, self.port, limit=MAX_MESSAGE)
+            self.server = self.loop.run_until_complete(start)
+            if not self.path:
+                self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as error:
+            self.error = error
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    reply = {"accepted": 0, "errors": [f"Request longer than {MAX_MESSAGE} bytes"]}
+                    writer.write((json.dumps(reply) + "\n").encode("utf-8"))
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    reply = await self._handle(line)
+                    writer.write((json.dumps(reply) + "\n").encode("utf-8"))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, line):
+        try:
+            batch = json.loads(line)
+            if not isinstance(batch, dict) or not isinstance(batch.get("readings"), list):
+                raise ValueError("expected an object with a \"readings\" list")
+        except ValueError as error:
+            return {"accepted": 0, "errors": [f"Bad request: {error}"]}
+        reply = Future()
+        self.batches.put((batch, reply))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(reply), self.timeout)
+        except asyncio.TimeoutError:
+            return {"accepted": 0, "errors": ["The tracker did not respond in time"]}
+
+
+def answer_batches(server, apply):
+    # Applies every batch waiting on server.batches with apply(batch) and
+    # sets its reply. A batch that raises still gets a reply, so its client
+    # is not left waiting and the batches behind it are still applied.
+    while True:
+        try:
+            batch, reply = server.batches.get_nowait()
+        except queue.Empty:
+            return
+        if not reply.set_running_or_notify_cancel():
+            continue
+        try:
+            result = apply(batch)
+        except Exception as error:
+            result = {"accepted": 0, "errors": [f"{type(error).__name__}: {error}"]}
+        reply.set_result(result)
+
+
+def apply_batch(batch, session, patient_nhi, step, add):
+    # The tracker's side of a batch, without Tk: each reading is checked as
+    # the Add button checks it (pain_session.check_reading) and the good ones
+    # go to add(time_point, scores, comment) in order, the arguments of
+    # PainSession.add_reading. patient_nhi is the tracker's; step spaces
+    # readings that give no time. Returns the reply.
+    batch_nhi = batch.get("patient_nhi")
+    if batch_nhi is not None and batch_nhi != patient_nhi:
+        return {"accepted": 0, "errors": [f"Readings are for {batch_nhi}, but the tracker is on {patient_nhi or 'no patient'}"]}
+    accepted = 0
+    errors = []
+    for number, reading in enumerate(batch["readings"]):
+        if not isinstance(reading, dict) or "scores" not in reading:
+            errors.append(f"Reading {number}: expected an object with \"scores\"")
+            continue
+        default_time = session.time_point + step if session is not None else 0
+        time_point = reading.get("time", default_time)
+        comment = reading.get("comment", "")
+        error = check_reading(session, reading["scores"], time_point, comment)
+        if error:
+            errors.append(f"Reading {number}: {error}")
+            continue
+        add(time_point, reading["scores"], comment)
+        accepted += 1
+    return {"accepted": accepted, "errors": errors}
+
+
+def send_batch(readings, patient_nhi=None, host="127.0.0.1", port=DEFAULT_PORT, path=None, timeout=10.0):
+    # Small blocking client, e.g. for a tablet bridge or to try the server out
+    if path:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        connection.connect(path)
+    else:
+        connection = socket.create_connection((host, port), timeout=timeout)
+    batch = {"readings": readings}
+    if patient_nhi is not None:
+        batch["patient_nhi"] = patient_nhi
+    with connection, connection.makefile("rwb") as stream:
+        stream.write((json.dumps(batch) + "\n").encode("utf-8"))
+        stream.flush()
+        return json.loads(stream.readline())
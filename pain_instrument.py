@@ -0,0 +1,108 @@
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+
+# Upper edges of the latency histogram buckets, in milliseconds
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, float("inf")]
+
+
+class Instrumentation:
+    # Opt-in timing of the app's handlers. Each named operation keeps its last
+    # `window` durations, from which the histogram and percentiles are worked
+    # out on demand. With profile=True every main-thread operation also runs
+    # under cProfile and the last `keep_profiles` of them can be dumped.
+    def __init__(self, enabled=False, profile=False, window=500, keep_profiles=50):
+        self.enabled = enabled
+        self.profile = profile
+        self.window = window
+        self.timings = {}
+        self.counts = {}
+        self.profiles = deque(maxlen=keep_profiles)
+        self.on_record = None
+        self._profiling = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        # PAIN_TRACKER_INSTRUMENT=1 records timings, =profile also profiles
+        setting = os.environ.get("PAIN_TRACKER_INSTRUMENT", "").lower()
+        return cls(enabled=setting not in ("", "0", "off"), profile=setting == "profile")
+
+    def wrap(self, name, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            # Nested operations are timed, but only the outermost is profiled
+            profiler = None
+            if self.profile and not self._profiling and threading.current_thread() is threading.main_thread():
+                profiler = cProfile.Profile()
+                self._profiling = True
+                profiler.enable()
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                if profiler is not None:
+                    profiler.disable()
+                    self._profiling = False
+                    self.profiles.append((name, profiler))
+                self.record(name, elapsed)
+        return timed
+
+    def record(self, name, seconds):
+        with self._lock:
+            if name not in self.timings:
+                self.timings[name] = deque(maxlen=self.window)
+                self.counts[name] = 0
+            self.timings[name].append(seconds)
+            self.counts[name] += 1
+        if self.on_record is not None:
+            self.on_record(name, seconds)
+
+    def last(self, name):
+        timings = self.timings.get(name)
+        return timings[-1] if timings else None
+
+    def histogram(self, name):
+        counts = [0] * len(BUCKETS_MS)
+        for seconds in list(self.timings.get(name, ())):
+            milliseconds = seconds * 1000
+            counts[next(i for i, edge in enumerate(BUCKETS_MS) if milliseconds <= edge)] += 1
+        return list(zip(BUCKETS_MS, counts))
+
+    def summary(self):
+        report = {}
+        for name in sorted(self.timings):
+            ordered = sorted(self.timings[name])
+            if not ordered:
+                continue
+            report[name] = {
+                "calls": self.counts[name],
+                "window": len(ordered),
+                "p50_ms": ordered[len(ordered) // 2] * 1000,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                "max_ms": ordered[-1] * 1000,
+                "histogram": [["inf" if edge == float("inf") else edge, count] for edge, count in self.histogram(name)],
+            }
+        return report
+
+    def dump(self, path):
+        # Writes the timing summary as JSON and, if profiling was on, the
+        # merged cProfile stats of the last operations next to it (.prof)
+        base = os.path.splitext(path)[0]
+        with open(base + ".json", "w", encoding="utf-8") as file:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "operations": self.summary(),
+                       "profiled": [name for name, _ in self.profiles]}, file, indent=1)
+        if self.profiles:
+            stats = pstats.Stats(self.profiles[0][1])
+            for _, profiler in list(self.profiles)[1:]:
+                stats.add(profiler)
+            stats.dump_stats(base + ".prof")
+        return base
@@ -0,0 +1,272 @@
+import glob
+import itertools
+import json
+import os
+import time
+from collections import deque
+
+from pain_session import PainSession, check_details
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def default_journal_path():
+    return os.environ.get("PAIN_TRACKER_JOURNAL") or os.path.join(os.path.expanduser("~"), ".pain-tracker", "session.journal")
+
+
+KEEP_PREVIOUS = 10  # abandoned sessions kept beside a journal
+
+
+def set_aside(path, suffix=".previous"):
+    # Moves the file at path to <path>.previous, or .previous.2, .3 and so on
+    # if that is taken, so no earlier one is overwritten. Only the newest
+    # KEEP_PREVIOUS are kept: they hold patient details, and would otherwise
+    # pile up with every Restart. Returns the new name.
+    stem = path + suffix
+    numbered = []
+    for candidate in glob.glob(glob.escape(stem) + "*"):
+        ending = candidate[len(stem):]
+        if ending == "":
+            numbered.append((1, candidate))
+        elif ending[0] == "." and ending[1:].isdigit():
+            numbered.append((int(ending[1:]), candidate))
+    numbered.sort()
+    target = f"{stem}.{numbered[-1][0] + 1}" if numbered else stem
+    os.replace(path, target)
+    for _, old in numbered[:max(0, len(numbered) + 1 - KEEP_PREVIOUS)]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    return target
+
+
+def drop_torn_tail(path):
+    # A crash mid-write leaves a last line without its newline. New records
+    # appended straight after it would be glued to it and lost with it on the
+    # next replay, so it is cut off first.
+    try:
+        file = open(path, "rb+")
+    except FileNotFoundError:
+        return
+    with file:
+        end = position = file.seek(0, os.SEEK_END)
+        keep = 0
+        while position > 0:
+            start = max(0, position - 4096)
+            file.seek(start)
+            newline = file.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                keep = start + newline + 1
+                break
+            position = start
+        if keep != end:
+            file.truncate(keep)
+
+
+class JournalInUse(Exception):
+    pass
+
+
+def lock_journal(path):
+    # Returns the open lock file beside path, or None if another window
+    # holds it. The OS drops the lock when its holder exits, crash or not.
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lock = open(path + ".lock", "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+def journal_in_use(path):
+    lock = lock_journal(path)
+    if lock is None:
+        return True
+    lock.close()
+    return False
+
+
+def open_journal(path):
+    # The journal at path, or if another window has it, the first free one of
+    # session-2.journal, session-3.journal, ... beside it, so windows never
+    # write to each other's journal
+    stem, extension = os.path.splitext(path)
+    for number in itertools.count(1):
+        try:
+            return SessionJournal(path if number == 1 else f"{stem}-{number}{extension}")
+        except JournalInUse:
+            continue
+
+
+class SessionJournal:
+    # Append-only log of every change to the current session, one JSON record
+    # per line. Records are flushed to the OS straight away but only fsynced
+    # every sync_every records or sync_interval seconds, whichever comes first,
+    # so a crash loses at most that much. The first record is always a snapshot
+    # of the session, patient details and display options; compact() rewrites
+    # the file as a single snapshot once enough changes pile up. Only one
+    # window at a time may hold a journal (JournalInUse otherwise), and a
+    # journal closed with clean=True is not replayed.
+    def __init__(self, path, sync_every=20, sync_interval=1.0, compact_after=500):
+        self.lock = lock_journal(path)
+        if self.lock is None:
+            raise JournalInUse(path)
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_after = compact_after
+        self.records = 0
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        drop_torn_tail(path)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def start(self, session, patient, options):
+        # A new session replaces whatever the journal held; also used to
+        # compact it
+        self._rewrite(session, patient, options)
+
+    def append(self, op, **fields):
+        fields["op"] = op
+        self.file.write(json.dumps(fields, separators=(",", ":")) + "\n")
+        self.file.flush()
+        self.records += 1
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.unsynced:
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def needs_compaction(self):
+        return self.records >= self.compact_after
+
+    def clear(self):
+        # Keep the abandoned session next to the journal so an accidental
+        # restart can still be recovered with --journal <path>.previous
+        self.file.close()
+        if os.path.getsize(self.path):
+            set_aside(self.path)
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.records = 0
+        self.unsynced = 0
+
+    def close(self, clean=False):
+        # clean marks a normal quit: the session is finished with, so the next
+        # start does not bring it back (it stays in the file until then)
+        if clean:
+            self.append("closed")
+        self.sync()
+        self.file.close()
+        self.lock.close()
+
+    def _rewrite(self, session, patient, options):
+        # Write the snapshot beside the journal and swap it in atomically
+        temporary_path = self.path + ".tmp"
+        snapshot = {"op": "snapshot", "patient": patient, "options": options, "session": session.to_dict()}
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(json.dumps(snapshot, separators=(",", ":")) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self.file.close()
+        os.replace(temporary_path, self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.records = 0
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+
+def apply_record(session, record):
+    op = record["op"]
+    if op == "add":
+        session.add_reading(record["time"], record["scores"], record.get("comment", ""))
+    elif op == "comment":
+        session.set_comment(record["index"], record["text"])
+    elif op == "delete":
+        session.delete_rows(record["indices"], renumber=record["renumber"])
+    elif op == "insert":
+        session.insert_rows(record["rows"], renumber=record["renumber"])
+    else:
+        raise ValueError(f"Unknown journal record {op!r}")
+
+
+class EditHistory:
+    # Undo/redo kept as pairs of journal records: the record that made an
+    # edit and the one that reverses it (a delete is reversed by an insert of
+    # just the deleted rows). Undoing applies one small record instead of
+    # replaying the session, and is journaled like any other change.
+    def __init__(self, limit=200):
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+
+    def push(self, record, inverse):
+        self.undo_stack.append((record, inverse))
+        self.redo_stack.clear()
+
+    def undo(self):
+        # Returns the record to apply, or None if there is nothing to undo
+        if not self.undo_stack:
+            return None
+        pair = self.undo_stack.pop()
+        self.redo_stack.append(pair)
+        return pair[1]
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        pair = self.redo_stack.pop()
+        self.undo_stack.append(pair)
+        return pair[0]
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+
+def replay_journal(path, after_clean_close=False):
+    # Returns (session, patient, options) as read_session_file does, or
+    # (None, None, None) if there is nothing to restore: no snapshot, or the
+    # journal was closed cleanly, unless after_clean_close. A torn last line
+    # from a crash mid-write is ignored.
+    session = patient = options = None
+    closed = False
+    try:
+        file = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return None, None, None
+    with file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            op = record["op"]
+            closed = op == "closed"
+            if op == "snapshot":
+                session = PainSession.from_dict(record["session"])
+                patient, options = check_details(record.get("patient", {}), record.get("options", {"use_minutes": record.get("use_minutes", True)}))
+            elif session is None or op == "closed":
+                continue
+            elif op == "details":
+                patient, options = check_details(record["patient"], record["options"])
+            else:
+                apply_record(session, record)
+    if session is None or (closed and not after_clean_close):
+        return None, None, None
+    return session, patient, options
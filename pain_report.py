@@ -0,0 +1,272 @@
+import io
+import json
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Flowable, PageBreak
+
+from pain_cache import RENDER_VERSION, RenderCache, session_key
+from pain_graph import PainGraph
+from pain_session import format_time
+from pain_stats import STATS_HEADER, SessionStats
+from pain_vector import draw_recording, record_figure
+
+GRAPH_WIDTH = 7 * 72  # 7 inches
+GRAPH_HEIGHT = 5 * 72  # 5 inches
+# Rendered graph bytes and formatted table rows, keyed by a hash of the
+# session and display options. Reportlab flowables are changed by laying them
+# out, so it is their inputs that are kept; building them from these is cheap.
+GRAPH_CACHE = RenderCache(32 * 1024 * 1024)
+TABLE_CACHE = RenderCache(32 * 1024 * 1024)
+disk_cache = None  # Optional pain_cache.DiskCache shared with other processes
+
+TABLE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+]
+# Readings table geometry. Every row height and column width is worked out
+# from these rather than by reportlab measuring each cell, which is what made
+# long reports slow: reportlab re-measures all remaining rows of a table each
+# time it splits it across a page.
+PAGE_MARGIN = 36  # points left and right; the top and bottom keep reportlab's inch
+FRAME_PADDING = 6  # reportlab's default Frame padding
+FONT_SIZE = 10
+LEADING = 12  # reportlab's default for 10 point text
+CELL_PADDING = 6  # left and right
+ROW_PADDING = 3 + 3  # top and bottom
+HEADER_PADDING = 3 + 12  # TABLE_STYLE gives the header more room below
+MAX_LABEL_WIDTH = 100  # longer area names wrap in the header
+MIN_COMMENT_WIDTH = 90
+TARGET_TEXT = "N/A - Target for 80% Reduction: "
+THUMBNAIL_WIDTH = 96  # points, in the top margin of continuation pages
+THUMBNAIL_HEIGHT = 64
+
+
+def render_graph(session, options, format="png"):
+    # Draws the session on a private Agg figure, so this is safe to call from
+    # a worker thread while the live Tk figure keeps running
+    figure = Figure(figsize=(8, 6), dpi=100)
+    FigureCanvasAgg(figure)
+    PainGraph(figure).update(session, **options)
+    if format == "vector":
+        # Drawing operations for VectorGraph, see pain_vector
+        return io.BytesIO(record_figure(figure))
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=format)
+    buffer.seek(0)
+    return buffer
+
+
+def graph_bytes(session, options, format="png"):
+    # render_graph, but skipped when the same session and options were
+    # rendered before, in this process or (with a disk cache) any other
+    key = session_key(session, options, "graph", format, RENDER_VERSION)
+    data = GRAPH_CACHE.get(key)
+    if data is None and disk_cache is not None:
+        data = disk_cache.get(key, "." + format)
+    if data is None:
+        data = render_graph(session, options, format).getvalue()
+        if disk_cache is not None:
+            disk_cache.put(key, "." + format, data)
+    GRAPH_CACHE.put(key, data, len(data))
+    return data
+
+
+def table_rows(session, use_minutes, area_slots):
+    key = session_key(session, {"use_minutes": use_minutes}, "table", area_slots, RENDER_VERSION)
+    rows = TABLE_CACHE.get(key)
+    if rows is None:
+        rows = [list(row) for row in session.rows(use_minutes, area_slots)]
+        TABLE_CACHE.put(key, rows, sum(len(value) for row in rows for value in row))
+    return rows
+
+
+class VectorGraph(Flowable):
+    # Draws the graph with reportlab's own path operators from the figure's
+    # recorded drawing, so it stays vector graphics and nothing is rasterized
+    def __init__(self, recording, width, height):
+        super().__init__()
+        self.recording = json.loads(recording)
+        self.width = width
+        self.height = height
+
+    def wrap(self, available_width, available_height):
+        return self.width, self.height
+
+    def draw(self):
+        draw_recording(self.canv, self.recording, self.width, self.height)
+
+
+def graph_flowable(session, options, width=GRAPH_WIDTH, height=GRAPH_HEIGHT):
+    return VectorGraph(graph_bytes(session, options, format="vector"), width, height)
+
+
+def cell_width(text, font="Helvetica"):
+    return max(stringWidth(line, font, FONT_SIZE) for line in text.split("\n")) + 2 * CELL_PADDING
+
+
+def column_groups(session, area_labels, use_minutes, available_width):
+    # Splits the readings table into as many tables as it takes to fit the
+    # page width: each holds the time column and as many areas as fit, and
+    # the first also holds the comments. Returns (areas, column widths,
+    # header) per table; widths come from the widest value a column can
+    # hold, so no cell is measured.
+    last_time = session.times[-1] if session is not None else 0
+    time_width = max(cell_width("Time", "Helvetica-Bold"), cell_width(format_time(last_time, use_minutes)))
+    pairs = []
+    for area, label in enumerate(area_labels):
+        label = "\n".join(simpleSplit(label, "Helvetica-Bold", FONT_SIZE, MAX_LABEL_WIDTH)) or " "
+        target = session.targets[area] if session is not None and area < session.area_count else 100
+        pain_width = max(cell_width(label + "\nPain", "Helvetica-Bold"), cell_width("100"))
+        reduction_width = max(cell_width(label + "\nReduction", "Helvetica-Bold"), cell_width(report_target(f"{TARGET_TEXT}{target}")), cell_width("-9900%"))
+        pairs.append((area, label, pain_width, reduction_width))
+
+    groups = [[]]
+    used = time_width + MIN_COMMENT_WIDTH
+    for pair in pairs:
+        if groups[-1] and used + pair[2] + pair[3] > available_width:
+            groups.append([])
+            used = time_width
+        groups[-1].append(pair)
+        used += pair[2] + pair[3]
+
+    layouts = []
+    for number, group in enumerate(groups):
+        widths = [time_width]
+        header = ["Time"]
+        for area, label, pain_width, reduction_width in group:
+            widths.extend([pain_width, reduction_width])
+            header.extend([f"{label}\nPain", f"{label}\nReduction"])
+        if number == 0:
+            widths.append(max(MIN_COMMENT_WIDTH, available_width - sum(widths)))
+            header.append("Comment")
+        layouts.append(([area for area, _, _, _ in group], widths, header))
+    return layouts
+
+
+def report_target(text):
+    # The starting row's target goes on two lines to keep its column narrow
+    return text.replace("80% Reduction: ", "80%\nReduction: ")
+
+
+def group_rows(rows, areas, widths, with_comment, max_lines):
+    # The cells of one column group with their row heights; comments are
+    # wrapped to the comment column here, once. A comment longer than
+    # max_lines goes on as many continuation rows as it needs, blank but for
+    # the comment, as reportlab cannot split a row that is taller than a page.
+    comment_width = widths[-1] - 2 * CELL_PADDING if with_comment else None
+    for index, row in enumerate(rows):
+        cells = [row[0]]
+        for area in areas:
+            cells.extend([row[1 + 2 * area], report_target(row[2 + 2 * area]) if index == 0 else row[2 + 2 * area]])
+        lines = 2 if index == 0 and areas else 1
+        if not with_comment:
+            yield cells, lines * LEADING + ROW_PADDING
+            continue
+        comment = simpleSplit(row[-1], "Helvetica", FONT_SIZE, comment_width) if row[-1] else []
+        for start in range(0, max(1, len(comment)), max_lines):
+            part = comment[start:start + max_lines]
+            if start:
+                cells, lines = [""] * len(cells), 1
+            yield cells + ["\n".join(part)], max(lines, len(part)) * LEADING + ROW_PADDING
+
+
+def readings_tables(rows, layouts, space_left, page_height):
+    # Streams the readings into tables of at most a page each, packed with
+    # the row heights worked out above: the first fills what is left of the
+    # current page and each later one a whole page. Every table repeats the
+    # header, so should a table still overflow a page, reportlab splits it
+    # with the header on both halves.
+    for number, (areas, widths, header) in enumerate(layouts):
+        header_height = (max(cell.count("\n") for cell in header) + 1) * LEADING + HEADER_PADDING
+        data, heights = [header], [header_height]
+        used = header_height
+        max_lines = max(1, int(page_height - header_height - ROW_PADDING) // LEADING)
+        for cells, height in group_rows(rows, areas, widths, number == 0, max_lines):
+            if used + height > space_left and len(data) > 1:
+                yield readings_table(data, widths, heights)
+                data, heights = [header], [header_height]
+                used = header_height
+                space_left = page_height
+            elif used + height > space_left:
+                # Not even one row fits under the header; start on the next page
+                yield PageBreak()
+                space_left = page_height
+            data.append(cells)
+            heights.append(height)
+            used += height
+        yield readings_table(data, widths, heights)
+        space_left -= used
+
+
+def readings_table(data, widths, heights):
+    table = Table(data, colWidths=widths, rowHeights=heights, repeatRows=1)
+    table.setStyle(TableStyle(TABLE_STYLE))
+    return table
+
+
+def page_header(patient, statistics, thumbnail):
+    # Drawn in the top margin of every page after the first: who the report
+    # is for, the page number, the headline numbers and a small graph
+    def draw(canvas, document):
+        canvas.saveState()
+        top = document.pagesize[1] - 24
+        canvas.setFont("Helvetica-Bold", 9)
+        canvas.drawString(document.leftMargin, top, f"{patient['name']} ({patient['nhi']}), {patient['procedure_name']} {patient['procedure_date']} - page {document.page}")
+        canvas.setFont("Helvetica", 8)
+        for line, row in enumerate((statistics or [])[:3]):
+            canvas.drawString(document.leftMargin, top - 11 * (line + 1), f"{row[0]}: peak {row[1]}, 50% at {row[2]}, 80% at {row[3]}")
+        if thumbnail is not None:
+            canvas.drawImage(thumbnail, document.pagesize[0] - document.rightMargin - THUMBNAIL_WIDTH, top - THUMBNAIL_HEIGHT + 10,
+                             THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)
+        canvas.restoreState()
+    return draw
+
+
+def build_report(file_path, session, patient, area_labels, options, progress=None, statistics=None, page_headers=False):
+    # patient holds name, nhi, procedure_date and procedure_name; progress, if
+    # given, is called with a short description of each stage. statistics are
+    # SessionStats.rows(), worked out here if the caller has none to hand.
+    # With page_headers, pages after the first get page_header().
+    def report(stage):
+        if progress is not None:
+            progress(stage)
+
+    report("Rendering graph")
+    graph = graph_flowable(session, options)
+
+    # Prepare patient details to be printed at the top of the PDF
+    styles = getSampleStyleSheet()
+    patient_details = Paragraph(f"<strong>Patient Name</strong>: {patient['name']}<br/><strong>Patient NHI</strong>: {patient['nhi']}<br/><strong>Procedure Date</strong>: {patient['procedure_date']}<br/><strong>Procedure Name</strong>: {patient['procedure_name']}<br/><br/>", styles["Normal"])
+
+    report("Building table")
+    pdf = SimpleDocTemplate(file_path, pagesize=letter, leftMargin=PAGE_MARGIN, rightMargin=PAGE_MARGIN)
+    width, height = pdf.width - 2 * FRAME_PADDING, pdf.height - 2 * FRAME_PADDING
+    story = [patient_details, graph]
+    if session is not None:
+        if statistics is None:
+            statistics = SessionStats(session).rows(options["use_minutes"])
+        summary = Table([STATS_HEADER] + statistics, spaceBefore=6, spaceAfter=12)
+        summary.setStyle(TableStyle(TABLE_STYLE))
+        story.append(summary)
+    # The readings start below what is already on the first page
+    space_left = height - sum(flowable.wrap(width, height)[1] + flowable.getSpaceBefore() + flowable.getSpaceAfter() for flowable in story)
+    rows = table_rows(session, options["use_minutes"], len(area_labels)) if session is not None else []
+    story.extend(readings_tables(rows, column_groups(session, area_labels, options["use_minutes"], width), space_left, height))
+
+    report("Writing PDF")
+    later_pages = lambda canvas, document: None
+    if page_headers:
+        thumbnail = ImageReader(io.BytesIO(graph_bytes(session, options))) if session is not None else None
+        later_pages = page_header(patient, statistics, thumbnail)
+    pdf.build(story, onLaterPages=later_pages)
@@ -0,0 +1,45 @@
+class RedrawScheduler:
+    # Collapses any number of redraw requests made during one turn of the Tk
+    # event loop into a single call of render. With delay > 0 the render is
+    # pushed back by that many milliseconds instead of waiting for idle.
+    def __init__(self, master, render, delay=0):
+        self.master = master
+        self.render = render
+        self.delay = delay
+        self.dirty = False
+        self.pending = None
+        self.requests = 0
+        self.renders = 0
+
+    @property
+    def skipped(self):
+        # Requests that were folded into a render someone else asked for
+        return self.requests - self.renders - (1 if self.dirty else 0)
+
+    def request(self):
+        self.requests += 1
+        self.dirty = True
+        if self.pending is None:
+            if self.delay:
+                self.pending = self.master.after(self.delay, self._run)
+            else:
+                self.pending = self.master.after_idle(self._run)
+
+    def flush(self):
+        # Render now if anything is outstanding, e.g. before exporting the figure
+        self.cancel()
+        if self.dirty:
+            self._run()
+
+    def cancel(self):
+        if self.pending is not None:
+            self.master.after_cancel(self.pending)
+            self.pending = None
+
+    def _run(self):
+        self.pending = None
+        if not self.dirty:
+            return
+        self.dirty = False
+        self.renders += 1
+        self.render()
@@ -0,0 +1,370 @@
+import io
+import json
+import multiprocessing
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from pain_instrument import Instrumentation
+from pain_journal import apply_record
+from pain_session import DEFAULT_OPTIONS, PainSession, table_header, valid_score, valid_time
+
+DEFAULT_PORT = 8080
+MAX_BODY = 1024 * 1024  # bytes per request
+GRAPH_FORMATS = {"png": "image/png", "svg": "image/svg+xml", "pdf": "application/pdf"}
+PATIENT_FIELDS = ("name", "nhi", "procedure_date", "procedure_name")
+
+
+class ServiceError(Exception):
+    # Carries the HTTP status the client should get
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def render_job(kind, session, patient, area_labels, options, format, page_headers=False):
+    # Runs in a renderer process: Agg only, nothing from Tk. pain_report's
+    # caches live as long as the process, so repeat renders are served from them.
+    import matplotlib
+    matplotlib.use("Agg")
+    import pain_report
+
+    if kind == "graph":
+        return pain_report.graph_bytes(session, options, format)
+    buffer = io.BytesIO()
+    pain_report.build_report(buffer, session, patient, area_labels, options, page_headers=page_headers)
+    return buffer.getvalue()
+
+
+def warm_up():
+    import matplotlib
+    matplotlib.use("Agg")
+    import pain_report  # noqa: F401
+
+
+class RendererPool:
+    # A fixed number of renderer processes plus a bounded backlog. A render
+    # that finds workers + backlog already taken is refused straight away
+    # (503) rather than queued behind everything else.
+    def __init__(self, workers=2, backlog=None, timeout=60.0):
+        self.workers = workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(workers + (backlog if backlog is not None else 2 * workers))
+        self.busy = 0
+        self._lock = threading.Lock()
+        # spawn, as on Windows: forking a process that runs server threads is unsafe
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def warm(self):
+        # Starts the workers and imports matplotlib in them before the first request
+        for future in [self.executor.submit(warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def render(self, *job):
+        if not self.slots.acquire(blocking=False):
+            raise ServiceError(503, "All renderers are busy, try again shortly")
+        with self._lock:
+            self.busy += 1
+        try:
+            future = self.executor.submit(render_job, *job)
+        except BaseException:
+            self._finished(None)
+            raise
+        # The slot is given back when the render really ends, not when the
+        # request gives up waiting: a timed-out render still holds a worker
+        future.add_done_callback(self._finished)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            raise ServiceError(504, "Rendering took too long") from None
+
+    def _finished(self, future):
+        with self._lock:
+            self.busy -= 1
+        self.slots.release()
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class ServiceSession:
+    # One patient's session on the server. Requests for the same session are
+    # serialized by its lock; different sessions never wait on each other.
+    def __init__(self, session, patient, options, step):
+        self.session = session
+        self.patient = patient
+        self.options = options
+        self.step = step
+        self.lock = threading.Lock()
+
+
+class PainService:
+    # The session operations of the GUI (Start, Add, comment, delete, export)
+    # as JSON over HTTP. handle() does the work and is independent of the HTTP
+    # server, which only parses requests and writes replies.
+    ROUTES = [
+        ("GET", r"/stats", "stats"),
+        ("GET", r"/sessions", "list_sessions"),
+        ("POST", r"/sessions", "start"),
+        ("GET", r"/sessions/(?P<id>\w+)", "get_session"),
+        ("DELETE", r"/sessions/(?P<id>\w+)", "close"),
+        ("POST", r"/sessions/(?P<id>\w+)/readings", "add"),
+        ("DELETE", r"/sessions/(?P<id>\w+)/readings", "delete"),
+        ("DELETE", r"/sessions/(?P<id>\w+)/readings/(?P<index>\d+)", "delete"),
+        ("PUT", r"/sessions/(?P<id>\w+)/readings/(?P<index>\d+)/comment", "comment"),
+        ("GET", r"/sessions/(?P<id>\w+)/graph\.(?P<format>png|svg|pdf)", "graph"),
+        ("GET", r"/sessions/(?P<id>\w+)/report\.pdf", "report"),
+    ]
+
+    def __init__(self, renderers=None, max_sessions=1000):
+        self.renderers = renderers
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.instrumentation = Instrumentation(enabled=True)
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.routes = [(method, re.compile(pattern + r"/?$"), getattr(self, name)) for method, pattern, name in self.ROUTES]
+
+    def handle(self, method, path, body=None):
+        # Returns (status, content type, body bytes); timings are kept per
+        # route, e.g. "POST /sessions/{id}/readings"
+        started = time.perf_counter()
+        url = urlsplit(path)
+        name = f"{method} (unknown)"
+        try:
+            for route_method, pattern, handler in self.routes:
+                match = pattern.match(url.path)
+                if match and route_method == method:
+                    name = f"{method} {self.route_name(pattern)}"
+                    status, result = handler(body=body or {}, query=parse_qs(url.query), **match.groupdict())
+                    break
+            else:
+                raise ServiceError(404, f"No such resource: {method} {url.path}")
+            if isinstance(result, bytes):
+                content_type = GRAPH_FORMATS.get(url.path.rsplit(".", 1)[-1], "application/octet-stream")
+            else:
+                content_type, result = "application/json", json.dumps(result).encode("utf-8")
+        except ServiceError as error:
+            status, content_type, result = error.status, "application/json", json.dumps({"error": str(error)}).encode("utf-8")
+        except Exception as error:
+            # A bug or a failed render must not take the request thread down silently
+            status, content_type, result = 500, "application/json", json.dumps({"error": f"{type(error).__name__}: {error}"}).encode("utf-8")
+        with self._lock:
+            self.requests += 1
+            self.errors += status >= 400
+        self.instrumentation.record(name, time.perf_counter() - started)
+        return status, content_type, result
+
+    @staticmethod
+    def route_name(pattern):
+        return re.sub(r"\(\?P<(\w+)>[^)]*\)", r"{\1}", pattern.pattern[:-len(r"/?$")]).replace("\\", "")
+
+    def lookup(self, id):
+        entry = self.sessions.get(id)
+        if entry is None:
+            raise ServiceError(404, f"No session {id}")
+        return entry
+
+    def start(self, body, query):
+        # As the Start button: starting scores (and area names) fix the session
+        scores = body.get("scores")
+        names = body.get("areas")
+        if not isinstance(scores, list) or not scores or not all(valid_score(score) for score in scores):
+            raise ServiceError(400, "scores must be a list of starting pain scores between 0 and 100")
+        if names is not None and (not isinstance(names, list) or len(names) != len(scores) or not all(isinstance(name, str) for name in names)):
+            raise ServiceError(400, "areas must be a list with one name per score")
+        if not isinstance(body.get("options", {}), dict) or not isinstance(body.get("patient", {}), dict):
+            raise ServiceError(400, "options and patient must be objects")
+        options = dict(DEFAULT_OPTIONS)
+        options.update({name: bool(value) for name, value in body.get("options", {}).items() if name in DEFAULT_OPTIONS})
+        patient = {name: str(body.get("patient", {}).get(name, "")) for name in PATIENT_FIELDS}
+        step = body.get("step", 30 if options["use_minutes"] else 1)
+        if not valid_time(step) or step <= 0:
+            raise ServiceError(400, f"step must be a positive whole number below {2 ** 31}")
+        with self._lock:
+            if len(self.sessions) >= self.max_sessions:
+                raise ServiceError(503, f"The server already holds {self.max_sessions} sessions")
+            id = uuid.uuid4().hex
+            self.sessions[id] = ServiceSession(PainSession(scores, names), patient, options, step)
+        return 201, self.describe(id, self.sessions[id])
+
+    def list_sessions(self, body, query):
+        return 200, {"sessions": [{"id": id, "patient": entry.patient, "readings": len(entry.session)} for id, entry in list(self.sessions.items())]}
+
+    def get_session(self, body, query, id):
+        entry = self.lookup(id)
+        with entry.lock:
+            return 200, self.describe(id, entry, table=True)
+
+    def close(self, body, query, id):
+        with self._lock:
+            if self.sessions.pop(id, None) is None:
+                raise ServiceError(404, f"No session {id}")
+        return 200, {"closed": id}
+
+    def add(self, body, query, id):
+        # As the Add button; time defaults to the last reading plus step
+        entry = self.lookup(id)
+        with entry.lock:
+            session = entry.session
+            scores = body.get("scores")
+            time_point = body.get("time", session.time_point + entry.step)
+            comment = body.get("comment", "")
+            if not isinstance(scores, list) or len(scores) != session.area_count or not all(valid_score(score) for score in scores):
+                raise ServiceError(400, f"scores must be a list of {session.area_count} pain scores between 0 and 100")
+            if not valid_time(time_point) or time_point <= session.time_point:
+                raise ServiceError(400, f"time must be a whole number after the last reading ({session.time_point}) and below {2 ** 31}")
+            if not isinstance(comment, str):
+                raise ServiceError(400, "comment must be text")
+            apply_record(session, {"op": "add", "time": time_point, "scores": scores, "comment": comment})
+            index = len(session) - 1
+            return 201, {"index": index, "row": session.row_values(index, entry.options["use_minutes"])}
+
+    def comment(self, body, query, id, index):
+        entry = self.lookup(id)
+        text = body.get("text")
+        if not isinstance(text, str):
+            raise ServiceError(400, "text must be the comment")
+        with entry.lock:
+            index = self.check_index(entry.session, int(index), first=0)
+            apply_record(entry.session, {"op": "comment", "index": index, "text": text})
+            return 200, {"index": index, "row": entry.session.row_values(index, entry.options["use_minutes"])}
+
+    def delete(self, body, query, id, index=None):
+        # One reading, or several with ?indices=2,5,9; "Time n" sessions are
+        # renumbered afterwards, as in the GUI
+        entry = self.lookup(id)
+        try:
+            indices = [int(index)] if index is not None else [int(value) for value in ",".join(query.get("indices", [])).split(",") if value]
+        except ValueError:
+            raise ServiceError(400, "indices must be whole numbers") from None
+        if not indices:
+            raise ServiceError(400, "Give the readings to delete, e.g. ?indices=2,5")
+        with entry.lock:
+            for i in indices:
+                self.check_index(entry.session, i, first=1)
+            apply_record(entry.session, {"op": "delete", "indices": indices, "renumber": not entry.options["use_minutes"]})
+            return 200, {"deleted": sorted(set(indices)), "readings": len(entry.session)}
+
+    def graph(self, body, query, id, format):
+        entry = self.lookup(id)
+        with entry.lock:
+            job = ("graph", entry.session.copy(), None, None, self.render_options(entry, query), format)
+        return 200, self.render(job)
+
+    def report(self, body, query, id):
+        # As Export to PDF; unlike the GUI, blank patient details are allowed.
+        # ?page_headers=1 heads the later pages as pain_report.page_header does.
+        entry = self.lookup(id)
+        with entry.lock:
+            patient = dict(entry.patient)
+            patient.update({name: query[name][0] for name in PATIENT_FIELDS if name in query})
+            job = ("report", entry.session.copy(), patient, entry.session.slot_names(), self.render_options(entry, query), None,
+                   query.get("page_headers", ["0"])[0] not in ("0", "false"))
+        return 200, self.render(job)
+
+    def render(self, job):
+        if self.renderers is None:
+            raise ServiceError(503, "This server was started without renderers")
+        return self.renderers.render(*job)
+
+    def stats(self, body, query):
+        uptime = time.monotonic() - self.started
+        report = {
+            "uptime_s": round(uptime, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "requests_per_s": round(self.requests / uptime, 2) if uptime else 0.0,
+            "sessions": len(self.sessions),
+            "routes": self.instrumentation.summary(),
+        }
+        if self.renderers is not None:
+            report["renderers"] = {"workers": self.renderers.workers, "busy": self.renderers.busy}
+        return 200, report
+
+    @staticmethod
+    def render_options(entry, query):
+        # Display options may be overridden per request: ?show_comments=0
+        options = dict(entry.options)
+        options.update({name: query[name][0] not in ("0", "false") for name in DEFAULT_OPTIONS if name in query})
+        return options
+
+    @staticmethod
+    def check_index(session, index, first):
+        if not first <= index < len(session):
+            raise ServiceError(404, f"No reading {index}")
+        return index
+
+    @staticmethod
+    def describe(id, entry, table=False):
+        session = entry.session
+        description = {"id": id, "patient": entry.patient, "options": entry.options, "step": entry.step, "session": session.to_dict()}
+        if table:
+            description["table"] = [table_header(session.slot_names())] + [list(row) for row in session.rows(entry.options["use_minutes"])]
+        return description
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    # HTTP plumbing only; self.server.service does the work
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        body = None
+        if length < 0:
+            # rfile.read(-1) would wait for the client to hang up
+            status, content_type, data = 400, "application/json", json.dumps({"error": "Bad request: Content-Length must be a whole number of bytes"}).encode("utf-8")
+            self.close_connection = True
+        elif length > MAX_BODY:
+            status, content_type, data = 413, "application/json", json.dumps({"error": f"Request longer than {MAX_BODY} bytes"}).encode("utf-8")
+            self.close_connection = True
+        else:
+            try:
+                body = json.loads(self.rfile.read(length)) if length else None
+                if body is not None and not isinstance(body, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as error:
+                status, content_type, data = 400, "application/json", json.dumps({"error": f"Bad request: {error}"}).encode("utf-8")
+            else:
+                status, content_type, data = self.server.service.handle(method, self.path, body)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # the default of 5 resets connections from busy wards
+
+    def __init__(self, service, host="127.0.0.1", port=DEFAULT_PORT, verbose=False):
+        super().__init__((host, port), ServiceRequestHandler)
+        self.service = service
+        self.verbose = verbose
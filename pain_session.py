@@ -0,0 +1,282 @@
+import json
+import os
+from array import array
+
+DEFAULT_OPTIONS = {
+    "use_minutes": True,
+    "show_actual_pain": True,
+    "show_comments": True,
+    "show_80_percent_line": False,
+}
+# Tables and reports always show at least this many score/reduction column
+# pairs, padding with "N/A", as the original two-area layout did
+MIN_AREA_SLOTS = 2
+
+
+def target_pain_score(pain0):
+    # Pain score that corresponds to an 80% reduction from the starting score
+    return pain0 * 20 // 100
+
+
+def reduction_percentage(pain0, current):
+    # None stands in for "N/A" when there is no starting pain to reduce from
+    return ((pain0 - current) * 100) // pain0 if pain0 != 0 else None
+
+
+def whole_number(value):
+    # JSON true/false arrive as bools, which Python counts as ints
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def valid_score(score):
+    return whole_number(score) and 0 <= score <= 100
+
+
+def valid_time(time_point):
+    # Times are stored as C ints
+    return whole_number(time_point) and -2 ** 31 <= time_point < 2 ** 31
+
+
+def check_reading(session, scores, time_point, comment=""):
+    # What the Add button and live ingest accept; returns an error message,
+    # or None if the reading can be added
+    if session is None:
+        return "Tracking has not been started."
+    if not isinstance(scores, list) or len(scores) != session.area_count:
+        return f"Expected {session.area_count} pain scores, got {len(scores) if isinstance(scores, list) else scores!r}."
+    if not all(valid_score(score) for score in scores):
+        return "Pain scores must be between 0 and 100."
+    if not valid_time(time_point):
+        return f"Time must be a whole number below {2 ** 31}, not {time_point!r}."
+    if time_point <= session.time_point:
+        return f"Time {time_point} is not after the last reading ({session.time_point})."
+    if not isinstance(comment, str):
+        return "Comments must be text."
+    return None
+
+
+def format_time(time_point, use_minutes):
+    return f"{time_point} min" if use_minutes else f"Time {time_point}"
+
+
+class PainSession:
+    # Column-wise store for one tracking session. Row 0 is always the starting
+    # (time 0) reading; every later row holds one score per tracked area.
+    def __init__(self, initial_scores, area_names=None):
+        self.initial_scores = list(initial_scores)
+        self.area_names = list(area_names) if area_names else [f"Area {i + 1}" for i in range(len(self.initial_scores))]
+        self.targets = [target_pain_score(p) for p in self.initial_scores]
+        self.times = array("i", [0])
+        self.scores = [array("B", [p]) for p in self.initial_scores]
+        self.reductions = [array("i", [0]) for _ in self.initial_scores]
+        self.comments = [""]
+
+    @property
+    def area_count(self):
+        return len(self.initial_scores)
+
+    @property
+    def area_slots(self):
+        return max(MIN_AREA_SLOTS, self.area_count)
+
+    def slot_names(self):
+        # Area names padded to area_slots, for table and report headings
+        return self.area_names + [f"Area {i + 1}" for i in range(self.area_count, self.area_slots)]
+
+    @property
+    def time_point(self):
+        return self.times[-1]
+
+    def __len__(self):
+        return len(self.times)
+
+    def copy(self):
+        # Independent snapshot, e.g. to hand to a worker thread
+        other = PainSession(self.initial_scores, self.area_names)
+        other.times = array("i", self.times)
+        other.scores = [array("B", column) for column in self.scores]
+        other.reductions = [array("i", column) for column in self.reductions]
+        other.comments = list(self.comments)
+        return other
+
+    def add_reading(self, time_point, scores, comment=""):
+        reductions = self._reductions(scores)
+        self.times.append(time_point)
+        for score_column, reduction_column, score, reduction in zip(self.scores, self.reductions, scores, reductions):
+            score_column.append(score)
+            reduction_column.append(reduction)
+        self.comments.append(comment)
+        return len(self.times) - 1
+
+    def _reductions(self, scores):
+        # One pass over all areas at once; kept in plain Python so the session
+        # (and the terminal front end) never needs numpy
+        if len(scores) != self.area_count:
+            raise ValueError(f"Expected {self.area_count} pain scores, got {len(scores)}")
+        return [(p0 - score) * 100 // p0 if p0 else 0 for p0, score in zip(self.initial_scores, scores)]
+
+    def reduction(self, area, index):
+        if index == 0 or self.initial_scores[area] == 0:
+            return None
+        return self.reductions[area][index]
+
+    def set_comment(self, index, comment):
+        self.comments[index] = comment
+
+    def delete_rows(self, indices, renumber=False):
+        # The starting reading is the reference for every reduction, so it
+        # stays. The rows between deleted ones are copied over as slices, so
+        # the Python-level work is per deleted row, not per row in the session;
+        # with renumber only the times after the first deleted row change.
+        doomed = sorted({i for i in indices if 0 < i < len(self.times)})
+        if not doomed:
+            return []
+        runs = [(start + 1, end) for start, end in zip([-1] + doomed, doomed + [len(self.times)]) if end > start + 1]
+
+        def kept(column):
+            result = column[:0]
+            for start, end in runs:
+                result += column[start:end]
+            return result
+
+        self.times = kept(self.times)
+        self.scores = [kept(column) for column in self.scores]
+        self.reductions = [kept(column) for column in self.reductions]
+        self.comments = kept(self.comments)
+        if renumber:
+            self.renumber(doomed[0])
+        return doomed
+
+    def renumber(self, start):
+        # "Time n" sessions number their readings 0, 1, 2, ...
+        self.times[start:] = array("i", range(start, len(self.times)))
+
+    def rows_at(self, indices):
+        # The readings at indices (row 0 excluded), in the form insert_rows takes
+        return [
+            {"index": i, "time": self.times[i], "scores": [column[i] for column in self.scores], "comment": self.comments[i]}
+            for i in sorted({i for i in indices if 0 < i < len(self.times)})
+        ]
+
+    def insert_rows(self, rows, renumber=False):
+        # Puts back rows taken with rows_at before a delete_rows; index is the
+        # position each row had, so they go in lowest first
+        rows = sorted(rows, key=lambda row: row["index"])
+        for row in rows:
+            i = row["index"]
+            self.times.insert(i, row["time"])
+            for score_column, reduction_column, score, reduction in zip(self.scores, self.reductions, row["scores"], self._reductions(row["scores"])):
+                score_column.insert(i, score)
+                reduction_column.insert(i, reduction)
+            self.comments.insert(i, row["comment"])
+        if renumber and rows:
+            self.renumber(rows[0]["index"])
+
+    def row_values(self, index, use_minutes, area_slots=None):
+        # Display tuple in the table layout: time, then score/reduction pairs
+        # for each area slot (area_slots by default), then the comment
+        if area_slots is None:
+            area_slots = self.area_slots
+        values = [format_time(self.times[index], use_minutes)]
+        for area in range(area_slots):
+            if area >= self.area_count:
+                values.extend(["N/A", "N/A"])
+                continue
+            values.append(f"{self.scores[area][index]:3d}")
+            if index == 0:
+                values.append(f"N/A - Target for 80% Reduction: {self.targets[area]}")
+            else:
+                reduction = self.reduction(area, index)
+                values.append(f"{reduction if reduction is not None else 'N/A'}%")
+        values.append(self.comments[index])
+        return tuple(values)
+
+    def rows(self, use_minutes, area_slots=None):
+        for index in range(len(self.times)):
+            yield self.row_values(index, use_minutes, area_slots)
+
+    def to_dict(self):
+        return {
+            "areas": [{"name": name, "initial": initial} for name, initial in zip(self.area_names, self.initial_scores)],
+            "readings": [
+                {"time": self.times[i], "scores": [column[i] for column in self.scores], "comment": self.comments[i]}
+                for i in range(1, len(self.times))
+            ],
+            "baseline_comment": self.comments[0],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Saved files and journals come from disk, so everything is checked
+        # before it reaches the typed columns; any problem is a ValueError
+        areas = data["areas"] if isinstance(data, dict) else None
+        if not isinstance(areas, list) or not areas or not all(isinstance(area, dict) for area in areas):
+            raise ValueError("a session needs a list of one or more areas")
+        for number, area in enumerate(areas, 1):
+            if not isinstance(area["name"], str) or not valid_score(area["initial"]):
+                raise ValueError(f"area {number}: needs a name and a starting pain score from 0 to 100")
+        session = cls([area["initial"] for area in areas], [area["name"] for area in areas])
+        session.comments[0] = data.get("baseline_comment", "")
+        if not isinstance(session.comments[0], str) or not isinstance(data["readings"], list):
+            raise ValueError("readings must be a list and comments text")
+        for number, reading in enumerate(data["readings"], 1):
+            if not isinstance(reading, dict):
+                raise ValueError(f"reading {number}: not a reading")
+            time_point, scores, comment = reading["time"], reading["scores"], reading.get("comment", "")
+            if not valid_time(time_point):
+                raise ValueError(f"reading {number}: time must be a whole number")
+            if not isinstance(scores, list) or len(scores) != session.area_count or not all(valid_score(score) for score in scores):
+                raise ValueError(f"reading {number}: needs {session.area_count} pain score{'s' if session.area_count > 1 else ''} from 0 to 100")
+            if not isinstance(comment, str):
+                raise ValueError(f"reading {number}: comment must be text")
+            session.add_reading(time_point, scores, comment)
+        return session
+
+
+def find_session_files(inputs):
+    # Saved session .json files named directly or found in the given directories
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith(".json"))
+        else:
+            files.append(path)
+    return files
+
+
+def table_header(area_labels):
+    # Column headings matching row_values: a pain/reduction pair per label
+    header = ["Time"]
+    for label in area_labels:
+        header.extend([f"{label} Pain", f"{label} Reduction"])
+    return header + ["Comment"]
+
+
+def write_session_file(path, session, patient=None, options=None):
+    # A saved session is one JSON document: the readings plus the patient
+    # details and display options needed to re-create the report
+    data = session.to_dict()
+    data["patient"] = dict(patient or {})
+    data["options"] = dict(DEFAULT_OPTIONS, **(options or {}))
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=1)
+
+
+def read_session_file(path):
+    # As from_dict, anything wrong with the file is a ValueError
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    if not isinstance(data, dict):
+        raise ValueError("not a saved session")
+    patient, options = check_details(data.get("patient", {}), data.get("options", {}))
+    return PainSession.from_dict(data), patient, options
+
+
+def check_details(patient, options):
+    # Patient details and display options read back from disk; returns them
+    # with the options filled in from DEFAULT_OPTIONS, or raises ValueError
+    if not isinstance(patient, dict) or not all(isinstance(value, str) for value in patient.values()):
+        raise ValueError("patient details must be an object of text fields")
+    if not isinstance(options, dict) or not all(isinstance(options.get(name, False), bool) for name in DEFAULT_OPTIONS):
+        raise ValueError("options must be an object of true/false settings")
+    return dict(patient), dict(DEFAULT_OPTIONS, **options)
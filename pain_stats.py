@@ -0,0 +1,181 @@
+from collections import Counter
+
+from pain_journal import apply_record
+
+STATS_HEADER = ["Area", "Peak Reduction", "Time to 50%", "Time to 80%", "Time at 80%+", "Area Under Curve"]
+THRESHOLDS = (50, 80)
+
+
+def format_duration(value, use_minutes):
+    if value is None:
+        return "N/A"
+    return f"{value} min" if use_minutes else f"{value} time point{'' if value == 1 else 's'}"
+
+
+class SessionStats:
+    # Summary numbers for each area of a session, kept up to date edit by
+    # edit rather than worked out again from every row:
+    #   peak reduction;
+    #   time to the first reading at or over 50% and 80% reduction;
+    #   time at or over 80% (a reading counts until the next one);
+    #   area under the pain curve (trapezoids of score x time).
+    # The last two are sums of one term per segment between neighbouring
+    # readings, so an edit only adds and removes the segments around the rows
+    # it touches. The peak comes from a count per reduction value, of which an
+    # area has at most 101 (one per possible score). Edits must go through
+    # apply() to be seen.
+    def __init__(self, session):
+        self.session = session
+        self.rebuild()
+
+    def rebuild(self):
+        session = self.session
+        self.doubled_auc = [0] * session.area_count  # twice the area, to stay in integers
+        self.time_at_80 = [0] * session.area_count
+        self.peaks = [Counter() for _ in range(session.area_count)]
+        for index in range(len(session) - 1):
+            self._segment(index, 1)
+        for index in range(1, len(session)):
+            self._count(index, 1)
+        self.first = {threshold: [self._scan(area, threshold, 1) for area in range(session.area_count)] for threshold in THRESHOLDS}
+
+    def apply(self, record):
+        # Makes the edit to the session, as pain_journal.apply_record, and
+        # updates the numbers from the rows it changed
+        op = record["op"]
+        if op == "add":
+            apply_record(self.session, record)
+            self._added()
+        elif op == "delete":
+            self._delete(record)
+        elif op == "insert":
+            self._insert(record)
+        else:
+            apply_record(self.session, record)  # Comments change no numbers
+
+    def _added(self):
+        index = len(self.session) - 1
+        self._segment(index - 1, 1)
+        self._count(index, 1)
+        for threshold, firsts in self.first.items():
+            for area, first in enumerate(firsts):
+                if first is None and self.session.reductions[area][index] >= threshold:
+                    firsts[area] = index
+
+    def _delete(self, record):
+        session = self.session
+        doomed = sorted({i for i in record["indices"] if 0 < i < len(session)})
+        # Renumbering only keeps every segment as it was if the times already
+        # run 0, 1, 2, ...; otherwise start again from the rows
+        if record["renumber"] and doomed and session.times[-1] != len(session) - 1:
+            apply_record(session, record)
+            self.rebuild()
+            return
+        old_length = len(session)
+        for index in sorted({j for i in doomed for j in (i - 1, i) if j < old_length - 1}):
+            self._segment(index, -1)
+        for index in doomed:
+            self._count(index, -1)
+        apply_record(session, record)
+        # Each run of deleted rows leaves one segment joining its neighbours
+        for position, index in enumerate(doomed):
+            if position + 1 < len(doomed) and doomed[position + 1] == index + 1:
+                continue
+            left = index - 1 - position  # the run's left neighbour, as renumbered
+            if left + 1 < len(session):
+                self._segment(left, 1)
+        doomed_set = set(doomed)
+        for threshold, firsts in self.first.items():
+            for area, first in enumerate(firsts):
+                if first is None:
+                    continue
+                before = sum(1 for i in doomed if i < first)
+                firsts[area] = self._scan(area, threshold, first - before) if first in doomed_set else first - before
+
+    def _insert(self, record):
+        session = self.session
+        indices = sorted(row["index"] for row in record["rows"])
+        if record["renumber"] and indices and session.times[-1] != len(session) - 1:
+            apply_record(session, record)
+            self.rebuild()
+            return
+        # Each run of inserted rows splits the segment between its neighbours
+        old_length = len(session)
+        for position, index in enumerate(indices):
+            if position and indices[position - 1] == index - 1:
+                continue
+            left = index - 1 - position
+            if left + 1 < old_length:
+                self._segment(left, -1)
+        apply_record(session, record)
+        for index in sorted({j for i in indices for j in (i - 1, i) if j < len(session) - 1}):
+            self._segment(index, 1)
+        for index in indices:
+            self._count(index, 1)
+        for threshold, firsts in self.first.items():
+            for area, first in enumerate(firsts):
+                if first is not None:
+                    for index in indices:
+                        if index <= first:
+                            first += 1
+                crossing = next((i for i in indices if session.reductions[area][i] >= threshold), None)
+                if crossing is not None and (first is None or crossing < first):
+                    first = crossing
+                firsts[area] = first
+
+    def _segment(self, index, sign):
+        # The segment from reading index to the next one
+        session = self.session
+        width = session.times[index + 1] - session.times[index]
+        for area in range(session.area_count):
+            scores = session.scores[area]
+            self.doubled_auc[area] += sign * width * (scores[index] + scores[index + 1])
+            if session.reductions[area][index] >= 80:
+                self.time_at_80[area] += sign * width
+
+    def _count(self, index, sign):
+        for area, peaks in enumerate(self.peaks):
+            reduction = self.session.reductions[area][index]
+            peaks[reduction] += sign
+            if not peaks[reduction]:
+                del peaks[reduction]
+
+    def _scan(self, area, threshold, start):
+        # First reading from start on at or over threshold; only needed when
+        # the first crossing itself is deleted, and stops at the next one
+        reductions = self.session.reductions[area]
+        for index in range(start, len(reductions)):
+            if reductions[index] >= threshold:
+                return index
+        return None
+
+    def summary(self):
+        # Per area: name, peak reduction (%), times to 50% and 80%, time at
+        # 80% or more and area under the curve; None where there is nothing
+        # to go on yet, or no starting pain to reduce from
+        session = self.session
+        results = []
+        for area in range(session.area_count):
+            reducible = session.initial_scores[area] > 0 and bool(self.peaks[area])
+            first = {threshold: firsts[area] for threshold, firsts in self.first.items()}
+            results.append({
+                "area": session.area_names[area],
+                "peak_reduction": max(self.peaks[area]) if reducible else None,
+                "time_to_50": session.times[first[50]] - session.times[0] if reducible and first[50] is not None else None,
+                "time_to_80": session.times[first[80]] - session.times[0] if reducible and first[80] is not None else None,
+                "time_at_80": self.time_at_80[area] if reducible else None,
+                "area_under_curve": self.doubled_auc[area] / 2,
+            })
+        return results
+
+    def rows(self, use_minutes):
+        # summary() as display strings in STATS_HEADER order
+        unit = "score x min" if use_minutes else "score x time point"
+        return [[
+            result["area"],
+            f"{result['peak_reduction']}%" if result["peak_reduction"] is not None else "N/A",
+            format_duration(result["time_to_50"], use_minutes),
+            format_duration(result["time_to_80"], use_minutes),
+            format_duration(result["time_at_80"], use_minutes),
+            f"{result['area_under_curve']:g} {unit}",
+        ] for result in self.summary()]
@@ -0,0 +1,175 @@
+import tkinter as tk
+from tkinter import ttk
+
+# event.state bits for the modifier keys
+SHIFT_MASK = 0x0001
+CONTROL_MASK = 0x0004
+
+
+class VirtualTable:
+    # A Treeview that only ever holds the rows currently on screen. The data
+    # lives elsewhere and is pulled through row_count() and row_values(index);
+    # scrolling just re-fills the same handful of Tk items, so scrolling,
+    # appending and selecting cost the same at 10 rows as at 10,000.
+    def __init__(self, parent, column_widths, row_count, row_values, height=15):
+        self.row_count = row_count
+        self.row_values = row_values
+        self.first = 0
+        self.visible = height
+        self.selection = set()
+        self.slots = []
+
+        self.tree = ttk.Treeview(parent, columns=tuple(column_widths), show="headings", height=height)
+        self.set_columns(column_widths)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+
+        self.tree.bind("<Configure>", self.on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<Button-1>", self.on_click)
+        self.tree.bind("<Up>", lambda event: self.on_key(-1, "units"))
+        self.tree.bind("<Down>", lambda event: self.on_key(1, "units"))
+        self.tree.bind("<Prior>", lambda event: self.on_key(-1, "pages"))
+        self.tree.bind("<Next>", lambda event: self.on_key(1, "pages"))
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll(-1 if event.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-1, "units"))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(1, "units"))
+
+    def set_columns(self, column_widths):
+        # The slots hold values for the old columns, so they go too; the next
+        # refresh() re-fills them
+        for item in self.slots:
+            self.tree.delete(item)
+        self.slots = []
+        self.tree.configure(columns=tuple(column_widths))
+        for col, width in column_widths.items():
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, stretch=tk.YES)
+
+    def grid(self, row, column):
+        self.tree.grid(row=row, column=column, sticky="nsew")
+        self.scrollbar.grid(row=row, column=column + 1, sticky="ns")
+
+    def refresh(self, start=0):
+        # Re-draw the on-screen rows at or after model index start
+        count = self.row_count()
+        self.first = max(0, min(self.first, count - self.visible))
+        wanted = min(self.visible, count - self.first)
+        while len(self.slots) < wanted:
+            self.slots.append(self.tree.insert("", "end", iid=f"row{len(self.slots)}"))
+            start = min(start, self.first + len(self.slots) - 1)
+        while len(self.slots) > wanted:
+            self.tree.delete(self.slots.pop())
+        for slot, item in enumerate(self.slots):
+            index = self.first + slot
+            if index >= start:
+                self.tree.item(item, values=self.row_values(index))
+        self._show_selection()
+        self._update_scrollbar(count)
+
+    def append(self):
+        # New rows arrive at the end; keep following them if the view was there
+        count = self.row_count()
+        if self.first + self.visible < count - 1:
+            self._update_scrollbar(count)
+            return
+        first = max(0, count - self.visible)
+        if first == self.first + 1 and len(self.slots) == self.visible:
+            # Scrolled by one row: recycle the top item as the new bottom row
+            item = self.slots.pop(0)
+            self.tree.move(item, "", "end")
+            self.slots.append(item)
+            self.first = first
+            self.tree.item(item, values=self.row_values(count - 1))
+            self._show_selection()
+            self._update_scrollbar(count)
+        else:
+            start = count - 1 if first == self.first else first
+            self.first = first
+            self.refresh(start)
+
+    def scroll(self, amount, what):
+        step = self.visible if what == "pages" else 1
+        self._scroll_to(self.first + int(amount) * step)
+        return "break"
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * self.row_count()))
+        elif args[0] == "scroll":
+            self.scroll(args[1], args[2])
+
+    def see(self, index):
+        if index < self.first:
+            self._scroll_to(index)
+        elif index >= self.first + self.visible:
+            self._scroll_to(index - self.visible + 1)
+
+    def selected_indices(self):
+        count = self.row_count()
+        return sorted(index for index in self.selection if index < count)
+
+    def clear_selection(self):
+        self.selection.clear()
+        self._show_selection()
+
+    def index_at(self, y):
+        item = self.tree.identify_row(y)
+        return self.first + self.slots.index(item) if item in self.slots else None
+
+    def on_configure(self, event):
+        # The table stretches with the window; fit as many rows as there is room for
+        rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        visible = max(1, (event.height - rowheight) // rowheight)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+    def on_click(self, event):
+        # A plain click on a row starts a new selection, which also drops
+        # rows that are selected but scrolled out of view. Shift and Control
+        # clicks add to the selection, so those rows stay.
+        if event.state & (CONTROL_MASK | SHIFT_MASK):
+            return
+        if self.tree.identify_region(event.x, event.y) == "cell":
+            self.selection.clear()
+
+    def on_key(self, amount, what):
+        # The Treeview only knows the rows on screen, so moving past the top
+        # or bottom one (or by a page) scrolls the data under the focus row
+        # and selects the row it lands on
+        count = self.row_count()
+        focus = self.tree.focus()
+        slot = self.slots.index(focus) if focus in self.slots else 0
+        if what == "units" and 0 <= slot + amount < len(self.slots):
+            return None  # Still on screen: the Treeview's own binding moves
+        if not count:
+            return "break"
+        step = self.visible if what == "pages" else 1
+        index = max(0, min(self.first + slot + amount * step, count - 1))
+        self.see(index)
+        self.selection = {index}
+        self._show_selection()
+        self.tree.focus(self.slots[index - self.first])
+        return "break"
+
+    def on_select(self, event):
+        on_screen = set(range(self.first, self.first + len(self.slots)))
+        chosen = {self.first + self.slots.index(item) for item in self.tree.selection() if item in self.slots}
+        self.selection = (self.selection - on_screen) | chosen
+
+    def _scroll_to(self, first):
+        count = self.row_count()
+        first = max(0, min(first, count - self.visible))
+        if first != self.first:
+            self.first = first
+            self.refresh()
+
+    def _show_selection(self):
+        items = [self.slots[index - self.first] for index in self.selection if 0 <= index - self.first < len(self.slots)]
+        self.tree.selection_set(items)
+
+    def _update_scrollbar(self, count):
+        if count <= self.visible:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.first / count, (self.first + self.visible) / count)
@@ -0,0 +1,143 @@
+import json
+
+from matplotlib.backend_bases import RendererBase
+from matplotlib.path import Path
+from matplotlib.transforms import Affine2D
+
+# A matplotlib figure as a list of drawing operations for a reportlab
+# canvas, so a report can hold the graph as vector graphics with nothing but
+# reportlab. Each operation is a path in PDF's path operators plus the style
+# to paint it with. Text is drawn as glyph outlines, the way matplotlib's own
+# vector backends can, so the graph looks the same as on screen without
+# embedding any fonts.
+JOIN_STYLES = {"miter": 0, "round": 1, "bevel": 2}
+CAP_STYLES = {"butt": 0, "round": 1, "projecting": 2}
+MOVETO, LINETO, CURVE3, CURVE4, CLOSEPOLY, STOP = (int(code) for code in (Path.MOVETO, Path.LINETO, Path.CURVE3, Path.CURVE4, Path.CLOSEPOLY, Path.STOP))
+SEGMENT_POINTS = {int(code): count for code, count in Path.NUM_VERTICES_FOR_CODE.items()}
+PDF_OPERATORS = {MOVETO: "m", LINETO: "l", CURVE4: "c"}
+
+
+class RecordingRenderer(RendererBase):
+    # Everything matplotlib draws comes down to draw_path here: lines,
+    # markers, patches and text, whose outlines are kept per string and font
+    # since a graph repeats the same few score labels many times. Units are
+    # points with y going up, as in PDF.
+    def __init__(self, width, height):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.operations = []
+        self.text_paths = {}
+
+    def flipy(self):
+        return False
+
+    def get_canvas_width_height(self):
+        return self.width, self.height
+
+    def points_to_pixels(self, points):
+        return points
+
+    def draw_text(self, gc, x, y, s, prop, angle, ismath=False, mtext=None):
+        key = (s, prop, ismath)
+        path = self.text_paths.get(key)
+        if path is None:
+            path = self.text_paths[key] = Path(*self._text2path.get_text_path(prop, s, ismath=ismath))
+        scale = prop.get_size_in_points() / self._text2path.FONT_SCALE
+        gc.set_linewidth(0.0)
+        self.draw_path(gc, path, Affine2D().scale(scale).rotate_deg(angle).translate(x, y), rgbFace=gc.get_rgb())
+
+    def draw_path(self, gc, path, transform, rgbFace=None):
+        path = transform.transform_path(path)
+        points = path.vertices.round(2).tolist()
+        codes = path.codes.tolist() if path.codes is not None else [MOVETO] + [LINETO] * (len(points) - 1)
+        segments = []
+        index = 0
+        while index < len(points):
+            code = codes[index]
+            step = SEGMENT_POINTS[code]
+            if code == CURVE3:
+                # Quadratic curves as the cubic ones PDF has
+                (x0, y0), (qx, qy), (x1, y1) = points[index - 1], points[index], points[index + 1]
+                controls = (x0 + 2 / 3 * (qx - x0), y0 + 2 / 3 * (qy - y0), x1 + 2 / 3 * (qx - x1), y1 + 2 / 3 * (qy - y1), x1, y1)
+                segments.append(" ".join(f"{value:.2f}" for value in controls) + " c")
+            elif code == CLOSEPOLY:
+                segments.append("h")
+            elif code != STOP:
+                segments.append(" ".join(f"{value:g}" for point in points[index:index + step] for value in point) + " " + PDF_OPERATORS[code])
+            index += max(1, step)
+        if not segments:
+            return
+        segments = " ".join(segments)
+        forced = gc.get_forced_alpha()
+        stroke = None
+        if gc.get_linewidth() > 0:
+            r, g, b, a = gc.get_rgb()
+            stroke = [float(r), float(g), float(b), float(gc.get_alpha() if forced else a)]
+        fill = None
+        if rgbFace is not None:
+            r, g, b = rgbFace[:3]
+            fill = [float(r), float(g), float(b), float(gc.get_alpha() if forced or len(rgbFace) < 4 else rgbFace[3])]
+        if stroke is None and fill is None:
+            return
+        clip = gc.get_clip_rectangle()
+        offset, dashes = gc.get_dashes()
+        operation = {
+            "stroke": stroke,
+            "fill": fill,
+            "width": float(gc.get_linewidth()),
+            "dashes": [[float(dash) for dash in dashes], float(offset or 0)] if dashes else None,
+            "join": JOIN_STYLES.get(gc.get_joinstyle(), 0),
+            "cap": CAP_STYLES.get(gc.get_capstyle(), 0),
+            "clip": [float(value) for value in clip.bounds] if clip is not None else None,
+        }
+        # Paths drawn one after another in the same style, such as an area's
+        # markers or the glyphs of its labels, become one path
+        last = self.operations[-1] if self.operations else None
+        if last is not None and all(last[name] == value for name, value in operation.items()):
+            last["segments"] += " " + segments
+        else:
+            operation["segments"] = segments
+            self.operations.append(operation)
+
+
+def record_figure(figure):
+    # The figure's drawing operations, as JSON bytes for the render caches
+    width, height = (float(value) for value in figure.get_size_inches() * 72)
+    renderer = RecordingRenderer(width, height)
+    dpi = figure.dpi
+    figure.dpi = 72
+    try:
+        figure.draw(renderer)
+    finally:
+        figure.dpi = dpi
+    return json.dumps({"size": [width, height], "operations": renderer.operations}, separators=(",", ":")).encode()
+
+
+def draw_recording(canvas, recording, width, height):
+    # Replays record_figure() output on a reportlab canvas, scaled to
+    # width x height points with the origin at the current position
+    figure_width, figure_height = recording["size"]
+    canvas.saveState()
+    canvas.scale(width / figure_width, height / figure_height)
+    for operation in recording["operations"]:
+        canvas.saveState()
+        if operation["clip"] is not None:
+            clip = canvas.beginPath()
+            clip.rect(*operation["clip"])
+            canvas.clipPath(clip, stroke=0, fill=0)
+        if operation["stroke"] is not None:
+            r, g, b, alpha = operation["stroke"]
+            canvas.setStrokeColorRGB(r, g, b, alpha)
+            canvas.setLineWidth(operation["width"])
+            canvas.setLineJoin(operation["join"])
+            canvas.setLineCap(operation["cap"])
+            if operation["dashes"] is not None:
+                canvas.setDash(*operation["dashes"])
+        if operation["fill"] is not None:
+            r, g, b, alpha = operation["fill"]
+            canvas.setFillColorRGB(r, g, b, alpha)
+        paint = "B" if operation["stroke"] is not None and operation["fill"] is not None else "S" if operation["stroke"] is not None else "f"
+        canvas.addLiteral(f"{operation['segments']} {paint}")
+        canvas.restoreState()
+    canvas.restoreState()
@@ -0,0 +1,95 @@
+import random
+
+import pytest
+
+from pain_journal import EditHistory, apply_record
+from pain_session import PainSession
+
+
+def make_session(readings=12, use_minutes=True):
+    session = PainSession([90, 40, 0], ["Back", "Leg", "Arm"])
+    for i in range(1, readings + 1):
+        session.add_reading(i * 15 if use_minutes else i, [(90 - 7 * i) % 101, (40 + 3 * i) % 101, i % 5], f"reading {i}" if i % 3 else "")
+    return session
+
+
+def delete(session, history, indices, renumber):
+    # As the GUI's Delete: one edit for all the rows, undone by an insert of just those rows
+    removed = session.rows_at(indices)
+    record = {"op": "delete", "indices": [row["index"] for row in removed], "renumber": renumber}
+    history.push(record, {"op": "insert", "rows": removed, "renumber": renumber})
+    apply_record(session, record)
+
+
+@pytest.mark.parametrize("renumber", [False, True])
+def test_delete_rows_keeps_the_other_rows(renumber):
+    session = make_session(use_minutes=not renumber)
+    before = session.copy()
+    deleted = session.delete_rows([5, 2, 9, 2, 0, 99], renumber=renumber)
+    assert deleted == [2, 5, 9]
+    kept = [i for i in range(len(before)) if i not in deleted]
+    assert session.comments == [before.comments[i] for i in kept]
+    assert [list(column) for column in session.scores] == [[column[i] for i in kept] for column in before.scores]
+    assert [list(column) for column in session.reductions] == [[column[i] for i in kept] for column in before.reductions]
+    if renumber:
+        assert list(session.times) == list(range(len(kept)))
+    else:
+        assert list(session.times) == [before.times[i] for i in kept]
+
+
+def test_starting_reading_cannot_be_deleted():
+    session = make_session()
+    assert session.delete_rows([0]) == []
+    assert len(session) == 13
+
+
+@pytest.mark.parametrize("renumber", [False, True])
+def test_insert_rows_puts_back_deleted_rows(renumber):
+    session = make_session(use_minutes=not renumber)
+    before = session.to_dict()
+    removed = session.rows_at([1, 4, 5, 12])
+    session.delete_rows([1, 4, 5, 12], renumber=renumber)
+    session.insert_rows(list(reversed(removed)), renumber=renumber)
+    assert session.to_dict() == before
+
+
+@pytest.mark.parametrize("renumber", [False, True])
+def test_undo_and_redo_round_trip(renumber):
+    session = make_session(use_minutes=not renumber)
+    history = EditHistory()
+    states = [session.to_dict()]
+    for indices in ([3], [1, 2, 7], [len(session) - 2]):
+        delete(session, history, indices, renumber)
+        states.append(session.to_dict())
+
+    for state in reversed(states[:-1]):
+        apply_record(session, history.undo())
+        assert session.to_dict() == state
+    assert history.undo() is None
+    for state in states[1:]:
+        apply_record(session, history.redo())
+        assert session.to_dict() == state
+    assert history.redo() is None
+
+
+def test_a_new_edit_drops_the_redo_stack():
+    session = make_session()
+    history = EditHistory()
+    delete(session, history, [2], False)
+    apply_record(session, history.undo())
+    delete(session, history, [4], False)
+    assert history.redo() is None
+
+
+def test_random_edits_undo_back_to_the_start():
+    rng = random.Random(16)
+    for renumber in (False, True):
+        session = make_session(40, use_minutes=not renumber)
+        history = EditHistory()
+        start = session.to_dict()
+        for _ in range(30):
+            if len(session) > 1:
+                delete(session, history, rng.sample(range(1, len(session)), rng.randint(1, min(5, len(session) - 1))), renumber)
+        while (record := history.undo()) is not None:
+            apply_record(session, record)
+        assert session.to_dict() == start
@@ -0,0 +1,67 @@
+import pytest
+
+from pain_import import parse_lines
+
+PAIN_TABLE = """TIME N| Pain Score | Reduction
+Time 0| Pain Score:  80 | Reduction: N/A
+Time 1| Pain Score:  60 | Reduction: 25%
+Time 2| Pain Score: abc | Reduction: %
+Time 3| Pain Score:  16 | Reduction: 80%
+Time 0| Pain Score:  50 | Reduction: N/A
+Time 1| Pain Score:  25 | Reduction: 50%
+"""
+
+
+def test_pain_table_sessions():
+    sessions = list(parse_lines(PAIN_TABLE.splitlines(True)))
+    assert [(list(session.times), list(session.scores[0]), use_minutes) for session, use_minutes in sessions] == [
+        ([0, 1, 3], [80, 60, 16], False),
+        ([0, 1], [50, 25], False),
+    ]
+
+
+@pytest.mark.parametrize("row, note", [
+    ("Time 2| Pain Score: abc | Reduction: %", "line 4: not a pain table row"),
+    ("Time 2| Pain Score: 140 | Reduction: %", "line 4: pain score 140 is not between 0 and 100"),
+    ("Time 99999999999| Pain Score: 40 | Reduction: 50%", "line 4: time 99999999999 is too large"),
+])
+def test_bad_pain_table_rows_are_skipped_and_reported(row, note):
+    lines = PAIN_TABLE.replace("Time 2| Pain Score: abc | Reduction: %", row).splitlines(True)
+    skipped = []
+    sessions = list(parse_lines(lines, skipped))
+    assert [list(session.times) for session, _ in sessions] == [[0, 1, 3], [0, 1]]
+    assert len(skipped) == 1
+    assert skipped[0].startswith(note)
+
+
+def test_readings_before_the_first_start_are_skipped():
+    skipped = []
+    sessions = list(parse_lines(["Time 1| Pain Score: 40 |\n", "Time 0| Pain Score: 80 |\n", "Time 1| Pain Score: 20 |\n"], skipped))
+    assert [list(session.scores[0]) for session, _ in sessions] == [[80, 20]]
+    assert skipped == ["line 1: reading before the Time 0 row"]
+
+
+def test_nothing_readable():
+    skipped = []
+    assert list(parse_lines(["Time 0| Pain Score: abc |\n"], skipped)) == []
+    assert len(skipped) == 1
+
+
+CLIPBOARD = [
+    "Time\tBack Pain\tBack Reduction\tLeg Pain\tLeg Reduction\tComment\n",
+    "0 min\t80\tN/A - Target for 80% Reduction: 16\tN/A\tN/A\tstart\n",
+    "30 min\t40\t50%\tN/A\tN/A\tbetter\n",
+]
+
+
+def test_clipboard_text():
+    (session, use_minutes), = parse_lines(CLIPBOARD)
+    assert use_minutes
+    assert session.area_names == ["Back"]
+    assert list(session.times) == [0, 30]
+    assert session.comments == ["start", "better"]
+
+
+def test_clipboard_time_too_large():
+    with pytest.raises(ValueError, match="too large"):
+        list(parse_lines(CLIPBOARD + ["99999999999 min\t20\t75%\tN/A\tN/A\t\n"]))
@@ -0,0 +1,178 @@
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+from pain_ingest import IngestServer, answer_batches, apply_batch, send_batch
+from pain_session import PainSession
+
+
+class FakeTracker:
+    # Stands in for the Tk side: answers batches on its own thread with the
+    # same apply_batch the tracker uses, adding readings straight to a session
+    def __init__(self, server, session, patient_nhi="ABC1234", step=1, apply=None):
+        self.server = server
+        self.session = session
+        self.patient_nhi = patient_nhi
+        self.step = step
+        self.apply = apply or self.apply_batch
+        self.batches = []
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            answer_batches(self.server, self.apply)
+            time.sleep(0.01)
+
+    def apply_batch(self, batch):
+        self.batches.append(batch)
+        return apply_batch(batch, self.session, self.patient_nhi, self.step, self.session.add_reading)
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+
+@pytest.fixture
+def tracker():
+    server = IngestServer(port=0, timeout=2.0).start()
+    fake = FakeTracker(server, PainSession([80, 60]))
+    yield fake
+    fake.stop()
+    server.stop()
+
+
+def test_readings_round_trip(tracker):
+    reply = send_batch([{"scores": [40, 30], "comment": "after block"}, {"scores": [20, 10], "time": 5}],
+                       patient_nhi="ABC1234", port=tracker.server.port)
+    assert reply == {"accepted": 2, "errors": []}
+    assert list(tracker.session.times) == [0, 1, 5]
+    assert [list(column) for column in tracker.session.scores] == [[80, 40, 20], [60, 30, 10]]
+    assert tracker.session.comments[1] == "after block"
+    assert tracker.batches[0]["patient_nhi"] == "ABC1234"
+
+
+def test_rejected_readings_come_back_as_errors(tracker):
+    reply = send_batch([{"scores": [40, 30], "time": 3}, {"scores": [10, 10], "time": 2}], port=tracker.server.port)
+    assert reply["accepted"] == 1
+    assert reply["errors"] == ["Reading 1: Time 2 is not after the last reading (3)."]
+    assert "patient_nhi" not in tracker.batches[0]
+
+
+@pytest.mark.parametrize("reading, error", [
+    ({"scores": [101, 30]}, "between 0 and 100"),
+    ({"scores": [-1, 30]}, "between 0 and 100"),
+    ({"scores": [40, True]}, "between 0 and 100"),
+    ({"scores": [40, "30"]}, "between 0 and 100"),
+    ({"scores": [40]}, "Expected 2 pain scores"),
+    ({"scores": 40}, "Expected 2 pain scores"),
+    ({"scores": [40, 30], "time": True}, "whole number"),
+    ({"scores": [40, 30], "time": 2 ** 31}, "whole number"),
+    ({"scores": [40, 30], "time": 1.5}, "whole number"),
+    ({"scores": [40, 30], "time": 0}, "not after the last reading"),
+    ({"scores": [40, 30], "comment": 5}, "text"),
+    ({"time": 5}, "scores"),
+    ([40, 30], "scores"),
+])
+def test_readings_are_checked_as_the_add_button_checks_them(reading, error):
+    session = PainSession([80, 60])
+    reply = apply_batch({"readings": [reading, {"scores": [10, 10]}]}, session, "ABC1234", 15, session.add_reading)
+    assert reply["accepted"] == 1
+    assert len(reply["errors"]) == 1
+    assert reply["errors"][0].startswith("Reading 0:")
+    assert error in reply["errors"][0]
+    assert list(session.times) == [0, 15]
+
+
+def test_readings_for_another_patient_are_refused():
+    session = PainSession([80])
+    reply = apply_batch({"patient_nhi": "XYZ9999", "readings": [{"scores": [10]}]}, session, "ABC1234", 1, session.add_reading)
+    assert reply == {"accepted": 0, "errors": ["Readings are for XYZ9999, but the tracker is on ABC1234"]}
+    assert len(session) == 1
+    reply = apply_batch({"patient_nhi": "XYZ9999", "readings": []}, session, "", 1, session.add_reading)
+    assert reply["errors"] == ["Readings are for XYZ9999, but the tracker is on no patient"]
+
+
+def test_nothing_is_added_before_tracking_starts():
+    added = []
+    reply = apply_batch({"readings": [{"scores": [10]}]}, None, "", 1, lambda *reading: added.append(reading))
+    assert reply == {"accepted": 0, "errors": ["Reading 0: Tracking has not been started."]}
+    assert added == []
+
+
+def test_a_failing_batch_still_gets_a_reply():
+    # One batch blowing up must not leave its client waiting or stop the ones behind it
+    def apply(batch):
+        if batch.get("patient_nhi") == "BAD":
+            raise OverflowError("signed integer is greater than maximum")
+        return {"accepted": len(batch["readings"]), "errors": []}
+
+    server = IngestServer(port=0, timeout=2.0).start()
+    fake = FakeTracker(server, PainSession([80]), apply=apply)
+    try:
+        assert send_batch([{"scores": [1]}], patient_nhi="BAD", port=server.port) == {
+            "accepted": 0, "errors": ["OverflowError: signed integer is greater than maximum"]}
+        assert send_batch([{"scores": [1]}], port=server.port) == {"accepted": 1, "errors": []}
+    finally:
+        fake.stop()
+        server.stop()
+
+
+def test_several_requests_on_one_connection(tracker):
+    with socket.create_connection(("127.0.0.1", tracker.server.port), timeout=5) as connection, connection.makefile("rwb") as stream:
+        for score in (50, 40, 30):
+            stream.write((json.dumps({"readings": [{"scores": [score, score]}]}) + "\n").encode("utf-8"))
+        stream.flush()
+        replies = [json.loads(stream.readline()) for _ in range(3)]
+    assert replies == [{"accepted": 1, "errors": []}] * 3
+    assert list(tracker.session.scores[0]) == [80, 50, 40, 30]
+
+
+@pytest.mark.parametrize("line", [b"not json\n", b"[1, 2]\n", b'{"readings": 5}\n'])
+def test_bad_requests_never_reach_the_tracker(tracker, line):
+    with socket.create_connection(("127.0.0.1", tracker.server.port), timeout=5) as connection, connection.makefile("rwb") as stream:
+        stream.write(line)
+        stream.flush()
+        reply = json.loads(stream.readline())
+    assert reply["accepted"] == 0
+    assert reply["errors"][0].startswith("Bad request")
+    assert tracker.batches == []
+
+
+def test_a_tracker_that_does_not_answer_times_out():
+    server = IngestServer(port=0, timeout=0.2).start()
+    try:
+        reply = send_batch([{"scores": [10]}], port=server.port)
+    finally:
+        server.stop()
+    assert reply == {"accepted": 0, "errors": ["The tracker did not respond in time"]}
+    assert server.batches.qsize() == 1
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Unix sockets")
+def test_unix_socket(tmp_path):
+    path = os.path.join(tmp_path, "ingest.sock")
+    server = IngestServer(path=path, timeout=2.0).start()
+    fake = FakeTracker(server, PainSession([70]))
+    try:
+        assert send_batch([{"scores": [35]}], path=path) == {"accepted": 1, "errors": []}
+    finally:
+        fake.stop()
+        server.stop()
+    assert list(fake.session.scores[0]) == [70, 35]
+
+
+def test_a_port_in_use_is_reported():
+    first = IngestServer(port=0).start()
+    try:
+        with pytest.raises(OSError):
+            IngestServer(port=first.port).start()
+    finally:
+        first.stop()
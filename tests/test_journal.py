@@ -0,0 +1,155 @@
+import os
+
+import pytest
+
+from pain_journal import KEEP_PREVIOUS, JournalInUse, SessionJournal, apply_record, open_journal, replay_journal, set_aside
+from pain_session import DEFAULT_OPTIONS, PainSession
+
+PATIENT = {"name": "Ann", "nhi": "ABC1234", "procedure_date": "", "procedure_name": "Block"}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return os.path.join(tmp_path, "session.journal")
+
+
+def started(path, **settings):
+    journal = SessionJournal(path, **settings)
+    session = PainSession([80, 40], ["Back", "Leg"])
+    journal.start(session, PATIENT, dict(DEFAULT_OPTIONS))
+    return journal, session
+
+
+def record(journal, session, op, **fields):
+    # As the GUI does it: change the session, then journal the change
+    apply_record(session, dict(fields, op=op))
+    journal.append(op, **fields)
+
+
+def crash(journal):
+    # Leaves the file as a killed process would: no clean close, maybe a torn line
+    journal.file.close()
+    journal.lock.close()
+
+
+def test_snapshot_and_replay(path):
+    journal, session = started(path)
+    record(journal, session, "add", time=30, scores=[40, 20], comment="")
+    record(journal, session, "add", time=60, scores=[10, 30], comment="nauseous")
+    record(journal, session, "comment", index=1, text="settled")
+    removed = session.rows_at([1])
+    record(journal, session, "delete", indices=[1], renumber=False)
+    record(journal, session, "insert", rows=removed, renumber=False)
+    journal.append("details", patient=dict(PATIENT, name="Ann B"), options=dict(DEFAULT_OPTIONS, show_comments=False))
+    crash(journal)
+
+    restored, patient, options = replay_journal(path)
+    assert restored.to_dict() == session.to_dict()
+    assert patient["name"] == "Ann B"
+    assert options["show_comments"] is False
+
+
+def test_nothing_to_replay(path):
+    assert replay_journal(path) == (None, None, None)
+    open(path, "w").close()
+    assert replay_journal(path) == (None, None, None)
+
+
+def test_torn_tail_then_more_readings(path):
+    journal, session = started(path)
+    record(journal, session, "add", time=30, scores=[40, 20])
+    journal.file.write('{"op":"add","time":60,"sco')
+    crash(journal)
+    assert list(replay_journal(path)[0].times) == [0, 30]
+
+    # The torn line must not swallow what is written after the restart
+    journal = SessionJournal(path)
+    session = replay_journal(path)[0]
+    record(journal, session, "add", time=60, scores=[30, 20])
+    record(journal, session, "add", time=90, scores=[20, 10])
+    crash(journal)
+    assert list(replay_journal(path)[0].times) == [0, 30, 60, 90]
+
+
+def test_a_second_crash_after_recovery(path):
+    journal, session = started(path)
+    record(journal, session, "add", time=30, scores=[40, 20])
+    journal.file.write('{"op":"ad')
+    crash(journal)
+    for time_point in (60, 90):
+        journal = SessionJournal(path)
+        session, patient, options = replay_journal(path)
+        record(journal, session, "add", time=time_point, scores=[20, 10])
+        journal.file.write('{"op')
+        crash(journal)
+    assert list(replay_journal(path)[0].times) == [0, 30, 60, 90]
+
+
+def test_compaction(path):
+    journal, session = started(path, compact_after=5)
+    for number in range(1, 6):
+        assert not journal.needs_compaction()
+        record(journal, session, "add", time=number * 15, scores=[80 - number * 10, 40])
+    assert journal.needs_compaction()
+    journal.start(session, PATIENT, dict(DEFAULT_OPTIONS))
+    assert not journal.needs_compaction()
+    with open(path, encoding="utf-8") as file:
+        assert len(file.readlines()) == 1
+    record(journal, session, "add", time=90, scores=[5, 5])
+    crash(journal)
+    assert replay_journal(path)[0].to_dict() == session.to_dict()
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_clean_close_is_not_replayed(path):
+    journal, session = started(path)
+    record(journal, session, "add", time=30, scores=[40, 20])
+    journal.close(clean=True)
+    assert replay_journal(path) == (None, None, None)
+    assert list(replay_journal(path, after_clean_close=True)[0].times) == [0, 30]
+
+    # Reopened and written to again, it is live once more
+    journal = SessionJournal(path)
+    record(journal, session, "add", time=60, scores=[30, 20])
+    crash(journal)
+    assert list(replay_journal(path)[0].times) == [0, 30, 60]
+
+
+def test_clear_keeps_the_abandoned_session(path):
+    journal, session = started(path)
+    record(journal, session, "add", time=30, scores=[40, 20])
+    journal.clear()
+    journal.close()
+    assert replay_journal(path) == (None, None, None)
+    assert list(replay_journal(path + ".previous")[0].times) == [0, 30]
+
+
+def test_set_aside_keeps_the_newest(path):
+    for number in range(KEEP_PREVIOUS + 3):
+        with open(path, "w") as file:
+            file.write(str(number))
+        set_aside(path)
+    kept = sorted(name for name in os.listdir(os.path.dirname(path)) if ".previous" in name)
+    assert len(kept) == KEEP_PREVIOUS
+    with open(f"{path}.previous.{KEEP_PREVIOUS + 3}") as file:
+        assert file.read() == str(KEEP_PREVIOUS + 2)
+    assert not os.path.exists(path + ".previous")
+
+
+def test_one_window_per_journal(path):
+    first = SessionJournal(path)
+    with pytest.raises(JournalInUse):
+        SessionJournal(path)
+    second = open_journal(path)
+    assert second.path == os.path.join(os.path.dirname(path), "session-2.journal")
+    second.close()
+    first.close()
+    SessionJournal(path).close()
+
+
+def test_bad_records_raise(path):
+    journal, session = started(path)
+    journal.append("comment", index=9, text="no such reading")
+    crash(journal)
+    with pytest.raises(IndexError):
+        replay_journal(path)
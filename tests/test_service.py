@@ -0,0 +1,238 @@
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from pain_service import PainService, RendererPool, ServiceError, ServiceServer, render_job
+
+
+class InProcessRenderers:
+    # RendererPool's interface without the worker processes
+    workers = 1
+    busy = 0
+
+    def render(self, *job):
+        return render_job(*job)
+
+
+def call(service, method, path, body=None):
+    status, content_type, data = service.handle(method, path, body)
+    return status, json.loads(data) if content_type == "application/json" else data
+
+
+@pytest.fixture
+def service():
+    return PainService(InProcessRenderers())
+
+
+def start(service, **body):
+    status, reply = call(service, "POST", "/sessions", dict({"scores": [80, 40], "areas": ["Back", "Leg"]}, **body))
+    assert status == 201
+    return reply["id"]
+
+
+def test_session_lifecycle(service):
+    id = start(service, patient={"name": "Ann", "nhi": "ABC1234"}, step=15)
+    assert call(service, "POST", f"/sessions/{id}/readings", {"scores": [40, 20]})[1]["index"] == 1
+    status, reply = call(service, "POST", f"/sessions/{id}/readings", {"scores": [8, 10], "time": 45, "comment": "settled"})
+    assert status == 201
+    assert reply["row"][0] == "45 min"
+    assert call(service, "PUT", f"/sessions/{id}/readings/1/comment", {"text": "first"})[0] == 200
+    status, reply = call(service, "GET", f"/sessions/{id}")
+    assert status == 200
+    assert [reading["time"] for reading in reply["session"]["readings"]] == [15, 45]
+    assert reply["session"]["readings"][0]["comment"] == "first"
+    assert reply["table"][2][1:5] == [" 40", "50%", " 20", "50%"]
+    assert call(service, "GET", "/sessions")[1]["sessions"][0]["patient"]["name"] == "Ann"
+    assert call(service, "DELETE", f"/sessions/{id}")[0] == 200
+    assert call(service, "GET", f"/sessions/{id}")[0] == 404
+
+
+def test_delete_readings(service):
+    id = start(service, options={"use_minutes": False})
+    for score in (70, 60, 50, 40):
+        call(service, "POST", f"/sessions/{id}/readings", {"scores": [score, score // 2]})
+    assert call(service, "DELETE", f"/sessions/{id}/readings?indices=1,3")[1] == {"deleted": [1, 3], "readings": 3}
+    assert call(service, "DELETE", f"/sessions/{id}/readings/1")[1] == {"deleted": [1], "readings": 2}
+    readings = call(service, "GET", f"/sessions/{id}")[1]["session"]["readings"]
+    assert [(reading["time"], reading["scores"]) for reading in readings] == [(1, [40, 20])]
+
+
+@pytest.mark.parametrize("body, message", [
+    ({}, "scores"),
+    ({"scores": []}, "scores"),
+    ({"scores": [101]}, "scores"),
+    ({"scores": [True]}, "scores"),
+    ({"scores": [50], "areas": ["Back", "Leg"]}, "areas"),
+    ({"scores": [50], "options": []}, "options"),
+    ({"scores": [50], "step": 0}, "step"),
+    ({"scores": [50], "step": True}, "step"),
+    ({"scores": [50], "step": 1.5}, "step"),
+    ({"scores": [50], "step": 2 ** 31}, "step"),
+])
+def test_start_rejects_bad_requests(service, body, message):
+    status, reply = call(service, "POST", "/sessions", body)
+    assert status == 400
+    assert message in reply["error"]
+
+
+@pytest.mark.parametrize("body", [
+    {"scores": [40]},
+    {"scores": [40, "20"]},
+    {"scores": [40, False]},
+    {"scores": [40, 20], "time": 0},
+    {"scores": [40, 20], "time": True},
+    {"scores": [40, 20], "time": "5"},
+    {"scores": [40, 20], "time": 2 ** 31},
+    {"scores": [40, 20], "comment": 5},
+])
+def test_add_rejects_bad_readings(service, body):
+    id = start(service)
+    assert call(service, "POST", f"/sessions/{id}/readings", body)[0] == 400
+    assert call(service, "GET", f"/sessions/{id}")[1]["session"]["readings"] == []
+
+
+def test_default_time_past_the_int_range(service):
+    id = start(service, step=2 ** 31 - 1)
+    assert call(service, "POST", f"/sessions/{id}/readings", {"scores": [40, 20]})[0] == 201
+    status, reply = call(service, "POST", f"/sessions/{id}/readings", {"scores": [40, 20]})
+    assert status == 400
+    assert "below" in reply["error"]
+
+
+def test_bad_indices(service):
+    id = start(service)
+    call(service, "POST", f"/sessions/{id}/readings", {"scores": [40, 20]})
+    assert call(service, "DELETE", f"/sessions/{id}/readings?indices=a")[0] == 400
+    assert call(service, "DELETE", f"/sessions/{id}/readings")[0] == 400
+    assert call(service, "DELETE", f"/sessions/{id}/readings/0")[0] == 404
+    assert call(service, "DELETE", f"/sessions/{id}/readings/2")[0] == 404
+    assert call(service, "PUT", f"/sessions/{id}/readings/2/comment", {"text": "x"})[0] == 404
+    assert call(service, "PUT", f"/sessions/{id}/readings/1/comment", {})[0] == 400
+
+
+@pytest.mark.parametrize("method, path", [
+    ("GET", "/nowhere"),
+    ("PATCH", "/sessions"),
+    ("GET", "/sessions/missing"),
+    ("POST", "/sessions/missing/readings"),
+    ("GET", "/sessions/missing/graph.png"),
+    ("GET", "/sessions/missing/report.pdf"),
+])
+def test_unknown_resources(service, method, path):
+    assert call(service, method, path)[0] == 404
+
+
+def test_renders(service):
+    id = start(service)
+    call(service, "POST", f"/sessions/{id}/readings", {"scores": [40, 20], "comment": "better"})
+    status, content_type, data = service.handle("GET", f"/sessions/{id}/graph.png")
+    assert (status, content_type) == (200, "image/png")
+    assert data.startswith(b"\x89PNG")
+    status, content_type, data = service.handle("GET", f"/sessions/{id}/report.pdf?name=Ann&page_headers=1")
+    assert (status, content_type) == (200, "application/pdf")
+    assert data.startswith(b"%PDF")
+    assert service.handle("GET", f"/sessions/{id}/graph.gif")[0] == 404
+
+
+def test_without_renderers():
+    service = PainService()
+    id = start(service)
+    status, reply = call(service, "GET", f"/sessions/{id}/graph.svg")
+    assert status == 503
+    assert "without renderers" in reply["error"]
+
+
+def test_session_limit():
+    service = PainService(max_sessions=2)
+    start(service)
+    start(service)
+    assert call(service, "POST", "/sessions", {"scores": [10]})[0] == 503
+
+
+def test_a_full_pool_refuses_straight_away():
+    pool = RendererPool(workers=1, backlog=0)
+    try:
+        assert pool.slots.acquire(blocking=False)
+        with pytest.raises(ServiceError) as error:
+            pool.render("graph", None, None, None, {}, "png")
+        assert error.value.status == 503
+        pool.slots.release()
+    finally:
+        pool.shutdown()
+
+
+def test_a_timed_out_render_keeps_its_slot_until_it_ends(service):
+    # The worker is still busy after the request gives up, so the slot must
+    # stay taken until the render really finishes
+    pool = RendererPool(workers=1, backlog=0, timeout=0.01)
+    service.renderers = pool
+    try:
+        id = start(service)
+        for score in range(100):
+            call(service, "POST", f"/sessions/{id}/readings", {"scores": [score, score]})
+        assert service.handle("GET", f"/sessions/{id}/report.pdf")[0] == 504
+        assert call(service, "GET", f"/sessions/{id}/graph.png")[0] == 503
+        deadline = time.monotonic() + 60
+        while pool.busy and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pool.busy == 0
+        assert pool.slots.acquire(blocking=False)
+    finally:
+        pool.shutdown()
+
+
+def test_stats_count_requests_and_errors(service):
+    id = start(service)
+    call(service, "GET", "/nowhere")
+    call(service, "POST", f"/sessions/{id}/readings", {"scores": [1, 1]})
+    status, reply = call(service, "GET", "/stats")
+    assert status == 200
+    assert (reply["requests"], reply["errors"], reply["sessions"]) == (3, 1, 1)
+    assert "POST /sessions/{id}/readings" in reply["routes"]
+
+
+@pytest.fixture
+def server(service):
+    server = ServiceServer(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None, raw=None):
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    try:
+        data = raw if raw is not None else json.dumps(body).encode("utf-8") if body is not None else None
+        connection.request(method, path, body=data, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, response.getheader("Content-Type"), response.read()
+    finally:
+        connection.close()
+
+
+def test_over_http(server):
+    status, _, data = request(server, "POST", "/sessions", {"scores": [60]})
+    assert status == 201
+    id = json.loads(data)["id"]
+    assert request(server, "POST", f"/sessions/{id}/readings", {"scores": [30]})[0] == 201
+    status, content_type, data = request(server, "GET", f"/sessions/{id}/graph.svg")
+    assert (status, content_type) == (200, "image/svg+xml")
+    assert b"<svg" in data
+    assert request(server, "GET", "/sessions/missing")[0] == 404
+    assert request(server, "POST", "/sessions", raw=b"{not json")[0] == 400
+    assert request(server, "POST", "/sessions", raw=b"[1, 2]")[0] == 400
+    assert request(server, "POST", "/sessions", {"scores": [False]})[0] == 400
+
+
+@pytest.mark.parametrize("length", ["-1", "abc"])
+def test_bad_content_length(server, length):
+    with socket.create_connection(("127.0.0.1", server.server_address[1]), timeout=5) as connection:
+        connection.sendall(f"POST /sessions HTTP/1.1\r\nHost: localhost\r\nContent-Length: {length}\r\n\r\n".encode("ascii"))
+        reply = connection.makefile("rb").readline()
+    assert reply.split()[1] == b"400"
@@ -0,0 +1,60 @@
+import json
+import os
+
+import pytest
+
+from pain_session import DEFAULT_OPTIONS, PainSession, read_session_file, write_session_file
+
+
+@pytest.fixture
+def saved(tmp_path):
+    session = PainSession([80, 40], ["Back", "Leg"])
+    session.add_reading(30, [40, 20], "better")
+    path = os.path.join(tmp_path, "session.json")
+    write_session_file(path, session, {"name": "Ann", "nhi": "ABC1234"}, {"use_minutes": False})
+    with open(path, encoding="utf-8") as file:
+        return path, json.load(file)
+
+
+def rewrite(path, data):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+
+
+def test_round_trip(saved):
+    path, _ = saved
+    session, patient, options = read_session_file(path)
+    assert list(session.times) == [0, 30]
+    assert session.comments == ["", "better"]
+    assert patient == {"name": "Ann", "nhi": "ABC1234"}
+    assert options == dict(DEFAULT_OPTIONS, use_minutes=False)
+
+
+@pytest.mark.parametrize("change", [
+    lambda data: [data],
+    lambda data: "session",
+    lambda data: dict(data, options=[]),
+    lambda data: dict(data, options={"use_minutes": "no"}),
+    lambda data: dict(data, patient=[]),
+    lambda data: dict(data, patient={"name": 5}),
+    lambda data: dict(data, areas=[]),
+    lambda data: dict(data, areas=[{"name": "Back", "initial": 101}]),
+    lambda data: dict(data, readings={}),
+    lambda data: dict(data, readings=[{"time": 2 ** 31, "scores": [1, 1]}]),
+    lambda data: dict(data, readings=[{"time": True, "scores": [1, 1]}]),
+    lambda data: dict(data, readings=[{"time": 5, "scores": [1]}]),
+    lambda data: dict(data, readings=[{"time": 5, "scores": [1, 1], "comment": 3}]),
+])
+def test_bad_files_raise_value_error(saved, change):
+    path, data = saved
+    rewrite(path, change(data))
+    with pytest.raises(ValueError):
+        read_session_file(path)
+
+
+def test_missing_fields_raise_key_error(saved):
+    path, data = saved
+    del data["readings"]
+    rewrite(path, data)
+    with pytest.raises(KeyError):
+        read_session_file(path)
@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from pain_journal import EditHistory
+from pain_session import PainSession
+from pain_stats import SessionStats
+
+
+def state(stats):
+    # Everything SessionStats keeps, so an incremental update can be compared
+    # with one worked out from scratch
+    return (list(stats.doubled_auc), list(stats.time_at_80), [dict(peaks) for peaks in stats.peaks],
+            {threshold: list(firsts) for threshold, firsts in stats.first.items()})
+
+
+def assert_matches_rebuild(stats):
+    assert state(stats) == state(SessionStats(stats.session))
+    assert stats.summary() == SessionStats(stats.session).summary()
+
+
+def make_stats(scores, initial=(80, 50, 0), step=10):
+    session = PainSession(list(initial))
+    stats = SessionStats(session)
+    for number, row in enumerate(scores, 1):
+        stats.apply({"op": "add", "time": number * step, "scores": list(row)})
+    return stats
+
+
+def test_summary_of_a_known_session():
+    stats = make_stats([(60, 50, 0), (16, 25, 0), (8, 40, 0)], initial=(80, 50, 0))
+    back, leg, arm = stats.summary()
+    assert back["peak_reduction"] == 90
+    assert (back["time_to_50"], back["time_to_80"]) == (20, 20)
+    assert back["time_at_80"] == 10  # the 80% reading counts until the next one
+    assert back["area_under_curve"] == (80 + 60) * 5 + (60 + 16) * 5 + (16 + 8) * 5
+    assert (leg["peak_reduction"], leg["time_to_50"], leg["time_to_80"]) == (50, 20, None)
+    assert arm["peak_reduction"] is None  # nothing to reduce from
+    assert_matches_rebuild(stats)
+
+
+def test_adding_readings():
+    stats = make_stats([])
+    for row in [(70, 50, 0), (40, 20, 3), (10, 60, 0), (0, 0, 0)]:
+        stats.apply({"op": "add", "time": stats.session.time_point + 7, "scores": list(row)})
+        assert_matches_rebuild(stats)
+
+
+@pytest.mark.parametrize("renumber", [False, True])
+@pytest.mark.parametrize("indices", [[1], [3], [6], [1, 2], [2, 4, 6], [5, 6], [1, 2, 3, 4, 5, 6]])
+def test_delete_and_insert_back(renumber, indices):
+    stats = make_stats([(60, 40, 0), (30, 20, 0), (10, 45, 0), (16, 10, 0), (40, 5, 0), (4, 50, 0)], step=1 if renumber else 10)
+    before = state(stats)
+    removed = stats.session.rows_at(indices)
+    stats.apply({"op": "delete", "indices": indices, "renumber": renumber})
+    assert_matches_rebuild(stats)
+    stats.apply({"op": "insert", "rows": removed, "renumber": renumber})
+    assert_matches_rebuild(stats)
+    assert state(stats) == before
+
+
+def test_renumbering_a_session_with_gaps_in_its_times():
+    # Imported "Time n" sessions need not run 0, 1, 2, ...; only the rows
+    # from the deleted one on are renumbered
+    stats = make_stats([(60, 40, 0), (30, 20, 0), (10, 45, 0)], step=5)
+    stats.apply({"op": "delete", "indices": [2], "renumber": True})
+    assert list(stats.session.times) == [0, 5, 2]
+    assert_matches_rebuild(stats)
+
+
+def test_comments_change_no_numbers():
+    stats = make_stats([(60, 40, 0)])
+    before = state(stats)
+    stats.apply({"op": "comment", "index": 1, "text": "nauseous"})
+    assert stats.session.comments[1] == "nauseous"
+    assert state(stats) == before
+
+
+def test_random_edits_match_a_rebuild():
+    rng = random.Random(23)
+    for _ in range(300):
+        area_count = rng.randint(1, 3)
+        session = PainSession([rng.choice([0, rng.randint(1, 100)]) for _ in range(area_count)])
+        stats = SessionStats(session)
+        history = EditHistory()
+        renumber = rng.random() < 0.5
+        for _ in range(rng.randint(1, 25)):
+            choice = rng.random()
+            if choice < 0.5:
+                time_point = session.time_point + (1 if renumber else rng.randint(1, 30))
+                record = {"op": "add", "time": time_point, "scores": [rng.randint(0, 100) for _ in range(area_count)]}
+                history.push(record, {"op": "delete", "indices": [len(session)], "renumber": False})
+            elif choice < 0.7 and len(session) > 1:
+                removed = session.rows_at(rng.sample(range(1, len(session)), rng.randint(1, len(session) - 1)))
+                record = {"op": "delete", "indices": [row["index"] for row in removed], "renumber": renumber}
+                history.push(record, {"op": "insert", "rows": removed, "renumber": renumber})
+            else:
+                record = history.undo() if choice < 0.85 else history.redo()
+                if record is None:
+                    continue
+            stats.apply(record)
+            assert_matches_rebuild(stats)